@@ -0,0 +1,71 @@
+"""Memory footprint and encode/decode throughput of `Block` against `CompactBlock`.
+
+Run from the repository root, holding 1M blocks of each type in RAM by default:
+
+    $ python -m benchmarks.block_memory --count 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime
+from hashlib import sha256
+
+from blockchain_demo.compact import CompactBlock
+from blockchain_demo.main import Block
+
+
+def build_blocks(count: int) -> list:
+    timestamp = datetime.now()
+    prev_hash = '0'
+    blocks = []
+    for index in range(count):
+        block = Block(index, [], timestamp, prev_hash)
+        block.hash = sha256(str(index).encode()).hexdigest()
+        prev_hash = block.hash
+        blocks.append(block)
+    return blocks
+
+
+def measure(label: str, build) -> list:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    blocks = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>13}: {current / 2 ** 20:9.1f} MiB, {current / len(blocks):7.1f} B/block, built in {elapsed:.2f}s")
+    return blocks
+
+
+def throughput(label: str, function, items: list) -> list:
+    start = time.perf_counter()
+    results = [function(item) for item in items]
+    elapsed = time.perf_counter() - start
+    print(f"{label:>13}: {len(items) / elapsed:12,.0f} blocks/s")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--sample', type=int, default=100000, help='blocks used for the throughput figures')
+    args = parser.parse_args()
+
+    blocks = measure('Block', lambda: build_blocks(args.count))
+    compact_blocks = measure('CompactBlock', lambda: [CompactBlock.from_block(block) for block in blocks])
+    del compact_blocks
+
+    sample = blocks[:args.sample]
+    encoded_json = throughput('to_json', lambda block: block.to_json(), sample)
+    throughput('from_json', Block.from_json, encoded_json)
+    compact_sample = [CompactBlock.from_block(block) for block in sample]
+    encoded = throughput('encode', CompactBlock.encode, compact_sample)
+    throughput('decode', CompactBlock.decode, encoded)
+    print(f"{'size':>13}: {sum(map(len, encoded_json)) / len(sample):.0f} B/block JSON, "
+          f"{sum(map(len, encoded)) / len(sample):.0f} B/block binary")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Load test simulating many concurrent peers registering, submitting transactions and mining.
+
+Every peer runs in its own thread: it registers through `peers_handler`, submits transactions with
+`submit_transaction` at the given rate and asks for a mining job every `--mine-every` transactions. Once done, it mines
+until its queue is empty. The latency of every event is reported by percentile, then the final chain is checked: each
+transaction the server acknowledged as accepted must be confirmed exactly once, otherwise it was lost or duplicated by a
+race. Rejected transactions are only counted.
+
+In-process, Socket.IO test clients against the module-level blockchain:
+
+    $ python -m benchmarks.load_test --peers 200 --transactions 20 --rate 10
+
+Against a running server, e.g. `python run.py`, with Socket.IO clients:
+
+    $ python -m benchmarks.load_test --url http://127.0.0.1:5000 --peers 50
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, max(math.ceil(fraction * len(ordered)) - 1, 0))]
+
+
+class EventFailed(Exception):
+    """Raised when an event raised or got no acknowledgement in time."""
+
+
+class InProcessPeer:
+    """Peer talking to the app of this process through a Socket.IO test client."""
+    def __init__(self, app) -> None:
+        from blockchain_demo import socket_io
+        self.client = socket_io.test_client(app)
+
+    def call(self, event: str, *args, timeout: float) -> Any:
+        ack = self.client.emit(event, *args, callback=True)
+        # Broadcasts to every peer pile up in the test client otherwise.
+        self.client.get_received()
+        # The test client returns the acknowledgement arguments as a list unless there is exactly one.
+        return None if ack == [] else ack
+
+    def wait_for_job(self, job_id: str, timeout: float) -> str:
+        from blockchain_demo.main import mining_jobs
+        job = mining_jobs.jobs[job_id]
+        job.done.wait(timeout)
+        return job.status
+
+    def close(self) -> None:
+        self.client.disconnect()
+
+
+class RemotePeer:
+    """Peer talking to a running server through a Socket.IO client."""
+    def __init__(self, url: str) -> None:
+        import socketio
+        self.client = socketio.Client()
+        self.finished: Dict[str, str] = {}
+        self.job_done = threading.Condition()
+        self.client.on('mining_job_finished', self._job_finished)
+        self.client.connect(url)
+
+    def _job_finished(self, job: dict) -> None:
+        with self.job_done:
+            self.finished[job['job_id']] = job['status']
+            self.job_done.notify_all()
+
+    def call(self, event: str, *args, timeout: float) -> Any:
+        return self.client.call(event, args[0] if len(args) == 1 else args, timeout=timeout)
+
+    def wait_for_job(self, job_id: str, timeout: float) -> str:
+        with self.job_done:
+            self.job_done.wait_for(lambda: job_id in self.finished, timeout)
+            return self.finished.pop(job_id, 'timeout')
+
+    def close(self) -> None:
+        self.client.disconnect()
+
+
+class LoadTest:
+    """
+    Runs the simulated peers and gathers their measurements.
+
+    Parameters
+    ----------
+    connect: Callable
+        Builds the connection of one peer, an `InProcessPeer` or a `RemotePeer`.
+    peers: int
+        Number of simulated peers.
+    transactions: int
+        Transactions submitted by each peer.
+    rate: float
+        Transactions per second submitted by each peer, 0 submits as fast as possible.
+    mine_every: int
+        Transactions a peer submits between two mining requests, 0 only mines at the end.
+    timeout: float
+        Seconds an event waits for its acknowledgement before it counts as failed.
+    job_timeout: float
+        Seconds a peer waits for one of its mining jobs while draining its queue.
+    """
+    def __init__(self, connect, peers: int = 100, transactions: int = 20, rate: float = 0.0, mine_every: int = 5,
+                 timeout: float = 30.0, job_timeout: float = 120.0) -> None:
+        self.connect = connect
+        self.peers = peers
+        self.transactions = transactions
+        self.rate = rate
+        self.mine_every = mine_every
+        self.timeout = timeout
+        self.job_timeout = job_timeout
+        self.run_id = uuid.uuid4().hex[:8]
+        self.latencies: Dict[str, List[float]] = {}
+        self.failures: Counter = Counter()
+        self.submitted: Dict[str, List[str]] = {}
+        """dict: Contents of the transactions of each peer the server acknowledged as accepted."""
+
+        self.rejected = 0
+        """int: Number of transactions the server acknowledged as rejected."""
+
+        self.drained: Dict[str, bool] = {}
+        """dict: Whether each peer mined until its queue was empty, only such peers can tell a lost update."""
+
+        self.lock = threading.Lock()
+
+    def _timed(self, peer, event: str, *args) -> Any:
+        """Acknowledgement of the event, raises `EventFailed` if there is none in time."""
+        start = time.perf_counter()
+        try:
+            result = peer.call(event, *args, timeout=self.timeout)
+        except Exception as exception:
+            with self.lock:
+                self.failures[event] += 1
+            raise EventFailed(event) from exception
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies.setdefault(event, []).append(elapsed)
+        return result
+
+    def _run_peer(self, number: int, ready: threading.Barrier) -> None:
+        name = f'load {self.run_id} {number}'
+        contents = self.submitted[name] = []
+        self.drained[name] = False
+        try:
+            peer = self.connect()
+        except Exception:
+            with self.lock:
+                self.failures['connect'] += 1
+            ready.abort()
+            return
+        try:
+            try:
+                self._timed(peer, 'peers_handler', name)
+            finally:
+                try:
+                    ready.wait()
+                except threading.BrokenBarrierError:
+                    # A peer could not connect, the others start anyway.
+                    pass
+            next_submit = time.perf_counter()
+            for position in range(self.transactions):
+                if self.rate:
+                    time.sleep(max(next_submit - time.perf_counter(), 0))
+                    next_submit += 1 / self.rate
+                content = f'{name} transaction {position}'
+                if self._timed(peer, 'submit_transaction', {'block_author': name, 'block_text': content}):
+                    contents.append(content)
+                else:
+                    with self.lock:
+                        self.rejected += 1
+                if self.mine_every and (position + 1) % self.mine_every == 0:
+                    self._timed(peer, 'mine_unconfirmed_transactions', name)
+            # Drain: mine until the peer's queue is empty.
+            while True:
+                job_id = self._timed(peer, 'mine_unconfirmed_transactions', name)
+                if job_id is None:
+                    self.drained[name] = True
+                    break
+                status = peer.wait_for_job(job_id, self.job_timeout)
+                if status not in ('mined', 'empty'):
+                    with self.lock:
+                        self.failures[f'mining job {status}'] += 1
+                    break
+        except EventFailed:
+            # The peer gives up, its transactions are still counted but can't be told lost.
+            pass
+        except Exception:
+            with self.lock:
+                self.failures['peer'] += 1
+            raise
+        finally:
+            peer.close()
+
+    def run(self) -> float:
+        """Runs every peer to completion, returns the elapsed seconds."""
+        ready = threading.Barrier(self.peers)
+        threads = [threading.Thread(target=self._run_peer, args=(number, ready), daemon=True)
+                   for number in range(self.peers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def check_chain(self, chain: List[dict]) -> Dict[str, int]:
+        """
+        Parameters
+        ----------
+        chain:
+            Blocks of the final chain, as returned by `/chain`.
+
+        Returns
+        -------
+        dict:
+            Number of accepted transactions `submitted`, `confirmed`, `lost` (never confirmed although their peer
+            emptied its queue), `unchecked` (never confirmed, their peer gave up) and `duplicated` (confirmed more than
+            once).
+        """
+        confirmed = Counter(transaction.get('content') for block in chain for transaction in block['transactions']
+                            if isinstance(transaction, dict))
+        updates = Counter(submitted=0, confirmed=0, lost=0, unchecked=0, duplicated=0)
+        for name, contents in self.submitted.items():
+            for content in contents:
+                updates['submitted'] += 1
+                if confirmed[content]:
+                    updates['confirmed'] += 1
+                    updates['duplicated'] += confirmed[content] > 1
+                else:
+                    updates['lost' if self.drained[name] else 'unchecked'] += 1
+        return dict(updates)
+
+    def report(self, elapsed: float, chain: List[dict]) -> dict:
+        events = {}
+        for event, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            events[event] = {'count': len(ordered),
+                             'failures': self.failures.get(event, 0),
+                             'throughput': len(ordered) / elapsed,
+                             'p50': percentile(ordered, 0.5),
+                             'p95': percentile(ordered, 0.95),
+                             'p99': percentile(ordered, 0.99)}
+        updates = self.check_chain(chain)
+        return {'peers': self.peers,
+                'elapsed': elapsed,
+                'transactions_per_second': updates['confirmed'] / elapsed,
+                'events': events,
+                'failures': dict(self.failures),
+                'rejected': self.rejected,
+                'updates': updates}
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['peers']} peers, {report['elapsed']:.2f}s, "
+          f"{report['transactions_per_second']:.1f} confirmed transactions/s")
+    print(f"{'event':>32} {'count':>7} {'failed':>7} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for event, stats in report['events'].items():
+        print(f"{event:>32} {stats['count']:>7} {stats['failures']:>7} {stats['throughput']:>9.1f} "
+              f"{stats['p50'] * 1000:>9.2f} {stats['p95'] * 1000:>9.2f} {stats['p99'] * 1000:>9.2f}")
+    updates = report['updates']
+    print(f"submitted {updates['submitted']}, confirmed {updates['confirmed']}, lost {updates['lost']}, "
+          f"unchecked {updates['unchecked']}, duplicated {updates['duplicated']}, rejected {report['rejected']}")
+    for failure, count in report['failures'].items():
+        print(f'FAILED {failure}: {count}')
+
+
+def run(peers: int = 100, transactions: int = 20, rate: float = 0.0, mine_every: int = 5,
+        url: Optional[str] = None, timeout: float = 30.0) -> dict:
+    if url:
+        import requests
+
+        load_test = LoadTest(lambda: RemotePeer(url), peers, transactions, rate, mine_every, timeout)
+        elapsed = load_test.run()
+        chain = requests.get(f'{url}/chain').json()['chain']
+    else:
+        from blockchain_demo import create_app
+
+        app = create_app({'TESTING': True})
+        load_test = LoadTest(lambda: InProcessPeer(app), peers, transactions, rate, mine_every, timeout)
+        elapsed = load_test.run()
+        chain = json.loads(app.test_client().get('/chain').data)['chain']
+    return load_test.report(elapsed, chain)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--peers', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=20, help='transactions submitted by each peer')
+    parser.add_argument('--rate', type=float, default=0.0, help='transactions per second per peer, 0 for no limit')
+    parser.add_argument('--mine-every', type=int, default=5, help='transactions between two mining requests')
+    parser.add_argument('--url', help='server to load, the app is run in-process by default')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds an event waits for its acknowledgement')
+    parser.add_argument('--output', help='JSON file the report is written to')
+    args = parser.parse_args()
+
+    report = run(args.peers, args.transactions, args.rate, args.mine_every, args.url, args.timeout)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    return 1 if report['failures'] or report['updates']['lost'] or report['updates']['duplicated'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Nonces per second of the legacy JSON hash versus the midstate header hash, by transaction count.
+
+Run from the repository root:
+
+    $ python -m benchmarks.pow_midstate
+"""
+import argparse
+import time
+from datetime import datetime
+from hashlib import sha256
+
+from blockchain_demo.main import Block, NONCE_STRUCT
+
+
+def legacy_rate(block: Block, attempts: int) -> float:
+    start = time.perf_counter()
+    for nonce in range(attempts):
+        block.nonce = nonce
+        block.create_hash
+    return attempts / (time.perf_counter() - start)
+
+
+def midstate_rate(block: Block, attempts: int) -> float:
+    start = time.perf_counter()
+    midstate = sha256(block.header_prefix)
+    for nonce in range(attempts):
+        attempt = midstate.copy()
+        attempt.update(NONCE_STRUCT.pack(nonce))
+        attempt.hexdigest()
+    return attempts / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'transactions':>12} {'legacy n/s':>14} {'midstate n/s':>14} {'speedup':>8}")
+    for size in args.sizes:
+        transactions = [{'content': f'transaction {i}', 'author': 'bench', 'author_id': 'id'} for i in range(size)]
+        block = Block(1, transactions, datetime.now(), '0' * 64)
+        legacy = legacy_rate(block, args.attempts)
+        midstate = midstate_rate(block, args.attempts)
+        print(f"{size:>12} {legacy:>14,.0f} {midstate:>14,.0f} {midstate / legacy:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Benchmark suite for hashing, mining, serialization, signature, ledger reopening and Socket.IO throughput.
+
+Run every case and save the results, optionally comparing them with a saved baseline:
+
+    $ python -m benchmarks.suite run --output bench.json [--baseline baseline.json] [--quick]
+
+Compare two saved result files, the exit status is 1 when a case regressed by more than the tolerance:
+
+    $ python -m benchmarks.suite compare baseline.json bench.json --tolerance 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from hashlib import sha256
+from typing import Callable, Dict, List
+
+from Crypto.PublicKey import ECC
+
+from blockchain_demo import create_app, socket_io
+from blockchain_demo import main as blockchain_main
+from blockchain_demo.ledger import Ledger, coinbase
+from blockchain_demo.main import Block, BlockChain
+from blockchain_demo.signatures import SignatureVerifier, sign_transaction
+from blockchain_demo.storage import LEDGER_NAME, BlockStore
+
+Results = Dict[str, Dict[str, object]]
+
+
+def best_rate(operation: Callable[[], int], repeat: int = 3) -> float:
+    """Best operations per second over `repeat` runs of `operation`, which returns how many operations it did."""
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operations = operation()
+        rates.append(operations / (time.perf_counter() - start))
+    return max(rates)
+
+
+def sample_transactions(count: int) -> List[dict]:
+    return [{'content': f'transaction {i}', 'author': 'bench', 'author_id': 'id',
+             'timestamp': str(datetime.now())} for i in range(count)]
+
+
+def bench_create_hash(results: Results, quick: bool) -> None:
+    for size in (1, 10, 100) if quick else (1, 10, 100, 1000):
+        block = Block(1, sample_transactions(size), datetime.now(), '0' * 64)
+        attempts = 200 if size >= 100 else 2000
+
+        def hash_block() -> int:
+            for _ in range(attempts):
+                block.create_hash
+            return attempts
+
+        results[f'create_hash[{size} tx]'] = {'value': best_rate(hash_block), 'unit': 'hashes/s',
+                                              'higher_is_better': True}
+
+
+def bench_proof_of_work(results: Results, quick: bool) -> None:
+    blockchain = BlockChain()
+    for difficulty in (2, 3, 4) if quick else (2, 3, 4, 5):
+        blockchain.difficulty = difficulty
+        blocks = 3 if difficulty >= 4 else 20
+        start = time.perf_counter()
+        for index in range(blocks):
+            blockchain.proof_of_work(Block(index, sample_transactions(10), datetime.now(), '0' * 64))
+        results[f'proof_of_work[difficulty {difficulty}]'] = {'value': (time.perf_counter() - start) / blocks,
+                                                              'unit': 's/block', 'higher_is_better': False}
+
+
+def bench_chain_serialization(results: Results, quick: bool) -> None:
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    original_chain = blockchain_main.blockchain.chain
+    try:
+        for size in (1000, 10000) if quick else (1000, 10000, 100000):
+            chain = []
+            for index in range(size):
+                block = Block(index, sample_transactions(1), datetime.now(), chain[-1].hash if chain else '0')
+                block.hash = sha256(str(index).encode()).hexdigest()
+                chain.append(block)
+            blockchain_main.blockchain.chain = chain
+
+            def get_chain() -> int:
+                client.get('/chain')
+                return 1
+
+            get_chain()
+            results[f'/chain[{size} blocks]'] = {'value': best_rate(get_chain), 'unit': 'requests/s',
+                                                 'higher_is_better': True}
+    finally:
+        blockchain_main.blockchain.chain = original_chain
+
+
+def bench_add_new_transaction(results: Results, quick: bool) -> None:
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    blockchain = blockchain_main.blockchain
+    blockchain.peers['bench'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    requests = 500 if quick else 2000
+    counter = iter(range(10 ** 9))
+
+    def post_transactions() -> int:
+        for _ in range(requests):
+            client.post('/add_new_transaction',
+                        json={'content': f'bench {next(counter)}', 'author': 'bench', 'author_id': 'id'})
+        return requests
+
+    results['add_new_transaction'] = {'value': best_rate(post_transactions), 'unit': 'requests/s',
+                                      'higher_is_better': True}
+
+
+def bench_add_new_transactions(results: Results, quick: bool) -> None:
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    blockchain = blockchain_main.blockchain
+    blockchain.peers['bench batch'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    batch_size = 5000 if quick else 20000
+    counter = iter(range(10 ** 9))
+
+    def post_batch() -> int:
+        lines = '\n'.join(json.dumps({'content': f'bench batch {next(counter)}', 'author': 'bench batch',
+                                       'author_id': 'id'}) for _ in range(batch_size))
+        client.post('/add_new_transactions', data=lines, content_type='application/x-ndjson')
+        blockchain.mempool.remove(list(blockchain.mempool.by_author.get('bench batch', ())))
+        return batch_size
+
+    results['add_new_transactions ndjson'] = {'value': best_rate(post_batch), 'unit': 'transactions/s',
+                                              'higher_is_better': True}
+
+
+def bench_signature_verification(results: Results, quick: bool) -> None:
+    key = ECC.generate(curve='P-256')
+    transactions = [sign_transaction(transaction, key) for transaction in sample_transactions(100 if quick else 500)]
+    verifier = SignatureVerifier()
+
+    def verify_uncached() -> int:
+        verifier.verified.clear()
+        verifier.verify_many(transactions)
+        return len(transactions)
+
+    def verify_cached() -> int:
+        verifier.verify_many(transactions)
+        return len(transactions)
+
+    results['signature verification'] = {'value': best_rate(verify_uncached), 'unit': 'signatures/s',
+                                         'higher_is_better': True}
+    results['signature verification cached'] = {'value': best_rate(verify_cached), 'unit': 'signatures/s',
+                                                'higher_is_better': True}
+
+
+def bench_socketio_round_trip(results: Results, quick: bool) -> None:
+    app = create_app({'TESTING': True})
+    client = socket_io.test_client(app)
+    round_trips = 500 if quick else 2000
+
+    def ping() -> int:
+        for _ in range(round_trips):
+            client.emit('my_ping')
+            client.get_received()
+        return round_trips
+
+    results['socketio my_ping round trip'] = {'value': best_rate(ping), 'unit': 'round trips/s',
+                                              'higher_is_better': True}
+
+
+def bench_ledger_reopen(results: Results, quick: bool) -> None:
+    """Time to rebuild the ledger of a reopened block store, from its journal or by applying every block."""
+    authors = [f'author {number}' for number in range(100)]
+    with tempfile.TemporaryDirectory() as path:
+        store = BlockStore(path, Block.from_json)
+        for index in range(1000 if quick else 10000):
+            transactions = [{'author': authors[(index + number) % 100], 'recipient': authors[number], 'amount': 1,
+                             'nonce': index} for number in range(10)] + [coinbase(authors[index % 100], 50, index)]
+            block = Block(index, transactions, datetime.now(), store[-1].hash if store else '0')
+            block.hash = sha256(str(index).encode()).hexdigest()
+            store.append(block)
+        Ledger(path=os.path.join(path, LEDGER_NAME)).update(store)
+        for name, journal in (('journal', os.path.join(path, LEDGER_NAME)), ('replay', None)):
+            start = time.perf_counter()
+            Ledger(path=journal).update(BlockStore(path, Block.from_json))
+            results[f'ledger_reopen[{len(store)} blocks, {name}]'] = {'value': time.perf_counter() - start,
+                                                                      'unit': 's', 'higher_is_better': False}
+        store.close()
+
+
+CASES = [bench_create_hash, bench_proof_of_work, bench_chain_serialization, bench_add_new_transaction,
+         bench_add_new_transactions, bench_signature_verification, bench_ledger_reopen, bench_socketio_round_trip]
+
+
+def run(quick: bool = False) -> dict:
+    results: Results = {}
+    for case in CASES:
+        case(results, quick)
+    return {'meta': {'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'date': str(datetime.now()),
+                     'quick': quick},
+            'results': results}
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """
+    Returns
+    -------
+    list:
+        One line per case that got worse than the baseline by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        if result['higher_is_better']:
+            change = (reference['value'] - result['value']) / reference['value']
+        else:
+            change = (result['value'] - reference['value']) / reference['value']
+        if change > tolerance:
+            regressions.append(f"{name}: {reference['value']:.6g} -> {result['value']:.6g} {result['unit']} "
+                               f"({change:.0%} worse)")
+    return regressions
+
+
+def print_results(results: Results) -> None:
+    for name, result in results.items():
+        print(f"{name:>36}: {result['value']:14.6g} {result['unit']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--output', default='bench_output.json', help='JSON file the results are written to')
+    run_parser.add_argument('--baseline', help='JSON results to compare with')
+    run_parser.add_argument('--tolerance', type=float, default=0.1)
+    run_parser.add_argument('--quick', action='store_true', help='smaller sizes and difficulties')
+    compare_parser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        current = run(args.quick)
+        print_results(current['results'])
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2)
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    else:
+        with open(args.baseline) as baseline_file, open(args.current) as current_file:
+            baseline, current = json.load(baseline_file), json.load(current_file)
+
+    regressions = compare(baseline, current, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
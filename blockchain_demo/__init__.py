@@ -11,18 +11,44 @@ def create_app(test_config: Any = None) -> App:
     app = Flask(__name__, instance_relative_config=True)
     app.config.from_mapping(
         SECRET_KEY='secret!',
+        MINING_WORKERS=1,
+        BLOCK_STORE_PATH=None,
+        BLOCK_SIZE=1000,
+        TARGET_BLOCK_TIME=None,
+        RETARGET_WINDOW=10,
+        MEMPOOL_MAX_BYTES=64 * 1024 * 1024,
+        MEMPOOL_MAX_AUTHOR_BYTES=4 * 1024 * 1024,
+        VALIDATION_WORKERS=1,
+        VALIDATE_ON_LOAD=False,
+        CHECKPOINTS_PATH=None,
+        REQUIRE_SIGNATURES=False,
+        SIGNATURE_WORKERS=1,
+        INDEX_PAGE_SIZE=20,
+        STATE_BACKEND_PATH=None,
+        SOCKETIO_MESSAGE_QUEUE=None,
+        NODE_URL=None,
+        NODE_PEERS=[],
+        GOSSIP_INTERVAL=0.2,
+        GENESIS_TIMESTAMP=None,
+        BLOCK_REWARD=0,
+        LEDGER_SNAPSHOT_INTERVAL=100,
+        PRUNE_DEPTH=None,
+        PRUNE_MAX_BYTES=None,
+        PRUNE_ARCHIVE_PATH=None,
     )
 
     if test_config is None:
         # load the instance config, if it exists, when not testing
         app.config.from_pyfile('config.py', silent=True)
+        # several nodes run from one checkout each get their own settings file
+        app.config.from_envvar('BLOCKCHAIN_SETTINGS', silent=True)
     else:
         # load the test config if passed in
         app.config.from_mapping(test_config)
 
     from blockchain_demo.main import main as main_blueprint
+    # the blueprint's setup starts background tasks through the server, so it is initialized first
+    socket_io.init_app(app, message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
     app.register_blueprint(main_blueprint)
     app.add_url_rule('/', endpoint='blockchain_index')
-
-    socket_io.init_app(app)
     return app
@@ -0,0 +1,311 @@
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping, Sequence
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from blockchain_demo.ledger import replay_key
+from blockchain_demo.mempool import AuthorQueue, transaction_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (height INTEGER PRIMARY KEY, hash TEXT NOT NULL, prev_hash TEXT NOT NULL,
+                                   data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS mempool (seq INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT NOT NULL UNIQUE,
+                                    author TEXT NOT NULL, size INTEGER NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS mempool_author ON mempool (author, seq);
+CREATE TABLE IF NOT EXISTS peers (name TEXT PRIMARY KEY, sid TEXT);
+"""
+
+
+class ChainConflict(Exception):
+    """Raised when a block is appended on top of a tip that another worker has already extended."""
+
+
+class SQLiteDatabase:
+    """
+    SQLite database in WAL mode shared by every worker process, with one connection per thread.
+
+    WAL lets readers go on while a writer commits, writes are serialized by `BEGIN IMMEDIATE` transactions.
+
+    Parameters
+    ----------
+    path: str
+        Database file, created if missing.
+    timeout: float
+        Seconds a writer waits for the write lock of another process.
+    """
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.connection.executescript(SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def query(self, sql: str, parameters: tuple = ()) -> List[tuple]:
+        return self.connection.execute(sql, parameters).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction holding the database write lock from its start, rolled back on error."""
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+
+class SQLiteChain(Sequence):
+    """
+    Blocks stored in a shared SQLite database, usable wherever `BlockChain.chain` is a list.
+
+    `append` checks inside the write transaction that the block extends the stored tip, so two workers committing a
+    block at the same height can't both succeed: the second one gets a `ChainConflict`. A reorganization goes through
+    `replace`, which drops the replaced blocks and appends the new branch in a single transaction.
+
+    Parameters
+    ----------
+    database: SQLiteDatabase
+        Shared database.
+    decode: Callable
+        Builds a block from its stored JSON text, written with the block's `to_json`.
+    """
+    def __init__(self, database: SQLiteDatabase, decode: Callable[[str], Any]) -> None:
+        self.database = database
+        self.decode = decode
+
+    def __len__(self) -> int:
+        # The height is the primary key, its maximum is one index lookup where COUNT(*) scans the whole table.
+        return self.database.query('SELECT COALESCE(MAX(height) + 1, 0) FROM blocks')[0][0]
+
+    def __getitem__(self, height: Union[int, slice]):
+        if isinstance(height, slice):
+            start, stop, step = height.indices(len(self))
+            rows = self.database.query('SELECT data FROM blocks WHERE height >= ? AND height < ? ORDER BY height',
+                                       (start, stop))
+            return [self.decode(data) for data, in rows][::step]
+        if height < 0:
+            rows = self.database.query('SELECT data FROM blocks ORDER BY height DESC LIMIT 1 OFFSET ?',
+                                       (-height - 1,))
+        else:
+            rows = self.database.query('SELECT data FROM blocks WHERE height = ?', (height,))
+        if not rows:
+            raise IndexError('block height out of range')
+        return self.decode(rows[0][0])
+
+    def append(self, block) -> None:
+        """Stores a sealed block at the next height, raises `ChainConflict` if it doesn't extend the stored tip."""
+        with self.database.transaction() as connection:
+            self._append(connection, block)
+
+    @staticmethod
+    def _append(connection: sqlite3.Connection, block) -> None:
+        tip = connection.execute('SELECT height, hash FROM blocks ORDER BY height DESC LIMIT 1').fetchone()
+        if (tip is None and block.index != 0) or (tip is not None and (tip[0] + 1, tip[1]) !=
+                                                   (block.index, block.prev_hash)):
+            raise ChainConflict(f'block {block.index} does not extend the stored tip {tip}')
+        connection.execute('INSERT INTO blocks VALUES (?, ?, ?, ?)',
+                           (block.index, block.hash, block.prev_hash, block.to_json()))
+
+    def replace(self, height: int, blocks: Iterable) -> None:
+        """
+        Drops the blocks from `height` on and appends `blocks` in one write transaction, so other workers never read
+        the shortened chain. If a block doesn't extend the one before, `ChainConflict` is raised and nothing changes.
+        """
+        with self.database.transaction() as connection:
+            connection.execute('DELETE FROM blocks WHERE height >= ?', (height,))
+            for block in blocks:
+                self._append(connection, block)
+
+    def truncate(self, height: int) -> None:
+        """Drops the blocks from `height` on, e.g. when a reorganization replaces them."""
+        with self.database.transaction() as connection:
+            connection.execute('DELETE FROM blocks WHERE height >= ?', (height,))
+
+
+class SQLiteMempool:
+    """
+    `Mempool` stored in a shared SQLite database, with the same interface, budgets and eviction order.
+
+    Transactions are returned decoded from their stored JSON, so they are equal to but not the objects queued.
+
+    Parameters
+    ----------
+    database: SQLiteDatabase
+        Shared database.
+    max_bytes: int
+        Memory budget of the whole pool.
+    max_author_bytes: int
+        Memory budget of a single author.
+    """
+    def __init__(self, database: SQLiteDatabase, max_bytes: int = 64 * 1024 * 1024,
+                 max_author_bytes: int = 4 * 1024 * 1024) -> None:
+        self.database = database
+        self.max_bytes = max_bytes
+        self.max_author_bytes = max_author_bytes
+        self.evicted = 0
+        """int: Number of transactions dropped by this process to stay within the memory budgets."""
+
+        self.lock = threading.RLock()
+
+    def add(self, transaction: Any, author: str) -> Optional[str]:
+        """Queues a transaction, see `Mempool.add`."""
+        encoded = json.dumps(transaction, sort_keys=True)
+        tx_hash = transaction_hash(transaction)
+        size = len(encoded.encode("utf-8"))
+        if size > min(self.max_author_bytes, self.max_bytes):
+            return None
+        with self.database.transaction() as connection:
+            if connection.execute('SELECT 1 FROM mempool WHERE hash = ?', (tx_hash,)).fetchone():
+                return None
+            key = replay_key(transaction)
+            if key is not None and connection.execute(
+                    "SELECT 1 FROM mempool WHERE author = ? AND json_extract(data, '$.author') = ? "
+                    "AND json_extract(data, '$.nonce') = ? AND json_extract(data, '$.recipient') IS NOT NULL",
+                    (author, *key)).fetchone():
+                return None
+            author_bytes, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM mempool WHERE author = ?',
+                                               (author,)).fetchone()
+            while author_bytes + size > self.max_author_bytes:
+                author_bytes -= self._evict_oldest(connection, author)
+            total_bytes, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM mempool').fetchone()
+            while total_bytes + size > self.max_bytes:
+                biggest, = connection.execute('SELECT author FROM mempool GROUP BY author ORDER BY SUM(size) DESC '
+                                              'LIMIT 1').fetchone()
+                total_bytes -= self._evict_oldest(connection, biggest)
+            connection.execute('INSERT INTO mempool (hash, author, size, data) VALUES (?, ?, ?, ?)',
+                               (tx_hash, author, size, encoded))
+        return tx_hash
+
+    def _evict_oldest(self, connection: sqlite3.Connection, author: str) -> int:
+        seq, size = connection.execute('SELECT seq, size FROM mempool WHERE author = ? ORDER BY seq LIMIT 1',
+                                       (author,)).fetchone()
+        connection.execute('DELETE FROM mempool WHERE seq = ?', (seq,))
+        self.evicted += 1
+        return size
+
+    def remove(self, tx_hashes: Iterable[str]) -> None:
+        """Drops the given transactions, unknown hashes are ignored."""
+        with self.database.transaction() as connection:
+            connection.executemany('DELETE FROM mempool WHERE hash = ?', ((tx_hash,) for tx_hash in tx_hashes))
+
+    def select(self, author: str, limit: Optional[int] = None) -> List[Tuple[str, Any]]:
+        """Up to `limit` `(hash, transaction)` pairs of `author`, oldest first."""
+        rows = self.database.query('SELECT hash, data FROM mempool WHERE author = ? ORDER BY seq LIMIT ?',
+                                   (author, -1 if limit is None else limit))
+        return [(tx_hash, json.loads(data)) for tx_hash, data in rows]
+
+    def get(self, tx_hash: str) -> Any:
+        """Queued transaction with this hash, None if there is none."""
+        rows = self.database.query('SELECT data FROM mempool WHERE hash = ?', (tx_hash,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def author(self, tx_hash: str) -> Optional[str]:
+        rows = self.database.query('SELECT author FROM mempool WHERE hash = ?', (tx_hash,))
+        return rows[0][0] if rows else None
+
+    def count(self, author: str) -> int:
+        return self.database.query('SELECT COUNT(*) FROM mempool WHERE author = ?', (author,))[0][0]
+
+    def author_counts(self) -> Dict[str, int]:
+        return dict(self.database.query('SELECT author, COUNT(*) FROM mempool GROUP BY author'))
+
+    @property
+    def total_bytes(self) -> int:
+        return self.database.query('SELECT COALESCE(SUM(size), 0) FROM mempool')[0][0]
+
+    def view(self, author: str) -> AuthorQueue:
+        return AuthorQueue(self, author)
+
+    def __contains__(self, tx_hash: str) -> bool:
+        return bool(self.database.query('SELECT 1 FROM mempool WHERE hash = ?', (tx_hash,)))
+
+    def __len__(self) -> int:
+        return self.database.query('SELECT COUNT(*) FROM mempool')[0][0]
+
+
+class SQLitePeers(MutableMapping):
+    """
+    Online peers stored in a shared SQLite database, by name.
+
+    Only the session id is stored. Each read builds the peer dictionary the in-memory backend keeps, with a mempool
+    view as 'queued_transactions' and the shared chain as 'chain'. Transactions in a plain 'queued_transactions' list
+    are moved to the mempool when a peer is stored.
+
+    Parameters
+    ----------
+    database: SQLiteDatabase
+        Shared database.
+    chain: SQLiteChain
+        Chain of every peer.
+    mempool: SQLiteMempool
+        Queued transactions of every peer.
+    """
+    def __init__(self, database: SQLiteDatabase, chain: SQLiteChain, mempool: SQLiteMempool) -> None:
+        self.database = database
+        self.chain = chain
+        self.mempool = mempool
+
+    def __getitem__(self, name: str) -> dict:
+        rows = self.database.query('SELECT sid FROM peers WHERE name = ?', (name,))
+        if not rows:
+            raise KeyError(name)
+        return {'id': rows[0][0], 'queued_transactions': self.mempool.view(name), 'chain': self.chain}
+
+    def __setitem__(self, name: str, peer: dict) -> None:
+        with self.database.transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO peers VALUES (?, ?)', (name, peer['id']))
+        queue = peer.get('queued_transactions', ())
+        if not isinstance(queue, AuthorQueue):
+            for transaction in queue:
+                self.mempool.add(transaction, name)
+
+    def __delitem__(self, name: str) -> None:
+        with self.database.transaction() as connection:
+            if not connection.execute('DELETE FROM peers WHERE name = ?', (name,)).rowcount:
+                raise KeyError(name)
+
+    def __contains__(self, name) -> bool:
+        return bool(self.database.query('SELECT 1 FROM peers WHERE name = ?', (name,)))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([name for name, in self.database.query('SELECT name FROM peers ORDER BY name')])
+
+    def __len__(self) -> int:
+        return self.database.query('SELECT COUNT(*) FROM peers')[0][0]
+
+
+class SQLiteBackend:
+    """
+    State shared by several worker processes, e.g. gunicorn workers, through one SQLite database.
+
+    Parameters
+    ----------
+    path: str
+        Database file, created if missing.
+    decode: Callable
+        Builds a block from its stored JSON text.
+    max_bytes: int
+        Memory budget of the whole mempool.
+    max_author_bytes: int
+        Memory budget of a single author.
+    """
+    def __init__(self, path: str, decode: Callable[[str], Any], max_bytes: int = 64 * 1024 * 1024,
+                 max_author_bytes: int = 4 * 1024 * 1024) -> None:
+        self.database = SQLiteDatabase(path)
+        self.chain = SQLiteChain(self.database, decode)
+        self.mempool = SQLiteMempool(self.database, max_bytes, max_author_bytes)
+        self.peers = SQLitePeers(self.database, self.chain, self.mempool)
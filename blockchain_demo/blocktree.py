@@ -0,0 +1,209 @@
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from blockchain_demo.mining import MAX_TARGET
+
+
+def block_work(target: int) -> int:
+    """int: Expected number of hashes needed to meet `target`."""
+    return (MAX_TARGET + 1) // (target + 1)
+
+
+class BlockNode:
+    """
+    Block of a `BlockTree`.
+
+    Parameters
+    ----------
+    block_hash: str
+        Hash of the block.
+    parent: BlockNode
+        Node of the previous block, None for the oldest node kept.
+    height: int
+        Index of the block.
+    work: int
+        Work of the branch from the oldest node kept up to this block.
+    block: Block
+        The block itself while it is off the main chain, main chain blocks are read from the chain storage.
+    miner: str
+        Peer that mined the block, None for a block received from outside.
+    """
+    __slots__ = ('hash', 'parent', 'height', 'work', 'main', 'block', 'miner')
+
+    def __init__(self, block_hash: str, parent: Optional['BlockNode'], height: int, work: int, block: Any = None,
+                 miner: Optional[str] = None) -> None:
+        self.hash = block_hash
+        self.parent = parent
+        self.height = height
+        self.work = work
+        self.main = block is None
+        self.block = block
+        self.miner = miner
+
+
+class BlockTree:
+    """
+    Every known block indexed by hash, the main chain and the competing branches.
+
+    Each node knows its parent and the cumulative work of the branch it ends, so attaching a block anywhere is a
+    dictionary lookup and choosing between tips compares two numbers. The best tip is the one with the most work, the
+    first one seen on a tie. Only the last `max_depth` main chain blocks are indexed: a branch forking deeper than that
+    is refused.
+
+    Parameters
+    ----------
+    work: Callable
+        Work of a block, see `block_work`.
+    max_depth: int
+        Number of main chain blocks below the tip a branch can fork from.
+    """
+    def __init__(self, work: Callable[[Any], int], max_depth: int = 1000) -> None:
+        self.work = work
+        self.max_depth = max_depth
+        self.nodes: Dict[str, BlockNode] = {}
+        self.tips: Set[str] = set()
+        """set: Hashes of the nodes without children."""
+
+        self.best: Optional[BlockNode] = None
+        self._chain = None
+
+    def load(self, chain) -> None:
+        """Indexes the last `max_depth` blocks of `chain` as the main chain, forgetting the other branches."""
+        self.nodes, self.tips, self.best, self._chain = {}, set(), None, chain
+        for block in chain[max(len(chain) - self.max_depth, 0):]:
+            self._append_main(block)
+
+    def sync(self, chain) -> None:
+        """Indexes the blocks appended to `chain` by someone else, reloads it if it was rewritten or replaced."""
+        if chain is not self._chain or self.best is None or len(chain) <= self.best.height:
+            self.load(chain)
+        elif chain[self.best.height].hash != self.best.hash:
+            self.load(chain)
+        else:
+            for block in chain[self.best.height + 1:]:
+                self._append_main(block)
+
+    def _append_main(self, block) -> None:
+        parent = self.best
+        node = BlockNode(block.hash, parent, block.index, (parent.work if parent else 0) + self.work(block))
+        self.nodes[node.hash] = node
+        self.tips.discard(parent.hash if parent else None)
+        self.tips.add(node.hash)
+        self.best = node
+        self._prune()
+
+    def add(self, block, miner: Optional[str] = None) -> Optional[BlockNode]:
+        """
+        Attaches a sealed block to its parent, off the main chain.
+
+        Returns
+        -------
+        BlockNode:
+            Node of the block, None if its parent is unknown or it is already known.
+        """
+        parent = self.nodes.get(block.prev_hash)
+        if parent is None or block.hash in self.nodes:
+            return None
+        node = BlockNode(block.hash, parent, block.index, parent.work + self.work(block), block, miner)
+        self.nodes[node.hash] = node
+        self.tips.discard(parent.hash)
+        self.tips.add(node.hash)
+        return node
+
+    def fork(self, node: BlockNode) -> Tuple[BlockNode, List[BlockNode], List[BlockNode]]:
+        """
+        Path from the best tip to `node`.
+
+        Returns
+        -------
+        tuple:
+            Common ancestor, main chain nodes above it from the tip down, nodes of the branch above it from the oldest.
+        """
+        added = []
+        while not node.main:
+            added.append(node)
+            node = node.parent
+        removed = []
+        current = self.best
+        while current is not node:
+            removed.append(current)
+            current = current.parent
+        return node, removed, added[::-1]
+
+    def switch(self, removed: List[BlockNode], removed_blocks: List[Any], added: List[BlockNode]) -> None:
+        """Records a main chain change, main chain nodes drop their block and the others keep theirs."""
+        for node, block in zip(removed, removed_blocks):
+            node.main, node.block = False, block
+        for node in added:
+            node.main, node.block = True, None
+        self.best = added[-1] if added else self.best
+        self._prune()
+
+    def ancestor(self, node: BlockNode, height: int) -> Optional[BlockNode]:
+        """Ancestor of `node` at `height`, None if it is the main chain one or not indexed."""
+        while node is not None and not node.main and node.height > height:
+            node = node.parent
+        if node is None or node.main or node.height != height:
+            return None
+        return node
+
+    def _prune(self) -> None:
+        """Forgets the nodes more than `max_depth` blocks below the best tip."""
+        floor = self.best.height - self.max_depth
+        if floor < 0 or len(self.nodes) <= self.max_depth:
+            return
+        for node in sorted(self.nodes.values(), key=lambda node: node.height):
+            if node.height < floor or (not node.main and node.parent.hash not in self.nodes):
+                # Branches forking below the floor can't be attached to the main chain anymore.
+                del self.nodes[node.hash]
+                self.tips.discard(node.hash)
+            elif node.parent is not None and node.parent.hash not in self.nodes:
+                node.parent = None
+
+
+class ChainView(Sequence):
+    """
+    A peer's chain: the main chain up to where the peer's branch forks from it, then the peer's own blocks.
+
+    The common prefix is read from the main chain storage, only the blocks of the peer's branch live in the tree, so a
+    view costs nothing until the peer mines off the main chain. A view without `tip` follows the main chain.
+
+    Parameters
+    ----------
+    blockchain: BlockChain
+        Blockchain holding the main chain in `chain` and the branches in `tree`.
+    tip: str
+        Hash of the last block of the peer's branch, None to follow the main chain.
+    """
+    def __init__(self, blockchain, tip: Optional[str] = None) -> None:
+        self.blockchain = blockchain
+        self.tip = tip
+
+    def _branch(self) -> Tuple[int, List[Any]]:
+        node = self.blockchain.tree.nodes.get(self.tip) if self.tip is not None else None
+        if node is None:
+            return len(self.blockchain.chain), []
+        own = []
+        while node is not None and not node.main:
+            own.append(node.block)
+            node = node.parent
+        if node is None:
+            return len(self.blockchain.chain), []
+        return node.height + 1, own[::-1]
+
+    def __len__(self) -> int:
+        fork_height, own = self._branch()
+        return fork_height + len(own)
+
+    def __getitem__(self, height: Union[int, slice]):
+        fork_height, own = self._branch()
+        total = fork_height + len(own)
+        if isinstance(height, slice):
+            start, stop, step = height.indices(total)
+            shared = list(self.blockchain.chain[start:min(stop, fork_height)]) if start < fork_height else []
+            return (shared + own[max(start - fork_height, 0):max(stop - fork_height, 0)])[::step]
+        if height < 0:
+            height += total
+        if not 0 <= height < total:
+            raise IndexError('block height out of range')
+        return self.blockchain.chain[height] if height < fork_height else own[height - fork_height]
@@ -0,0 +1,112 @@
+import json
+import struct
+from datetime import datetime, timedelta
+from typing import Any, Tuple
+
+COMPACT_HEADER = struct.Struct('>QqQ32s32s32s32sI')
+"""struct.Struct: Binary header (index, timestamp in microseconds since the epoch, nonce, prev_hash, Merkle root, hash,
+target, transactions payload length)."""
+
+NO_TARGET = bytes(32)
+"""bytes: `target` of blocks that don't record one."""
+
+EPOCH = datetime(1970, 1, 1)
+GENESIS_PREV_HASH = '0'
+"""str: `prev_hash` of the genesis block, stored as 32 zero bytes."""
+
+
+def hash_to_bytes(block_hash: str) -> bytes:
+    if block_hash == GENESIS_PREV_HASH:
+        return bytes(32)
+    return bytes.fromhex(block_hash)
+
+
+def hash_to_str(block_hash: bytes) -> str:
+    if block_hash == bytes(32):
+        return GENESIS_PREV_HASH
+    return block_hash.hex()
+
+
+class CompactBlock:
+    """
+    Immutable, memory compact counterpart of a sealed `Block`.
+
+    Fields live in `__slots__` instead of a per-instance `__dict__`, hashes are raw 32-byte strings instead of
+    hexadecimal text, the timestamp is an integer number of microseconds and the transactions a tuple. `encode` and
+    `decode` convert it to and from a fixed-width binary header followed by the JSON transactions.
+
+    Parameters
+    ----------
+    index: int
+        Position the block has in the blockchain.
+    timestamp: int
+        Microseconds since the epoch of when block was created.
+    nonce: int
+        Nonce satisfying the difficulty constraint.
+    prev_hash: bytes
+        Hash of the former block in chain.
+    merkle_root: bytes
+        Merkle root of the transactions.
+    hash: bytes
+        Hash of the block.
+    transactions: tuple
+        Block transactions.
+    target: bytes
+        Target recorded in the block, `NO_TARGET` if there is none.
+    """
+    __slots__ = ('index', 'timestamp', 'nonce', 'prev_hash', 'merkle_root', 'hash', 'transactions', 'target')
+
+    def __init__(self, index: int, timestamp: int, nonce: int, prev_hash: bytes, merkle_root: bytes, hash: bytes,
+                 transactions: Tuple[Any, ...], target: bytes = NO_TARGET) -> None:
+        for name, value in zip(self.__slots__, (index, timestamp, nonce, prev_hash, merkle_root, hash,
+                                                tuple(transactions), target)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactBlock):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self) -> int:
+        return hash(self.hash)
+
+    @classmethod
+    def from_block(cls, block) -> 'CompactBlock':
+        """Compacts a sealed `Block`."""
+        timestamp = datetime.fromisoformat(block.timestamp) - EPOCH
+        target = bytes.fromhex(block.target) if 'target' in block.__dict__ else NO_TARGET
+        return cls(block.index, timestamp // timedelta(microseconds=1), block.nonce, hash_to_bytes(block.prev_hash),
+                   bytes.fromhex(block.merkle_root), bytes.fromhex(block.hash), block.transactions, target)
+
+    def to_dict(self) -> dict:
+        """dict: Same fields as `Block.to_dict`, usable with `Block.from_dict`."""
+        block_data = {'index': self.index,
+                      'timestamp': str(EPOCH + timedelta(microseconds=self.timestamp)),
+                      'transactions': list(self.transactions),
+                      'prev_hash': hash_to_str(self.prev_hash),
+                      'nonce': self.nonce,
+                      'merkle_root': self.merkle_root.hex()}
+        if self.target != NO_TARGET:
+            block_data['target'] = self.target.hex()
+        block_data['hash'] = self.hash.hex()
+        return block_data
+
+    def encode(self) -> bytes:
+        """bytes: Binary header followed by the JSON transactions."""
+        payload = json.dumps(self.transactions).encode("utf-8")
+        return COMPACT_HEADER.pack(self.index, self.timestamp, self.nonce, self.prev_hash, self.merkle_root,
+                                   self.hash, self.target, len(payload)) + payload
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'CompactBlock':
+        """Inverse of `encode`."""
+        index, timestamp, nonce, prev_hash, merkle_root, block_hash, target, length = COMPACT_HEADER.unpack_from(data)
+        payload = data[COMPACT_HEADER.size:COMPACT_HEADER.size + length]
+        transactions = json.loads(payload) if length else ()
+        return cls(index, timestamp, nonce, prev_hash, merkle_root, block_hash, transactions, target)
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """
+    Least recently used cache of rendered HTML fragments.
+
+    Meant for sealed blocks: they never change, so a fragment keyed by the block hash can be reused by every request.
+
+    Parameters
+    ----------
+    maxsize: int
+        Number of fragments kept.
+    """
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.fragments = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        """Cached fragment for `key`, rendered with `render` on a miss."""
+        with self.lock:
+            fragment = self.fragments.get(key)
+            if fragment is not None:
+                self.fragments.move_to_end(key)
+                return fragment
+        fragment = Markup(render())
+        with self.lock:
+            self.fragments[key] = fragment
+            if len(self.fragments) > self.maxsize:
+                self.fragments.popitem(last=False)
+        return fragment
+
+    def discard(self, key: Hashable) -> None:
+        """Drops the fragment cached for `key`, if any, e.g. once the block it shows has changed."""
+        with self.lock:
+            self.fragments.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.fragments)
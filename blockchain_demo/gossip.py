@@ -0,0 +1,292 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from blockchain_demo.transactions import TransactionService
+
+Item = Tuple[str, str]
+"""tuple: Inventory item, `('block', block hash)` or `('tx', transaction hash)`."""
+
+
+def spawn_thread(target: Callable, *args) -> None:
+    threading.Thread(target=target, args=args, daemon=True).start()
+
+
+class GossipNode:
+    """
+    Block and transaction propagation between separate server processes over HTTP.
+
+    New blocks and transactions are queued as inventory items and announced to every peer node in the background, at
+    most every `interval` seconds. A node answers an announcement with the items it doesn't have yet, which are then
+    sent in batches. Items a peer announced or was sent are remembered per peer, so nothing is announced back to a
+    node that already has it.
+
+    A node that receives a block whose parent it doesn't know, or starts behind, catches up header first: it sends a
+    locator of its chain (hashes at exponentially spaced heights), the peer answers with the headers that follow the
+    highest common block, and only the bodies of the unknown headers are then downloaded, in ranges of `batch_size`.
+
+    Parameters
+    ----------
+    blockchain: BlockChain
+        Local chain, mempool and block tree.
+    decode: Callable
+        Builds a block from its `to_dict` output, raising ValueError when it is malformed.
+    is_confirmed: Callable
+        Whether a transaction hash is already in the chain, such transactions are not queued again.
+    start_task: Callable
+        Starts a function in the background with the given arguments.
+    sleep: Callable
+        Sleeps the given number of seconds, cooperating with `start_task`.
+    interval: float
+        Seconds between two announcement rounds.
+    batch_size: int
+        Maximum number of items sent, or headers and blocks requested, at once.
+    timeout: float
+        Seconds an HTTP request to a peer may take.
+    known_size: int
+        Number of items remembered per peer.
+    """
+    def __init__(self, blockchain, decode: Callable[[dict], Any], is_confirmed: Callable[[str], bool],
+                 start_task: Callable = spawn_thread, sleep: Callable[[float], None] = time.sleep,
+                 interval: float = 0.2, batch_size: int = 500, timeout: float = 5.0, known_size: int = 100_000) -> None:
+        self.blockchain = blockchain
+        self.transaction_service = TransactionService(blockchain)
+        self.decode = decode
+        self.is_confirmed = is_confirmed
+        self.start_task = start_task
+        self.sleep = sleep
+        self.interval = interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.known_size = known_size
+        self.url: Optional[str] = None
+        """str: Base URL other nodes reach this node at, sent along with every message."""
+
+        self.peers: List[str] = []
+        """list: Base URLs of the peer nodes."""
+
+        self.pending: OrderedDict = OrderedDict()
+        """OrderedDict: Items waiting to be announced."""
+
+        self.known: Dict[str, OrderedDict] = {}
+        """dict: Items each peer node is known to have."""
+
+        self.lock = threading.Lock()
+        self.running = False
+        self.syncing = set()
+        self.session = requests.Session()
+
+    def configure(self, url: str, peers: Iterable[str]) -> None:
+        self.url = url.rstrip('/') if url else url
+        self.peers = [peer.rstrip('/') for peer in peers if peer.rstrip('/') != self.url]
+        self.known = {peer: OrderedDict() for peer in self.peers}
+
+    def start(self) -> None:
+        """Catches up with every peer and announces new items until `stop`, in the background."""
+        if self.running or not self.peers:
+            return
+        self.running = True
+        self.start_task(self._run)
+
+    def stop(self) -> None:
+        self.running = False
+
+    def announce(self, kind: str, item_hash: str) -> None:
+        """Queues a new block or transaction for the next announcement round."""
+        if self.peers:
+            with self.lock:
+                self.pending[(kind, item_hash)] = None
+
+    def _run(self) -> None:
+        # Peers that are not up yet are caught up with as soon as they answer.
+        behind = list(self.peers)
+        while self.running:
+            behind = [peer for peer in behind if self.catch_up(peer) is None]
+            self.flush()
+            self.sleep(self.interval)
+
+    def _remember(self, peer: str, items: Iterable[Item]) -> None:
+        known = self.known.get(peer)
+        if known is None:
+            return
+        with self.lock:
+            for item in items:
+                known[item] = None
+                known.move_to_end(item)
+            while len(known) > self.known_size:
+                known.popitem(last=False)
+
+    def _post(self, peer: str, path: str, message: dict) -> dict:
+        response = self.session.post(peer + path, json=dict(message, node=self.url), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def flush(self) -> None:
+        """Announces the pending items to every peer that may not have them, and sends the ones it asks for."""
+        with self.lock:
+            items = list(self.pending)
+            self.pending.clear()
+        if not items:
+            return
+        for peer in self.peers:
+            with self.lock:
+                inventory = [item for item in items if item not in self.known[peer]]
+            for position in range(0, len(inventory), self.batch_size):
+                batch = inventory[position:position + self.batch_size]
+                try:
+                    answer = self._post(peer, '/gossip/inv',
+                                        {'inventory': [{'type': kind, 'hash': item_hash} for kind, item_hash in batch]})
+                    self._remember(peer, batch)
+                    self.send(peer, [(item['type'], item['hash']) for item in answer.get('wanted', [])])
+                except (requests.RequestException, ValueError, KeyError, TypeError):
+                    # The peer is down: it catches up on its own blocks when it comes back.
+                    break
+
+    def send(self, peer: str, items: List[Item]) -> None:
+        """Sends the requested blocks, oldest first, and transactions still at hand."""
+        blocks, transactions = [], []
+        with self.blockchain.lock:
+            self.blockchain.tree.sync(self.blockchain.chain)
+            for kind, item_hash in items:
+                if kind == 'block':
+                    block = self._block(item_hash)
+                    if block is not None:
+                        blocks.append(block.to_dict())
+                elif kind == 'tx':
+                    transaction = self.blockchain.mempool.get(item_hash)
+                    author = self.blockchain.mempool.author(item_hash)
+                    if transaction is not None:
+                        transactions.append({'transaction': transaction, 'author': author})
+        if blocks or transactions:
+            blocks.sort(key=lambda block: block['index'])
+            self._post(peer, '/gossip/data', {'blocks': blocks, 'transactions': transactions})
+            self._remember(peer, items)
+
+    def has_block(self, block_hash: str) -> bool:
+        """Whether the block is in the block tree, on the main chain or a competing branch."""
+        with self.blockchain.lock:
+            self.blockchain.tree.sync(self.blockchain.chain)
+            return block_hash in self.blockchain.tree.nodes
+
+    def _block(self, block_hash: str):
+        node = self.blockchain.tree.nodes.get(block_hash)
+        if node is None:
+            return None
+        return self.blockchain.chain[node.height] if node.main else node.block
+
+    def receive_inventory(self, node: str, inventory: List[dict]) -> List[dict]:
+        """
+        Returns
+        -------
+        list:
+            Announced items this node doesn't have.
+        """
+        items = [(item.get('type'), item.get('hash')) for item in inventory]
+        self._remember(node, items)
+        wanted = []
+        for kind, item_hash in items:
+            if kind == 'block' and not self.has_block(item_hash):
+                wanted.append({'type': kind, 'hash': item_hash})
+            elif kind == 'tx' and item_hash not in self.blockchain.mempool and not self.is_confirmed(item_hash):
+                wanted.append({'type': kind, 'hash': item_hash})
+        return wanted
+
+    def receive_data(self, node: str, blocks: List[dict], transactions: List[dict]) -> dict:
+        """
+        Queues the received transactions that pass the checks of a submitted one and imports the received blocks,
+        starting a catch up with the sender at the first block whose parent is unknown.
+
+        Returns
+        -------
+        dict:
+            Number of transactions queued and blocks imported.
+        """
+        results = self.transaction_service.submit_many(
+            (entry.get('transaction') if isinstance(entry, dict) else entry for entry in transactions), relayed=True)
+        accepted = [('tx', result['hash']) for result in results if result['accepted']]
+        self._remember(node, accepted)
+        queued = len(accepted)
+
+        imported = 0
+        for block_data in blocks:
+            block = self.decode(block_data)
+            self._remember(node, [('block', block.hash)])
+            if self.has_block(block.hash):
+                continue
+            if not self.has_block(block.prev_hash):
+                if node in self.known:
+                    self.start_task(self.catch_up, node)
+                break
+            if not self.blockchain.import_block(block):
+                break
+            imported += 1
+        return {'queued': queued, 'imported': imported}
+
+    def locator(self) -> List[dict]:
+        """Main chain `{index, hash}` from the tip down, at exponentially growing distances, ending with the genesis."""
+        with self.blockchain.lock:
+            chain = self.blockchain.chain
+            height, step, locator = len(chain) - 1, 1, []
+            while height > 0:
+                locator.append({'index': height, 'hash': chain[height].hash})
+                if len(locator) >= 10:
+                    step *= 2
+                height -= step
+            locator.append({'index': 0, 'hash': chain[0].hash})
+        return locator
+
+    def headers(self, locator: List[dict], limit: int) -> dict:
+        """Headers of the main chain after the highest locator block it holds, `limit` of them at most."""
+        with self.blockchain.lock:
+            chain = self.blockchain.chain
+            start = 0
+            for entry in locator:
+                index = entry.get('index')
+                if isinstance(index, int) and 0 <= index < len(chain) and chain[index].hash == entry.get('hash'):
+                    start = index + 1
+                    break
+            blocks = chain[start:start + min(limit, self.batch_size)]
+            return {'length': len(chain),
+                    'headers': [{'index': block.index, 'hash': block.hash, 'prev_hash': block.prev_hash}
+                                for block in blocks]}
+
+    def catch_up(self, peer: str) -> Optional[int]:
+        """
+        Downloads the blocks of `peer`'s chain this node doesn't have, headers first.
+
+        Returns
+        -------
+        int:
+            Number of blocks imported, None if `peer` could not be reached.
+        """
+        with self.lock:
+            if peer in self.syncing:
+                return 0
+            self.syncing.add(peer)
+        imported = 0
+        try:
+            while True:
+                answer = self._post(peer, '/gossip/headers', {'locator': self.locator(), 'limit': self.batch_size})
+                headers = [header for header in answer.get('headers', []) if not self.has_block(header['hash'])]
+                if not headers:
+                    break
+                response = self.session.get(f'{peer}/chain', timeout=self.timeout,
+                                            params={'from': headers[0]['index'], 'limit': len(headers)})
+                response.raise_for_status()
+                blocks = [self.decode(block_data) for block_data in response.json()['chain']]
+                for header, block in zip(headers, blocks):
+                    if block.hash != header['hash'] or not self.blockchain.import_block(block):
+                        return imported
+                    self._remember(peer, [('block', block.hash)])
+                    imported += 1
+                if len(answer['headers']) < self.batch_size:
+                    break
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            return None
+        finally:
+            with self.lock:
+                self.syncing.discard(peer)
+        return imported
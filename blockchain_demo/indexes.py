@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from blockchain_demo.mempool import transaction_hash
+from blockchain_demo.pruning import transaction_count
+
+Location = Tuple[int, int]
+"""tuple: (block index, position in the block) of a confirmed transaction."""
+
+
+class TransactionIndex:
+    """
+    Secondary indexes over the confirmed transactions of a chain.
+
+    - `by_hash`: transaction hash → location.
+    - `by_author` and `by_author_id`: author → locations in chain order.
+    - `offsets`: number of transactions before each block, so block index → transaction range is two lookups and a
+      global position → block a binary search.
+
+    `update` only reads the blocks added since the previous call. Queued transactions are already indexed by hash and
+    author in the mempool. Pruned blocks keep their range in `offsets`, so global positions don't move, but their
+    transactions are left out of the other indexes.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets every indexed block, e.g. when the chain is replaced, the next update reads the whole chain."""
+        self.by_hash: Dict[str, Location] = {}
+        self.by_author: Dict[str, List[Location]] = {}
+        self.by_author_id: Dict[str, List[Location]] = {}
+        self.offsets: List[int] = []
+        self.hashes: List[Optional[str]] = []
+        """list: Hash of each indexed block, to notice a chain rewritten without `remove` being called."""
+
+        self.total = 0
+        self._chain = None
+
+    @property
+    def height(self) -> int:
+        return len(self.offsets)
+
+    def update(self, chain) -> None:
+        """Indexes the blocks appended to `chain` since the last update."""
+        with self.lock:
+            if chain is not self._chain or (self.hashes and (
+                    len(chain) < self.height or chain[self.height - 1].__dict__.get('hash') != self.hashes[-1])):
+                self.reset()
+                self._chain = chain
+            for block in chain[self.height:]:
+                self.offsets.append(self.total)
+                self.hashes.append(block.__dict__.get('hash'))
+                for position, transaction in enumerate(block.transactions):
+                    location = (block.index, position)
+                    self.by_hash[transaction_hash(transaction)] = location
+                    if isinstance(transaction, dict):
+                        if transaction.get('author'):
+                            self.by_author.setdefault(str(transaction['author']), []).append(location)
+                        if transaction.get('author_id'):
+                            self.by_author_id.setdefault(str(transaction['author_id']), []).append(location)
+                self.total += transaction_count(block)
+
+    def remove(self, block) -> None:
+        """
+        Undoes the indexing of a block a reorganization took off the chain. Blocks are removed newest first, a block
+        that was never indexed is ignored.
+        """
+        with self.lock:
+            if block.index >= self.height:
+                return
+            if block.index != self.height - 1 or block.__dict__.get('hash') != self.hashes[-1]:
+                self.reset()
+                return
+            for position, transaction in enumerate(block.transactions):
+                location = (block.index, position)
+                tx_hash = transaction_hash(transaction)
+                if self.by_hash.get(tx_hash) == location:
+                    del self.by_hash[tx_hash]
+                if isinstance(transaction, dict):
+                    for index, key in ((self.by_author, transaction.get('author')),
+                                       (self.by_author_id, transaction.get('author_id'))):
+                        locations = index.get(str(key), []) if key else []
+                        if locations and locations[-1] == location:
+                            locations.pop()
+                            if not locations:
+                                del index[str(key)]
+            self.total = self.offsets.pop()
+            self.hashes.pop()
+
+    def forget(self, blocks: list) -> None:
+        """Drops the transactions of blocks about to be pruned from `by_hash`, `by_author` and `by_author_id`."""
+        with self.lock:
+            indexes = {block.index for block in blocks}
+            authors, author_ids = set(), set()
+            for block in blocks:
+                for transaction in block.transactions:
+                    tx_hash = transaction_hash(transaction)
+                    if self.by_hash.get(tx_hash, (None,))[0] == block.index:
+                        del self.by_hash[tx_hash]
+                    if isinstance(transaction, dict):
+                        if transaction.get('author'):
+                            authors.add(str(transaction['author']))
+                        if transaction.get('author_id'):
+                            author_ids.add(str(transaction['author_id']))
+            for index, keys in ((self.by_author, authors), (self.by_author_id, author_ids)):
+                for key in keys:
+                    locations = [location for location in index.get(key, []) if location[0] not in indexes]
+                    if locations:
+                        index[key] = locations
+                    else:
+                        index.pop(key, None)
+
+    def locate(self, tx_hash: str) -> Optional[Location]:
+        return self.by_hash.get(tx_hash)
+
+    def block_range(self, block_index: int) -> Tuple[int, int]:
+        """Global positions `[start, stop)` of the transactions of a block."""
+        start = self.offsets[block_index]
+        stop = self.offsets[block_index + 1] if block_index + 1 < len(self.offsets) else self.total
+        return start, stop
+
+    def locate_position(self, position: int) -> Location:
+        """Location of the transaction at a global position, in O(log blocks)."""
+        block_index = bisect_right(self.offsets, position) - 1
+        return block_index, position - self.offsets[block_index]
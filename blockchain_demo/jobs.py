@@ -0,0 +1,146 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from flask_socketio import SocketIO
+
+from blockchain_demo.mining import MiningCancelled
+
+
+class MiningJob:
+    """
+    Mining request running in the background.
+
+    Parameters
+    ----------
+    block_miner: str
+        Peer whose queued transactions are mined.
+    sid: str
+        Session id of the client that asked for the job, progress is streamed to it.
+    """
+    def __init__(self, block_miner: str, sid: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.block_miner = block_miner
+        self.sid = sid
+        self.status = 'running'
+        """str: One of 'running', 'mined', 'empty', 'cancelled' or 'failed'."""
+
+        self.block_index = None
+        self.nonces_tried = 0
+        self.started_at = time.monotonic()
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+        """threading.Event: Set once the job left the 'running' status."""
+
+
+class MiningJobScheduler:
+    """
+    Runs `BlockChain.mine_block` outside of the Socket.IO handlers.
+
+    A peer has at most one running job: asking again while it runs returns the same job. The job id is sent to the
+    requesting client as a `mining_job` event, progress as `mining_progress` events, at most once per
+    `progress_interval` seconds, and the outcome as a `mining_job_finished` event. The mined block itself is
+    broadcast to every client as a `new_block` event.
+
+    Parameters
+    ----------
+    blockchain: BlockChain
+        Chain the blocks are mined on.
+    socket_io: SocketIO
+        Server used to start the background tasks and emit their events.
+    progress_interval: float
+        Minimum number of seconds between two `mining_progress` events of a job.
+    history: int
+        Number of jobs, running or finished, kept for lookup by id.
+    """
+    def __init__(self, blockchain, socket_io: SocketIO, progress_interval: float = 0.5, history: int = 100) -> None:
+        self.blockchain = blockchain
+        self.socket_io = socket_io
+        self.progress_interval = progress_interval
+        self.history = history
+        self.jobs: Dict[str, MiningJob] = OrderedDict()
+        self.running: Dict[str, MiningJob] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, block_miner: str, sid: str) -> Tuple[MiningJob, bool]:
+        """
+        Parameters
+        ----------
+        block_miner:
+            Peer whose queued transactions are mined.
+        sid:
+            Session id of the requesting client.
+
+        Returns
+        -------
+        tuple:
+            The job and whether it was created, False when the peer's running job is returned instead.
+        """
+        with self.lock:
+            job = self.running.get(block_miner)
+            created = job is None
+            if created:
+                job = MiningJob(block_miner, sid)
+                self.jobs[job.id] = job
+                for old_job in list(self.jobs.values())[:max(len(self.jobs) - self.history, 0)]:
+                    if old_job.done.is_set():
+                        del self.jobs[old_job.id]
+                self.running[block_miner] = job
+        # Announced before the task starts so the client always gets the job id before the job's own events.
+        self.socket_io.emit('mining_job', {'job_id': job.id, 'block_miner': block_miner, 'created': created}, to=sid)
+        if created:
+            self.socket_io.start_background_task(self._run, job)
+        return job, created
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Returns
+        -------
+        bool:
+            True if the job was running and is asked to stop, false otherwise.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.done.is_set():
+            return False
+        job.cancel_event.set()
+        return True
+
+    def _run(self, job: MiningJob) -> None:
+        last_report = [job.started_at]
+
+        def report_progress(nonces_tried: int) -> None:
+            job.nonces_tried = nonces_tried
+            now = time.monotonic()
+            if now - last_report[0] >= self.progress_interval:
+                last_report[0] = now
+                self.socket_io.emit('mining_progress',
+                                    {'job_id': job.id,
+                                     'nonces_tried': nonces_tried,
+                                     'hash_rate': nonces_tried / (now - job.started_at)},
+                                    to=job.sid)
+
+        try:
+            job.block_index = self.blockchain.mine_block(job.block_miner, progress=report_progress,
+                                                         cancel=job.cancel_event)
+        except MiningCancelled:
+            job.status = 'cancelled'
+            self.socket_io.emit('my_logs', {'msg': f'Mining job of {job.block_miner} cancelled'}, to=job.sid)
+        except Exception:
+            job.status = 'failed'
+            self.socket_io.emit('my_logs', {'msg': f'Mining job of {job.block_miner} failed'}, to=job.sid)
+            raise
+        else:
+            if not job.block_index:
+                job.status = 'empty'
+                self.socket_io.emit('my_logs', {'msg': 'No transactions to mine'}, to=job.sid)
+            else:
+                job.status = 'mined'
+                self.socket_io.emit('new_block', self.blockchain.chain[job.block_index].to_dict())
+                self.socket_io.emit('my_logs', {'msg': f'Block #{job.block_index} mined by {job.block_miner}!'})
+        finally:
+            with self.lock:
+                self.running.pop(job.block_miner, None)
+            job.done.set()
+            self.socket_io.emit('mining_job_finished', {'job_id': job.id, 'status': job.status}, to=job.sid)
@@ -0,0 +1,403 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+Balances = Dict[str, int]
+"""dict: Balance by author, authors holding nothing are left out."""
+
+
+def transfer(transaction: Any) -> Optional[tuple]:
+    """
+    Value moved by a transaction.
+
+    A transfer is a transaction with a `recipient`, a positive integer `amount` and a non-negative integer `nonce`,
+    paid by its `author`. A block reward is a `coinbase` transaction, only crediting its recipient.
+
+    Returns
+    -------
+    tuple:
+        `(payer, recipient, amount)`, the payer being None for a block reward. None for transactions moving nothing.
+    """
+    if not isinstance(transaction, dict):
+        return None
+    amount, recipient = transaction.get('amount'), transaction.get('recipient')
+    if type(amount) is not int or amount <= 0 or not isinstance(recipient, str) or not recipient:
+        return None
+    if transaction.get('coinbase'):
+        return None, recipient, amount
+    author, nonce = transaction.get('author'), transaction.get('nonce')
+    return (str(author), recipient, amount) if author and type(nonce) is int and nonce >= 0 else None
+
+
+def replay_key(transaction: Any) -> Optional[Tuple[str, int]]:
+    """
+    tuple: `(payer, nonce)` of a transfer, None for other transactions.
+
+    The nonce is signed along with the transfer, unlike the timestamp the server stamps, so it's what tells a
+    resubmitted copy of a transfer from a new one: each transfer of an author must use a nonce greater than the one of
+    the author's previous transfer.
+    """
+    moved = transfer(transaction)
+    if moved is None or moved[0] is None:
+        return None
+    return moved[0], transaction['nonce']
+
+
+def spends(transaction: Any) -> bool:
+    """
+    bool: Whether a transaction claims to move value from its author, a transfer or a malformed one. Those must be
+    signed with their author's key whatever `REQUIRE_SIGNATURES` says, a nonce alone doesn't stop others from spending.
+    """
+    return (isinstance(transaction, dict) and not transaction.get('coinbase')
+            and ('amount' in transaction or 'recipient' in transaction))
+
+
+def is_valid_transfer(transaction: Any) -> bool:
+    """bool: Whether a transaction not carrying value is plain data, and a transaction carrying value a transfer."""
+    if not isinstance(transaction, dict) or ('amount' not in transaction and 'recipient' not in transaction):
+        return True
+    return not transaction.get('coinbase') and transfer(transaction) is not None
+
+
+def coinbase(recipient: str, amount: int, height: int) -> dict:
+    """dict: Block reward transaction, the height makes each one unique."""
+    return {'coinbase': True, 'recipient': recipient, 'amount': amount, 'height': height}
+
+
+def signing_key(transaction: Any) -> Optional[Tuple[str, str]]:
+    """tuple: `(author, public key)` of a signed transaction, None for unsigned ones."""
+    if not isinstance(transaction, dict) or 'signature' not in transaction or not transaction.get('author'):
+        return None
+    return str(transaction['author']), str(transaction.get('public_key'))
+
+
+def is_coinbase(transaction: Any) -> bool:
+    """bool: Whether a transaction is a block reward, unsigned and checked by `BlockChain.is_valid_reward` instead."""
+    return isinstance(transaction, dict) and bool(transaction.get('coinbase'))
+
+
+class Ledger:
+    """
+    Balances of every author after the chain's last block, maintained block by block.
+
+    Applying a block records its diff, the balance change of each author it touches, so a block is undone in O(diff).
+    Every `snapshot_interval` blocks a copy of the balances is kept as well: the balance at a past height is read from
+    the current balances going back, or from the snapshot below it going forward, whichever crosses fewer diffs.
+
+    The first signed transaction of an author binds its public key to the author, later transactions of the author
+    signed with another key are forged. A transfer its payer can't afford when its block is applied moves nothing, and
+    so does a forged transfer or a transfer whose nonce isn't greater than the one of the payer's previous transfer, a
+    replay. Reward transactions are only checked against the block reward when a block is added to the chain, see
+    `BlockChain.add_block_to_peer_chain`.
+
+    With a `path`, the diff, nonces and bound keys of every applied block are appended to a journal, one JSON line per
+    block, and undone blocks are truncated from it. Every `snapshot_interval` blocks the balances, nonces and keys are
+    also saved to `<path>.snapshot`, with the journal offset they match. Updating from a chain the ledger hasn't seen
+    yet, e.g. a `BlockStore` reopened after a restart, starts from that snapshot and reads only the journal records
+    after it, then applies the blocks the journal misses or whose hash doesn't match. The records before the snapshot
+    are only read if a balance before it is asked for or a reorganization undoes the snapshot's block.
+
+    Parameters
+    ----------
+    snapshot_interval: int
+        Number of blocks between two balance snapshots.
+    path: str
+        Journal file, created if missing, None keeps the ledger in memory only.
+    """
+    def __init__(self, snapshot_interval: int = 100, path: Optional[str] = None) -> None:
+        self.snapshot_interval = snapshot_interval
+        self.path = path
+        self.lock = threading.RLock()
+        self.journal = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.balances: Balances = {}
+        self.base = 0
+        """int: Height of the block whose changes are first in `diffs`, the blocks below only left a snapshot."""
+
+        self.base_hash: Optional[str] = None
+        """str: Hash of the block at `base - 1`."""
+
+        self.diffs: List[Balances] = []
+        """list: Balance changes made by the block at each height from `base`."""
+
+        self.hashes: List[str] = []
+        """list: Hash of the block applied at each height from `base`, to notice the blocks a reorganization undid."""
+
+        self.snapshots: Dict[int, Balances] = {}
+        """dict: Balances after the block at every multiple of `snapshot_interval`."""
+
+        self.nonces: Dict[str, int] = {}
+        """dict: Nonce of each author's last applied transfer."""
+
+        self.nonce_undo: List[Dict[str, Optional[int]]] = []
+        """list: Nonces the block at each height replaced, None for authors without a previous transfer."""
+
+        self.keys: Dict[str, str] = {}
+        """dict: Public key bound to each author, the one of their first signed transaction applied."""
+
+        self.key_undo: List[List[str]] = []
+        """list: Authors whose key the block at each height bound."""
+
+        self.offsets: List[int] = []
+        """list: Offset of the journal record of the block at each height from `base`."""
+
+        self._chain = None
+
+    @property
+    def height(self) -> int:
+        """int: Height of the last applied block, -1 before the genesis block."""
+        return self.base + len(self.diffs) - 1
+
+    @property
+    def snapshot_path(self) -> str:
+        return f'{self.path}.snapshot'
+
+    def update(self, chain) -> None:
+        """
+        Undoes the applied blocks `chain` doesn't hold anymore, e.g. after a reorganization, then applies the blocks
+        appended since the last update.
+        """
+        with self.lock:
+            if chain is not self._chain:
+                self.reset()
+                self._chain = chain
+                if self.path:
+                    self._load()
+            while self.height >= 0 and (self.height >= len(chain) or chain[self.height].hash != self._tip_hash):
+                self.rollback()
+            for block in chain[self.height + 1:]:
+                self.apply(block)
+
+    def apply(self, block) -> Balances:
+        """Applies the next block, returns its diff."""
+        with self.lock:
+            diff: Balances = {}
+            nonces: Dict[str, int] = {}
+            keys: Dict[str, str] = {}
+            for transaction in block.transactions:
+                if self._is_forged(transaction, keys):
+                    continue
+                self._bind(transaction, keys)
+                moved = transfer(transaction)
+                if moved is None:
+                    continue
+                payer, recipient, amount = moved
+                if payer is not None:
+                    affordable = self.balances.get(payer, 0) + diff.get(payer, 0) >= amount
+                    if not affordable or self._is_replay(transaction, nonces):
+                        continue
+                    nonces[payer] = transaction['nonce']
+                    diff[payer] = diff.get(payer, 0) - amount
+                diff[recipient] = diff.get(recipient, 0) + amount
+            diff = {author: change for author, change in diff.items() if change}
+            if self.journal is not None:
+                record = json.dumps({'hash': block.hash, 'diff': diff, 'nonces': nonces, 'keys': keys}) + '\n'
+                self.offsets.append(self.journal.seek(0, os.SEEK_END))
+                self.journal.write(record.encode("utf-8"))
+                self.journal.flush()
+            self._commit(block.hash, diff, nonces, keys)
+            if self.journal is not None and self.height % self.snapshot_interval == 0:
+                self._save_snapshot()
+            return diff
+
+    @property
+    def _tip_hash(self) -> Optional[str]:
+        return self.hashes[-1] if self.hashes else self.base_hash
+
+    def _commit(self, block_hash: str, diff: Balances, nonces: Dict[str, int], keys: Dict[str, str]) -> None:
+        self._add(self.balances, diff, 1)
+        self.nonce_undo.append({author: self.nonces.get(author) for author in nonces})
+        self.nonces.update(nonces)
+        self.key_undo.append(list(keys))
+        self.keys.update(keys)
+        self.diffs.append(diff)
+        self.hashes.append(block_hash)
+        if self.height % self.snapshot_interval == 0:
+            self.snapshots[self.height] = dict(self.balances)
+
+    def _save_snapshot(self) -> None:
+        """Saves the state after the last applied block, written aside first so a crash leaves the previous one."""
+        snapshot = {'height': self.height, 'hash': self.hashes[-1], 'offset': self.journal.tell(),
+                    'balances': self.balances, 'nonces': self.nonces, 'keys': self.keys}
+        with open(f'{self.snapshot_path}.tmp', 'w') as file:
+            json.dump(snapshot, file)
+        os.replace(f'{self.snapshot_path}.tmp', self.snapshot_path)
+
+    def _read_snapshot(self) -> Optional[dict]:
+        try:
+            with open(self.snapshot_path) as file:
+                snapshot = json.load(file)
+            if not 0 <= snapshot['offset'] <= os.fstat(self.journal.fileno()).st_size:
+                return None
+            return snapshot
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _load(self, from_snapshot: bool = True) -> None:
+        """
+        Applies the records of the journal at `path`, from the saved snapshot by default. A partially written last
+        record left by a crash is dropped.
+        """
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.path, 'a+b')
+        snapshot = self._read_snapshot() if from_snapshot else None
+        offset = 0
+        if snapshot is not None:
+            self.base, self.base_hash, offset = snapshot['height'] + 1, snapshot['hash'], snapshot['offset']
+            self.balances, self.nonces, self.keys = snapshot['balances'], snapshot['nonces'], snapshot['keys']
+            self.snapshots[snapshot['height']] = dict(self.balances)
+        self.journal.seek(offset)
+        for line in self.journal:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+                block_hash, diff, nonces, keys = record['hash'], record['diff'], record['nonces'], record['keys']
+            except (ValueError, KeyError, TypeError):
+                break
+            self.offsets.append(offset)
+            self._commit(block_hash, diff, nonces, keys)
+            offset += len(line)
+        self.journal.truncate(offset)
+
+    def _load_history(self) -> None:
+        """Reads the whole journal back, for the blocks below `base`."""
+        chain = self._chain
+        self.reset()
+        self._chain = chain
+        self._load(from_snapshot=False)
+
+    def rollback(self) -> None:
+        """Undoes the last applied block."""
+        with self.lock:
+            if not self.diffs:
+                self._load_history()
+            if self.journal is not None:
+                if self.height % self.snapshot_interval == 0 and os.path.exists(self.snapshot_path):
+                    os.remove(self.snapshot_path)
+                self.journal.truncate(self.offsets.pop())
+            self.snapshots.pop(self.height, None)
+            self.hashes.pop()
+            self._add(self.balances, self.diffs.pop(), -1)
+            for author, nonce in self.nonce_undo.pop().items():
+                if nonce is None:
+                    del self.nonces[author]
+                else:
+                    self.nonces[author] = nonce
+            for author in self.key_undo.pop():
+                del self.keys[author]
+
+    def _is_forged(self, transaction: Any, keys: Dict[str, str]) -> bool:
+        """Whether a transaction is signed with another key than its author's, `keys` holding the ones bound since the
+        last applied block."""
+        signer = signing_key(transaction)
+        return signer is not None and keys.get(signer[0], self.keys.get(signer[0], signer[1])) != signer[1]
+
+    def is_forged(self, transaction: Any) -> bool:
+        """bool: Whether a transaction is signed with another key than the one bound to its author by the chain."""
+        with self.lock:
+            return self._is_forged(transaction, {})
+
+    def _is_replay(self, transaction: Any, nonces: Dict[str, int]) -> bool:
+        """Whether a transfer's nonce was already used, `nonces` holding the ones used since the last applied block."""
+        key = replay_key(transaction)
+        return key is not None and key[1] <= nonces.get(key[0], self.nonces.get(key[0], -1))
+
+    def is_replay(self, transaction: Any) -> bool:
+        """bool: Whether a transfer reuses a nonce of the applied blocks, e.g. a copy of a confirmed transfer."""
+        with self.lock:
+            return self._is_replay(transaction, {})
+
+    def has_conflict(self, transactions: List[Any]) -> bool:
+        """
+        bool: Whether transactions mined in order on top of the last applied block would hold a forged transaction or a
+        transfer reusing a nonce.
+        """
+        with self.lock:
+            nonces: Dict[str, int] = {}
+            keys: Dict[str, str] = {}
+            for transaction in transactions:
+                if self._is_forged(transaction, keys) or self._is_replay(transaction, nonces):
+                    return True
+                self._bind(transaction, keys)
+                key = replay_key(transaction)
+                if key is not None:
+                    nonces[key[0]] = key[1]
+            return False
+
+    def _bind(self, transaction: Any, keys: Dict[str, str]) -> None:
+        signer = signing_key(transaction)
+        if signer is not None and signer[0] not in self.keys:
+            keys.setdefault(*signer)
+
+    @staticmethod
+    def _add(balances: Balances, diff: Balances, sign: int) -> None:
+        for author, change in diff.items():
+            balance = balances.get(author, 0) + sign * change
+            if balance:
+                balances[author] = balance
+            else:
+                balances.pop(author, None)
+
+    def balance(self, author: str, height: Optional[int] = None) -> int:
+        """
+        Parameters
+        ----------
+        author:
+            Account holder.
+        height:
+            Block after which the balance is read, the last applied one by default.
+
+        Raises
+        ------
+        IndexError
+            If no block was applied at `height`.
+        """
+        with self.lock:
+            if height is None:
+                height = self.height
+            if not 0 <= height <= self.height:
+                raise IndexError('height out of range')
+            if height < self.base - 1:
+                self._load_history()
+            snapshot_height = height - height % self.snapshot_interval
+            if snapshot_height in self.snapshots and height - snapshot_height < self.height - height:
+                return self.snapshots[snapshot_height].get(author, 0) + sum(
+                    diff.get(author, 0) for diff in self.diffs[snapshot_height + 1 - self.base:height + 1 - self.base])
+            return self.balances.get(author, 0) - sum(diff.get(author, 0)
+                                                      for diff in self.diffs[height + 1 - self.base:])
+
+    def affordable(self, transactions: List[Any]) -> List[bool]:
+        """
+        Whether each transaction can be mined in order on top of the last applied block: transactions must not be
+        forged, transfers must be covered by their payer's balance, net of the transfers before them, must not be
+        replays, and block rewards can't be queued.
+        """
+        with self.lock:
+            spent: Balances = {}
+            nonces: Dict[str, int] = {}
+            keys: Dict[str, str] = {}
+            results = []
+            for transaction in transactions:
+                if not is_valid_transfer(transaction) or self._is_forged(transaction, keys):
+                    results.append(False)
+                    continue
+                moved = transfer(transaction)
+                if moved is None:
+                    self._bind(transaction, keys)
+                    results.append(True)
+                    continue
+                payer, recipient, amount = moved
+                affordable = (not self._is_replay(transaction, nonces)
+                              and self.balances.get(payer, 0) + spent.get(payer, 0) >= amount)
+                if affordable:
+                    self._bind(transaction, keys)
+                    nonces[payer] = transaction['nonce']
+                    spent[payer] = spent.get(payer, 0) - amount
+                    spent[recipient] = spent.get(recipient, 0) + amount
+                results.append(affordable)
+            return results
@@ -1,16 +1,52 @@
 import json
-from datetime import datetime
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
 from hashlib import sha256
-from typing import List, Any, Callable
+from typing import List, Any, Callable, Optional, Union
 
-import requests
-from flask import Blueprint, redirect, render_template, request
+from flask import Blueprint, Response, current_app, g, render_template, request, stream_with_context
+from markupsafe import Markup
 from flask_socketio import emit
 
-from blockchain_demo import socket_io
+from blockchain_demo import metrics, socket_io
+from blockchain_demo.backends import ChainConflict, SQLiteBackend
+from blockchain_demo.blocktree import BlockTree, ChainView, block_work
+from blockchain_demo.fragments import FragmentCache
+from blockchain_demo.gossip import GossipNode
+from blockchain_demo.indexes import TransactionIndex
+from blockchain_demo.jobs import MiningJobScheduler
+from blockchain_demo.ledger import Ledger, coinbase, is_coinbase, transfer
+from blockchain_demo.mempool import AuthorQueue, Mempool, transaction_hash
+from blockchain_demo.merkle import merkle_proof, merkle_root, verify_merkle_proof
+from blockchain_demo.mining import Miner, NONCE_STRUCT, difficulty_target, meets_target, retarget
+from blockchain_demo.pruning import Pruner, is_pruned
+from blockchain_demo.signatures import SignatureVerifier
+from blockchain_demo.storage import LEDGER_NAME, BlockStore
+from blockchain_demo.transactions import TransactionService, block_entries, iter_lines
+from blockchain_demo.validation import ChainValidator, ValidationResult
 
 main = Blueprint('main', __name__)
 
+HEADER_STRUCT = struct.Struct('>Q64s26s32s')
+"""struct.Struct: Fixed block header layout (index, prev_hash, timestamp, Merkle root), nonce excluded."""
+
+HEADER_STRUCT_V2 = struct.Struct('>Q64s26s32s32s')
+"""struct.Struct: Header layout of blocks recording their target (index, prev_hash, timestamp, Merkle root, target)."""
+
+PREV_HASH_SIZE, TIMESTAMP_SIZE = 64, 26
+"""int: Widths of the prev_hash and timestamp header fields, `struct` would silently truncate longer values."""
+
+BLOCK_FIELDS = {'index': int, 'timestamp': str, 'transactions': list, 'prev_hash': str, 'nonce': int,
+                'merkle_root': str, 'target': str, 'hash': str}
+"""dict: Type of each field a block received from outside may hold, all but `target` and `hash` are required."""
+
+HEX_DIGEST = re.compile('[0-9a-f]{64}')
+"""re.Pattern: A sha256 digest as the chain writes it, lowercase hexadecimal."""
+
 
 class Block:
     """
@@ -32,13 +68,87 @@ class Block:
         This is the hash of the former block in chain.
     nonce: int
         Number of times the hash was calculated to accomplish the difficulty constrain and become a valid hash.
+    target: int
+        Highest acceptable hash as a 256-bit number, stored as 64 hexadecimal digits and committed to by the header.
+        Blocks without a target are checked against `BlockChain.difficulty`.
     """
-    def __init__(self, index: int, transactions: List[Any], timestamp: datetime, prev_hash: str, nonce: int = 0) -> None:
+    def __init__(self, index: int, transactions: List[Any], timestamp: datetime, prev_hash: str, nonce: int = 0,
+                 target: Optional[int] = None) -> None:
         self.index = index
         self.timestamp = str(timestamp)
         self.transactions = transactions
         self.prev_hash = prev_hash
         self.nonce = nonce
+        self.merkle_root = merkle_root(transactions)
+        if target is not None:
+            self.target = f'{target:064x}'
+
+    @classmethod
+    def from_dict(cls, block_data: dict) -> 'Block':
+        """
+        Rebuilds a block from its `to_dict` output, as found in `/chain`, without recomputing anything.
+        """
+        block = cls.__new__(cls)
+        block.__dict__.update(block_data)
+        return block
+
+    @classmethod
+    def parse(cls, block_data: Any) -> 'Block':
+        """
+        Rebuilds a block received from outside, from another node or a chain export, out of its known fields only.
+
+        Raises
+        ------
+        ValueError
+            If `block_data` isn't an object, misses a field or holds an unknown one, e.g. a private cache, a field has
+            the wrong type, the index or nonce doesn't fit the header or a hash isn't 64 hexadecimal digits.
+        """
+        if not isinstance(block_data, dict):
+            raise ValueError('block is not a JSON object')
+        unknown = sorted(str(field) for field in block_data if field not in BLOCK_FIELDS)
+        missing = [field for field in BLOCK_FIELDS if field not in block_data and field not in ('target', 'hash')]
+        if unknown or missing:
+            raise ValueError(f'unknown fields {unknown}' if unknown else f'missing fields {missing}')
+        for field, value in block_data.items():
+            if type(value) is not BLOCK_FIELDS[field]:
+                raise ValueError(f'{field} is not a {BLOCK_FIELDS[field].__name__}')
+        if not (0 <= block_data['index'] < 2 ** 64 and 0 <= block_data['nonce'] < 2 ** 64):
+            raise ValueError('index or nonce out of range')
+        if not all(HEX_DIGEST.fullmatch(block_data[field]) for field in ('merkle_root', 'target', 'hash')
+                   if field in block_data):
+            raise ValueError('merkle_root, target or hash is not 64 hexadecimal digits')
+        return cls.from_dict(block_data)
+
+    @classmethod
+    def from_json(cls, block_json: str) -> 'Block':
+        """
+        Rebuilds a block from its `to_json` output, as found in a `BlockStore`, keeping the text as serialization cache.
+        """
+        block = cls.from_dict(json.loads(block_json))
+        if 'hash' in block.__dict__:
+            block._json = block_json
+        return block
+
+    def to_dict(self) -> dict:
+        """
+        dict: Block fields, internal caches excluded.
+        """
+        return {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+
+    def to_json(self) -> str:
+        """
+        str: JSON serialization of `to_dict`.
+
+        Notes
+        -----
+        Once the block is sealed (its `hash` is set) it never changes, so the serialization is computed once and cached.
+        """
+        block_json = self.__dict__.get('_json')
+        if block_json is None:
+            block_json = json.dumps(self.to_dict())
+            if 'hash' in self.__dict__:
+                self._json = block_json
+        return block_json
 
     @property
     def create_hash(self) -> str:
@@ -56,10 +166,60 @@ class Block:
         Hashing is a fundamental part of the block creation, because with the minimal change in data leads to a large
         change in resulting hash.
         """
-        unique_block_string = json.dumps(self.__dict__, sort_keys=True)
+        unique_block_string = json.dumps(self.to_dict(), sort_keys=True)
         block_hash = sha256(unique_block_string.encode("utf-8")).hexdigest()
         return block_hash
 
+    @property
+    def transactions_digest(self) -> bytes:
+        """
+        bytes: Merkle root that commits to the block's transactions.
+        """
+        return bytes.fromhex(self.merkle_root)
+
+    @property
+    def header_prefix(self) -> bytes:
+        """
+        bytes: Fixed-layout header without the nonce.
+
+        Notes
+        -----
+        Everything but the nonce stays constant while mining, so the proof of work hashes this prefix once and only
+        appends the packed nonce on every attempt. Blocks recording their target use `HEADER_STRUCT_V2`.
+
+        Raises
+        ------
+        ValueError
+            If the prev_hash or the timestamp is longer than its field, its tail would be left out of the hash, or the
+            index isn't an unsigned 64-bit integer.
+        """
+        prev_hash, timestamp = self.prev_hash.encode("utf-8"), self.timestamp.encode("utf-8")
+        if len(prev_hash) > PREV_HASH_SIZE or len(timestamp) > TIMESTAMP_SIZE:
+            raise ValueError('prev_hash or timestamp too long for the block header')
+        try:
+            if 'target' in self.__dict__:
+                return HEADER_STRUCT_V2.pack(self.index, prev_hash, timestamp, self.transactions_digest,
+                                             bytes.fromhex(self.target))
+            return HEADER_STRUCT.pack(self.index, prev_hash, timestamp, self.transactions_digest)
+        except struct.error as error:
+            raise ValueError(f'block index does not fit the header: {error}') from error
+
+    @property
+    def header_hash(self) -> str:
+        """
+        str: Hash of the fixed-layout header, the format produced by `BlockChain.proof_of_work`.
+
+        Raises
+        ------
+        ValueError
+            If a field doesn't fit the header, see `header_prefix`, or the nonce isn't an unsigned 64-bit integer.
+        """
+        prefix = self.header_prefix
+        try:
+            return sha256(prefix + NONCE_STRUCT.pack(self.nonce)).hexdigest()
+        except struct.error as error:
+            raise ValueError(f'block nonce does not fit the header: {error}') from error
+
 
 class BlockChain:
     """
@@ -72,50 +232,245 @@ class BlockChain:
     Attribute
     ----------
     difficulty: int
-        For this blockchain demo three zeros at beginning of hash are required to approve a hash.
+        For this blockchain demo three zeros at beginning of hash are required to approve a hash. This is the target
+        of the genesis block, of blocks without a recorded target and of every block when retargeting is off.
+    target_block_time: float
+        Seconds between two blocks the target is adjusted toward, None turns retargeting off.
+    retarget_window: int
+        Number of blocks between two retargets, and the number of block intervals measured.
+    block_reward: int
+        Amount credited to the miner of each block by a coinbase transaction, 0 mines no reward.
+    genesis_timestamp: str
+        Timestamp of the genesis block, nodes of one network must share it to share the genesis block. None uses the
+        current time.
+    median_time_span: int
+        Number of previous blocks whose median timestamp a new block's timestamp must be later than.
+    max_future_block_time: float
+        Seconds a block's timestamp may be ahead of the local clock.
+
+    Parameters
+    ----------
+    mining_workers: int
+        Number of processes used by the proof of work, 1 keeps mining in the calling process.
+    block_size: int
+        Maximum number of transactions mined in a block.
     """
     difficulty = 3
+    target_block_time = None
+    retarget_window = 10
+    block_reward = 0
+    genesis_timestamp = None
+    median_time_span = 11
+    max_future_block_time = 2 * 60 * 60
 
-    def __init__(self):
+    def __init__(self, mining_workers: int = 1, block_size: int = 1000):
         self.chain = []
-        """list: Blocks container."""
+        """list: Blocks container, a `BlockStore` or a shared chain once `use_store` or `use_backend` is called."""
+
+        self.miner = Miner(mining_workers)
+        """Miner: Proof of work engine."""
+
+        self.lock = threading.RLock()
+        """threading.RLock: Guards the chain tip and queued transactions while a block is being committed."""
+
+        self.listeners = []
+        """list: Callables notified with every block added to the chain."""
+
+        self.removal_listeners = []
+        """list: Callables notified with every block leaving the chain in a reorganization."""
+
+        self.transaction_listeners = []
+        """list: Callables notified with the hash of every transaction added to the mempool."""
 
         self.peers = {}
         """dict: Peers information container"""
 
+        self.mempool = Mempool()
+        """Mempool: Queued transactions of every peer, each peer's 'queued_transactions' is a view on it."""
+
+        self.block_size = block_size
+
+        self.validator = ChainValidator()
+        """ChainValidator: Whole chain validation engine and its trusted checkpoints."""
+
+        self.signatures = SignatureVerifier()
+        """SignatureVerifier: Transaction signature checks, with the cache of the transactions already verified."""
+
+        self.tree = BlockTree(lambda block: block_work(self.block_target(block)))
+        """BlockTree: Main chain tip and competing branches, `chain` always holds the branch with the most work."""
+
+        self.ledger = Ledger()
+        """Ledger: Balances of every author after the last block of `chain`, with their history."""
+        self.subscribe(lambda block: self.ledger.update(self.chain))
+
+        self.pruner = Pruner()
+        """Pruner: Drops the transactions of old blocks, off until it's given a depth or a byte budget."""
+        self.subscribe(lambda block: self.pruner.update(self.chain))
+
         self.create_genesis_block()
 
+    def subscribe(self, listener: Callable[[Block], None]) -> None:
+        """
+        Registers `listener` to be called with every block added to the chain, while `lock` is held.
+        """
+        self.listeners.append(listener)
+
+    def notify_block_added(self, block: Block) -> None:
+        for listener in self.listeners:
+            listener(block)
+
+    def subscribe_removed(self, listener: Callable[[Block], None]) -> None:
+        """
+        Registers `listener` to be called with every block a reorganization takes off the chain, newest first, while
+        `lock` is held.
+        """
+        self.removal_listeners.append(listener)
+
+    def notify_block_removed(self, block: Block) -> None:
+        for listener in self.removal_listeners:
+            listener(block)
+
+    def subscribe_transactions(self, listener: Callable[[str], None]) -> None:
+        """
+        Registers `listener` to be called with the hash of every transaction `add_transaction` queues.
+        """
+        self.transaction_listeners.append(listener)
+
+    def notify_transaction_added(self, tx_hash: str) -> None:
+        for listener in self.transaction_listeners:
+            listener(tx_hash)
+
     def create_genesis_block(self):
         """
         Notes
         -----
         By instantiating a Blockchain object, a genesis block (Block #0) is created and added to chain list.
         """
-        genesis_block = Block(0, [], datetime.now(), "0")
+        genesis_block = Block(0, [], self.genesis_timestamp or datetime.now(), "0",
+                              target=difficulty_target(self.difficulty))
         genesis_block.hash = self.proof_of_work(genesis_block)
         self.chain.append(genesis_block)
 
-    def proof_of_work(self, block: Block) -> str:
+    def use_genesis_timestamp(self, timestamp: str) -> None:
+        """
+        Sets `genesis_timestamp`, mining the genesis block again if the in-memory chain holds nothing else.
+        """
+        with self.lock:
+            self.genesis_timestamp = timestamp
+            if isinstance(self.chain, list) and len(self.chain) == 1 and self.chain[0].timestamp != str(timestamp):
+                self.chain = []
+                self.create_genesis_block()
+
+    def use_store(self, store: BlockStore) -> None:
+        """
+        Replaces the in-memory chain with a persistent block store. An existing chain is reopened as is, a genesis block
+        is only mined for an empty store. The ledger is brought up to date right away, from its journal if it has one.
+
+        Parameters
+        ----------
+        store:
+            Block storage backend.
+        """
+        with self.lock:
+            self.chain = store
+            if not store:
+                self.create_genesis_block()
+            self.ledger.update(self.chain)
+
+    def use_backend(self, backend: Any) -> None:
+        """
+        Replaces the chain, mempool and peers with the ones of a state backend, e.g. a `SQLiteBackend` shared by
+        several worker processes. A genesis block is only mined for an empty chain, the first worker to store one wins.
+
+        Parameters
+        ----------
+        backend:
+            Object providing `chain`, `mempool` and `peers`.
+        """
+        with self.lock:
+            self.chain, self.mempool, self.peers = backend.chain, backend.mempool, backend.peers
+            if not self.chain:
+                try:
+                    self.create_genesis_block()
+                except ChainConflict:
+                    pass
+
+    def block_target(self, block: Block) -> int:
+        """int: Target recorded in the block, the one of `difficulty` for blocks without one."""
+        if 'target' in block.__dict__:
+            return int(block.target, 16)
+        return difficulty_target(self.difficulty)
+
+    def expected_target(self, height: int, previous: Optional[Block] = None) -> int:
+        """
+        Target a block at `height` must meet at most.
+
+        Parameters
+        ----------
+        height:
+            Height of the block.
+        previous:
+            Block at `height - 1`, read from `chain` when None.
+
+        Returns
+        -------
+        int:
+            Highest acceptable hash as a 256-bit number.
+
+        Notes
+        -----
+        Every `retarget_window` blocks the interval between the last block and the one `retarget_window` blocks before
+        it is compared with `target_block_time` and the target scaled accordingly, by a factor 4 at most. Targets are
+        plain 256-bit numbers, so the mining cost follows the measured block time instead of 16× steps. In between,
+        blocks keep the target of the previous block.
+        """
+        if not self.target_block_time or height == 0:
+            return difficulty_target(self.difficulty)
+        previous = self.chain[height - 1] if previous is None else previous
+        target = self.block_target(previous)
+        if height % self.retarget_window or height <= self.retarget_window:
+            return target
+        first_height = height - 1 - self.retarget_window
+        branch_node = self.tree.ancestor(self.tree.nodes.get(previous.hash), first_height)
+        first = self.chain[first_height] if branch_node is None else branch_node.block
+        elapsed = datetime.fromisoformat(previous.timestamp) - datetime.fromisoformat(first.timestamp)
+        return retarget(target, elapsed.total_seconds(), self.target_block_time * self.retarget_window)
+
+    def proof_of_work(self, block: Block, progress: Optional[Callable[[int], None]] = None,
+                      cancel: Optional[threading.Event] = None) -> str:
         """
         Blockchain class method that iterates over the hash until the difficulty constrain is satisfied.
         Parameter
         --------
         block:
             Block's information to apply the proof of work.
+        progress:
+            Called with the number of nonces tried so far.
+        cancel:
+            Event that aborts the search with `MiningCancelled` when set.
 
         Returns
         -------
         Valid/acceptable hash.
+
+        Notes
+        -----
+        The header prefix is hashed once into a midstate that is copied on every attempt, so the cost per nonce does
+        not depend on how many transactions the block holds. The search is spread over `miner.workers` processes.
         """
-        acceptable_hash = block.create_hash
-        while not acceptable_hash.startswith('0' * self.difficulty):
-            block.nonce += 1
-            acceptable_hash = block.create_hash
+        start_nonce, start = block.nonce, time.perf_counter()
+        block.nonce, acceptable_hash = self.miner.search(block.header_prefix, self.block_target(block), block.nonce,
+                                                         progress=progress, cancel=cancel)
+        duration = time.perf_counter() - start
+        metrics.mining_duration.observe(duration)
+        if duration > 0:
+            metrics.hash_rate.observe((block.nonce - start_nonce + 1) / duration)
         return acceptable_hash
 
     def is_valid_pow(self, block: Block, proof: str) -> bool:
         """
-        This method verify if block.hash is a valid hash, satisfying difficulty constrain.
+        This method verify if block.hash is a valid hash, satisfying the target recorded in the block. Both the
+        fixed-layout header hash and the legacy JSON hash from `Block.create_hash` are accepted.
 
         Parameters
         ----------
@@ -129,7 +484,68 @@ class BlockChain:
         bool:
             True if successful, false otherwise.
         """
-        return proof.startswith('0' * self.difficulty) and proof == block.create_hash
+        if not meets_target(proof, self.block_target(block)):
+            return False
+        try:
+            if proof == block.header_hash:
+                return True
+        except ValueError:
+            # Fields too long or out of range for the header, only the legacy hash covers them whole.
+            pass
+        return proof == block.create_hash
+
+    @staticmethod
+    def is_valid_transaction_proof(transaction: Any, proof: List[dict], root: str) -> bool:
+        """
+        This method verify a transaction inclusion proof as returned by the `/proof` route, without the whole block.
+
+        Parameters
+        ----------
+        transaction:
+            Transaction claimed to be in the block.
+        proof:
+            Sibling hashes from the leaf level up to the root.
+        root:
+            Block's Merkle root.
+
+        Returns
+        ------
+        bool:
+            True if successful, false otherwise.
+        """
+        return verify_merkle_proof(transaction, proof, root)
+
+    def validate_chain(self, start: Optional[int] = None, stop: Optional[int] = None) -> ValidationResult:
+        """
+        This method verify index continuity, prev_hash links, proof of work, Merkle roots and transaction signatures of
+        the whole chain or of a range of it, by default everything after the last trusted checkpoint. Unsigned
+        transactions of past blocks are accepted.
+
+        Parameters
+        ----------
+        start:
+            First height to check.
+        stop:
+            Height after the last one to check.
+
+        Returns
+        ------
+        ValidationResult:
+            Truthy if successful, falsy with the first invalid height otherwise.
+        """
+        def is_valid_legacy_pow(block: Block) -> bool:
+            unsealed_block = Block.from_dict({key: value for key, value in block.to_dict().items() if key != 'hash'})
+            return self.is_valid_pow(unsealed_block, block.hash)
+
+        def are_valid_signatures(transactions: List[Any]) -> List[bool]:
+            # Keys are bound by each author's first signed transaction, the ledger's bindings hold for the whole chain.
+            valid = self.signatures.verify_many(transactions, required=False)
+            return [signed and not self.ledger.is_forged(transaction)
+                    for transaction, signed in zip(transactions, valid)]
+
+        self.ledger.update(self.chain)
+        return self.validator.validate(self.chain, self.block_target, start, stop, fallback=is_valid_legacy_pow,
+                                       expected_target=self.expected_target, signatures=are_valid_signatures)
 
     @property
     def get_latest_block(self) -> Block:
@@ -155,7 +571,8 @@ class BlockChain:
 
     def add_block_to_peer_chain(self, block: Block, proof: str, block_miner: str) -> bool:
         """
-        Using the latest block in our `blockchain` an its hash, a block is added to the specific peer chain.
+        A block is added to the block tree on top of any known block, not only the latest one. When its branch has more
+        work than the main chain, `chain` is reorganized to end with it.
 
         Parameters
         ----------
@@ -164,30 +581,192 @@ class BlockChain:
         proof:
             Hash which meets the difficulty constraint.
         block_miner:
-            Miner of the unique Block.
+            Miner of the unique Block, None for a block received from outside. The miner's chain view ends with the
+            block when it stays off the main chain, and follows the main chain otherwise.
         Returns
         -------
         bool:
             True if successful, false otherwise.
+
+        Notes
+        -----
+        Two blocks mined on the same tip are both kept, the first one seen stays on the main chain until the other
+        branch gets more work.
         """
-        last_block = self.get_latest_block
-        prev_hash = last_block.hash
+        with self.lock:
+            self.tree.sync(self.chain)
+            parent = self.tree.nodes.get(block.prev_hash)
+            if parent is None or parent.height + 1 != block.index or proof in self.tree.nodes:
+                return False
+            parent_block = self.chain[parent.height] if parent.main else parent.block
+            if not self.is_valid_timestamp(block, parent):
+                return False
+            elif self.block_target(block) > self.expected_target(block.index, parent_block):
+                return False
+            elif not self.is_valid_pow(block, proof):
+                return False
+            elif not self.is_valid_reward(block):
+                return False
+            elif not all(self.signatures.verify_many(transaction for transaction in block.transactions
+                                                     if not is_coinbase(transaction))):
+                return False
+            elif parent is self.tree.best and self._has_conflict(block):
+                return False
+            block.hash = proof
+            node = self.tree.add(block, block_miner)
+            if node.work > self.tree.best.work:
+                try:
+                    self._switch_to(node)
+                except ChainConflict:
+                    self.tree.load(self.chain)
+                    return False
+            peer = self.peers.get(block_miner)
+            if peer is not None and isinstance(peer['chain'], ChainView):
+                peer['chain'].tip = None if node.main else node.hash
+            return True
 
-        if last_block.index + 1 != block.index:
-            return False
-        elif prev_hash != block.prev_hash:
-            return False
-        elif not self.is_valid_pow(block, proof):
+    def is_valid_timestamp(self, block: Block, parent) -> bool:
+        """
+        bool: Whether the block's timestamp is a naive ISO timestamp later than the median of the `median_time_span`
+        blocks ending with its parent node, and at most `max_future_block_time` ahead of the local clock.
+
+        Notes
+        -----
+        Retargeting measures block timestamps, without these bounds a miner could date its blocks ahead to make the
+        target easier. The median of the past blocks, unlike the parent's timestamp alone, lets honest clocks disagree
+        a little.
+        """
+        try:
+            timestamp = datetime.fromisoformat(block.timestamp)
+            if timestamp.tzinfo is not None:
+                return False
+            if timestamp > datetime.now() + timedelta(seconds=self.max_future_block_time):
+                return False
+            past = []
+            while parent is not None and not parent.main and len(past) < self.median_time_span:
+                past.append(parent.block.timestamp)
+                parent = parent.parent
+            if parent is not None:
+                oldest = max(parent.height + 1 - (self.median_time_span - len(past)), 0)
+                past.extend(self.chain[height].timestamp for height in range(oldest, parent.height + 1))
+            median = sorted(datetime.fromisoformat(past_timestamp) for past_timestamp in past)[len(past) // 2]
+            return timestamp > median
+        except (TypeError, ValueError):
             return False
-        else:
-            block.hash = proof
-            self.peers[block_miner]['chain'].append(block)
+
+    def _has_conflict(self, block: Block) -> bool:
+        """
+        Whether a block extending the main chain's tip holds a transaction signed with another key than its author's,
+        or a transfer reusing a nonce. Blocks of competing branches can't be checked against the ledger, their forged
+        or replayed transfers move nothing once applied.
+        """
+        self.ledger.update(self.chain)
+        return self.ledger.has_conflict(block.transactions)
+
+    def author_key(self, author: str) -> Optional[str]:
+        """
+        str: Public key `author` signs with: the one its first signed transaction on the chain bound, else the one it
+        registered when joining, None if neither exists.
+        """
+        self.ledger.update(self.chain)
+        return self.ledger.keys.get(author) or self.signatures.author_keys.get(author)
+
+    def register_key(self, author: str, public_key: str) -> bool:
+        """bool: Registers the key `author` signs with, false if the chain or an earlier peer bound another one."""
+        self.ledger.update(self.chain)
+        return self.ledger.keys.get(author, public_key) == public_key and self.signatures.register(author, public_key)
+
+    def is_valid_reward(self, block: Block) -> bool:
+        """
+        bool: Whether the block has no coinbase transaction, or a single one as its last transaction, for its height and
+        at most `block_reward`.
+        """
+        rewards = [position for position, transaction in enumerate(block.transactions) if is_coinbase(transaction)]
+        if not rewards:
             return True
+        reward = block.transactions[-1]
+        moved = transfer(reward)
+        return (rewards == [len(block.transactions) - 1] and moved is not None and moved[2] <= self.block_reward
+                and reward.get('height') == block.index)
 
-    def add_transaction(self, transaction: str, author: str) -> None:
+    def _switch_to(self, node) -> None:
+        """
+        Makes the branch ending with `node` the main chain: blocks above the common ancestor are taken off `chain` and
+        the branch blocks appended. Transactions of the blocks taken off go back to the mempool, unless the new branch
+        confirms them too.
         """
-        Transaction data is added to a queued_transactions list. Each peer has his own list, by giving the author
-        argument we ensure its stored by that specific peer.
+        fork, removed, added = self.tree.fork(node)
+        removed_blocks = [self.chain[removed_node.height] for removed_node in removed]
+        added_blocks = [added_node.block for added_node in added]
+        if not removed:
+            for added_block in added_blocks:
+                self.chain.append(added_block)
+        elif isinstance(self.chain, list):
+            self.chain[fork.height + 1:] = added_blocks
+        else:
+            self.chain.replace(fork.height + 1, added_blocks)
+        self.tree.switch(removed, removed_blocks, added)
+
+        confirmed = {transaction_hash(transaction) for added_block in added_blocks
+                     for transaction in added_block.transactions}
+        for removed_node, removed_block in zip(removed, removed_blocks):
+            self.notify_block_removed(removed_block)
+            for transaction in removed_block.transactions:
+                if is_coinbase(transaction):
+                    continue
+                author = transaction.get('author') if isinstance(transaction, dict) else removed_node.miner
+                if author and transaction_hash(transaction) not in confirmed:
+                    self.mempool.add(transaction, author)
+        self.mempool.remove(confirmed)
+        for added_block in added_blocks:
+            self.notify_block_added(added_block)
+
+    def import_block(self, block: Block) -> bool:
+        """
+        Adds a sealed block received from outside, e.g. from a chain export, through the same rules as
+        `add_block_to_peer_chain`, after checking its transactions against its Merkle root.
+
+        Parameters
+        ----------
+        block:
+            Block carrying its `hash`.
+
+        Returns
+        -------
+        bool:
+            True if successful, false otherwise.
+        """
+        if block.__dict__.get('hash') is None or merkle_root(block.transactions) != block.merkle_root:
+            return False
+        with self.lock:
+            proof = block.__dict__.pop('hash')
+            if not self.add_block_to_peer_chain(block, proof, None):
+                block.hash = proof
+                return False
+        return True
+
+    def queued_transactions(self, author: str) -> AuthorQueue:
+        """
+        Mempool view of the peer's queued transactions. A plain list stored in the peer's 'queued_transactions' is moved
+        into the mempool first and replaced by the view.
+
+        Parameters
+        ----------
+        author:
+            Peer registered in `peers`.
+        """
+        queue = self.peers[author]['queued_transactions']
+        if not isinstance(queue, AuthorQueue):
+            for transaction in queue:
+                self.mempool.add(transaction, author)
+            queue = self.peers[author]['queued_transactions'] = self.mempool.view(author)
+        return queue
+
+    def add_transaction(self, transaction: str, author: str) -> Optional[str]:
+        """
+        Transaction data is added to the mempool. Each peer has his own queue, by giving the author argument we ensure
+        its stored by that specific peer. A transaction already queued is ignored. The author doesn't have to be
+        connected, e.g. for transactions relayed by another node.
 
         Parameters
         ----------
@@ -195,16 +774,32 @@ class BlockChain:
             Data content as a transaction.
         author:
             Transaction's author.
+
+        Returns
+        -------
+        str:
+            Transaction hash, None if it was not queued.
         """
-        if author:
-            self.peers[author]['queued_transactions'].append(transaction)
+        if not author:
+            return None
+        if author in self.peers:
+            self.queued_transactions(author)
+        tx_hash = self.mempool.add(transaction, author)
+        if tx_hash is not None:
+            self.notify_transaction_added(tx_hash)
+        return tx_hash
 
-    def mine_block(self, block_miner: str) -> int:
+    def mine_block(self, block_miner: str, progress: Optional[Callable[[int], None]] = None,
+                   cancel: Optional[threading.Event] = None) -> int:
         """
         Parameter
         --------
         block_miner:
             Miner/author of the block's transactions.
+        progress:
+            Called with the number of nonces tried so far.
+        cancel:
+            Event that aborts mining with `MiningCancelled` when set, queued transactions are kept.
 
         Returns
         -------
@@ -215,144 +810,571 @@ class BlockChain:
         -----
         The process of determining the block's nonce is called 'mining'. By the proof_of_work method we start with a
         nonce of 0 and keep incrementing it by 1 until it finds the valid hash. The block_miner is the name of that peer
-        who is mining his own queued_transactions, adding them to a Block and executing the Proof of Work.
-        Then if everything goes well, that block is added to peer's chain and the queued_transactions list is cleaned.
+        who is mining his own queued_transactions, adding up to `block_size` of them to a Block and executing the Proof
+        of Work. Then if everything goes well, that block is added to peer's chain and its transactions leave the
+        mempool. Transactions whose signature doesn't verify, and transfers their author can't afford, are dropped from
+        the mempool instead, signatures verified when the transactions were queued are only looked up in the signature
+        cache. With a `block_reward`, a coinbase transaction crediting the miner ends the block.
+
+        The proof of work runs without holding `lock`, so transactions can still be queued meanwhile. If another block
+        extended the chain in the meantime, the block is kept in the block tree as a competing branch and mined again on
+        top of the new tip, with the transactions selected again: the ones the new tip confirmed already left the
+        mempool.
         """
+        with self.lock:
+            if not self.queued_transactions(block_miner):
+                return False
+            transactions = self._select_transactions(block_miner)
+            if not transactions:
+                return False
+            last_block = self.get_latest_block
 
-        miner_queued_transactions = self.peers[block_miner]['queued_transactions']
-        if not miner_queued_transactions:
-            return False
+        while True:
+            reward = [coinbase(block_miner, self.block_reward, last_block.index + 1)] if self.block_reward else []
+            new_block = Block(index=last_block.index + 1,
+                              transactions=transactions + reward,
+                              timestamp=datetime.now(),
+                              prev_hash=last_block.hash,
+                              target=self.expected_target(last_block.index + 1, last_block))
+            proof = self.proof_of_work(new_block, progress=progress, cancel=cancel)
+            with self.lock:
+                added = self.add_block_to_peer_chain(new_block, proof, block_miner)
+                node = self.tree.nodes.get(new_block.hash) if added else None
+                if node is not None and node.main:
+                    return new_block.index
+                if self.get_latest_block.hash == last_block.hash:
+                    return False
+                transactions = self._select_transactions(block_miner)
+                if not transactions:
+                    return False
+                last_block = self.get_latest_block
 
-        last_block = self.get_latest_block
-        new_block = Block(index=last_block.index + 1,
-                          transactions=miner_queued_transactions,
-                          timestamp=datetime.now(),
-                          prev_hash=last_block.hash)
-        proof = self.proof_of_work(new_block)
-        self.add_block_to_peer_chain(new_block, proof, block_miner)
-        self.peers[block_miner]['queued_transactions'] = []
-        return new_block.index
+    def _select_transactions(self, block_miner: str) -> List[Any]:
+        """
+        Up to `block_size` of the miner's queued transactions that can be mined on the chain's tip, dropping the others
+        from the mempool. Called with `lock` held.
+        """
+        selected = self.mempool.select(block_miner, self.block_size)
+        signatures = self.signatures.verify_many(transaction for _, transaction in selected)
+        signed = [entry for entry, valid in zip(selected, signatures) if valid]
+        self.ledger.update(self.chain)
+        affordable = self.ledger.affordable([transaction for _, transaction in signed])
+        valid = [entry for entry, funded in zip(signed, affordable) if funded]
+        valid_hashes = {tx_hash for tx_hash, _ in valid}
+        self.mempool.remove(tx_hash for tx_hash, _ in selected if tx_hash not in valid_hashes)
+        return [transaction for _, transaction in valid]
 
 
 blockchain = BlockChain()
-queued_transactions = []
+transaction_service = TransactionService(blockchain)
+mining_jobs = MiningJobScheduler(blockchain, socket_io)
+block_fragments = FragmentCache()
+transaction_index = TransactionIndex()
+blockchain.subscribe(lambda block: transaction_index.update(blockchain.chain))
+
+
+def is_confirmed(tx_hash: str) -> bool:
+    transaction_index.update(blockchain.chain)
+    return transaction_index.locate(tx_hash) is not None
+
+
+gossip = GossipNode(blockchain, Block.parse, is_confirmed, socket_io.start_background_task, socket_io.sleep)
+blockchain.subscribe(lambda block: gossip.announce('block', block.hash))
+blockchain.subscribe_transactions(lambda tx_hash: gossip.announce('tx', tx_hash))
+
+
+@blockchain.pruner.subscribe
+def forget_pruned_blocks(blocks: List[Block]) -> None:
+    """Pruned transactions leave the transaction index and the block fragments, only their block's header stays."""
+    transaction_index.forget(blocks)
+    for block in blocks:
+        block_fragments.discard(block.hash)
+
+
+@blockchain.subscribe_removed
+def forget_removed_block(block: Block) -> None:
+    """The transaction index undoes the block, and clients drop the blocks from this height."""
+    transaction_index.remove(block)
+    socket_io.emit('block_removed', block.index)
+
+
+SYNC_BATCH_SIZE = 200
+"""int: Maximum number of blocks sent in one `blocks_delta` event."""
+
+
+@main.record_once
+def configure_blockchain(state) -> None:
+    """Applies the app configuration to the module-level `blockchain`."""
+    blockchain.miner.workers = state.app.config['MINING_WORKERS']
+    blockchain.block_size = state.app.config['BLOCK_SIZE']
+    blockchain.target_block_time = state.app.config['TARGET_BLOCK_TIME']
+    blockchain.retarget_window = state.app.config['RETARGET_WINDOW']
+    blockchain.block_reward = state.app.config['BLOCK_REWARD']
+    blockchain.ledger = Ledger(state.app.config['LEDGER_SNAPSHOT_INTERVAL'])
+    blockchain.pruner.depth = state.app.config['PRUNE_DEPTH']
+    blockchain.pruner.max_bytes = state.app.config['PRUNE_MAX_BYTES']
+    blockchain.pruner.archive_path = state.app.config['PRUNE_ARCHIVE_PATH']
+    blockchain.mempool.max_bytes = state.app.config['MEMPOOL_MAX_BYTES']
+    blockchain.mempool.max_author_bytes = state.app.config['MEMPOOL_MAX_AUTHOR_BYTES']
+    blockchain.validator = ChainValidator(state.app.config['VALIDATION_WORKERS'],
+                                          path=state.app.config['CHECKPOINTS_PATH'])
+    blockchain.signatures = SignatureVerifier(state.app.config['SIGNATURE_WORKERS'],
+                                              required=state.app.config['REQUIRE_SIGNATURES'])
+    if state.app.config['GENESIS_TIMESTAMP']:
+        blockchain.use_genesis_timestamp(state.app.config['GENESIS_TIMESTAMP'])
+    if state.app.config['STATE_BACKEND_PATH']:
+        blockchain.use_backend(SQLiteBackend(state.app.config['STATE_BACKEND_PATH'], Block.from_json,
+                                             state.app.config['MEMPOOL_MAX_BYTES'],
+                                             state.app.config['MEMPOOL_MAX_AUTHOR_BYTES']))
+    elif state.app.config['BLOCK_STORE_PATH']:
+        blockchain.ledger.path = os.path.join(state.app.config['BLOCK_STORE_PATH'], LEDGER_NAME)
+        blockchain.use_store(BlockStore(state.app.config['BLOCK_STORE_PATH'], Block.from_json))
+        if state.app.config['VALIDATE_ON_LOAD']:
+            result = blockchain.validate_chain()
+            if not result:
+                raise RuntimeError(f'Invalid chain in {state.app.config["BLOCK_STORE_PATH"]}: {result}')
+    if state.app.config['NODE_PEERS']:
+        gossip.interval = state.app.config['GOSSIP_INTERVAL']
+        gossip.configure(state.app.config['NODE_URL'], state.app.config['NODE_PEERS'])
+        gossip.start()
+
+
+def count_queued_transactions() -> list:
+    """Queued transactions per peer, read when the metrics are scraped."""
+    return [({'peer': str(author)}, count) for author, count in blockchain.mempool.author_counts().items()]
+
+
+metrics.registry.register(metrics.Gauge('blockchain_queued_transactions', 'Queued transactions per peer.',
+                                        count_queued_transactions))
+metrics.registry.register(metrics.Gauge('blockchain_queued_transactions_total', 'Queued transactions of every peer.',
+                                        lambda: [({}, len(blockchain.mempool))]))
+metrics.registry.register(metrics.Gauge('blockchain_height', 'Number of blocks in the chain.',
+                                        lambda: [({}, blockchain.get_total_blocks)]))
+
+
+@main.before_request
+def start_request_timer() -> None:
+    g.request_start = time.perf_counter()
+
+
+@main.after_request
+def observe_request_duration(response: Response) -> Response:
+    metrics.http_latency.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or 'unknown')
+    return response
+
+
+@main.route('/metrics', methods=['GET'])
+def get_metrics() -> Response:
+    """Instrumentation of the hot paths in the Prometheus text format."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def conditional_json(body: str, etag: str) -> Response:
+    """JSON response tagged with `etag`, turned into an empty 304 when the client already holds it."""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 @main.route('/chain', methods=['GET'])
-def get_chain() -> json:
-    """User can visits this url to visualize the blockchain content in JSON format."""
-    chain_info = []
-    for block in blockchain.chain:
-        chain_info.append(block.__dict__)
-    return json.dumps({"length": len(chain_info),
-                       "chain": chain_info,
-                       "peers": [peer for peer in blockchain.peers.keys()]})
+def get_chain() -> Response:
+    """User can visits this url to visualize the blockchain content in JSON format. The `from` and `limit` query
+    parameters select a range of blocks, at most 1000 of them, `length` always is the whole chain length.
+
+    Blocks are joined from their cached serialization and the response carries an ETag built from the tip hash, the
+    height and the range, so polling an unchanged chain returns 304."""
+    with blockchain.lock:
+        total_blocks = blockchain.get_total_blocks
+        tip_hash = blockchain.get_latest_block.hash
+    start = max(request.args.get('from', 0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    stop = total_blocks if limit is None else min(start + min(max(limit, 0), 1000), total_blocks)
+    etag = f'{tip_hash}-{total_blocks}-{start}-{stop}'
+    if request.if_none_match.contains(etag):
+        return conditional_json('', etag)
+
+    blocks_json = ', '.join(block.to_json() for block in blockchain.chain[start:stop])
+    return conditional_json(f'{{"length": {total_blocks}, "from": {start}, "chain": [{blocks_json}]}}', etag)
+
+
+@main.route('/chain/export', methods=['GET'])
+def export_chain() -> Response:
+    """Streams the chain from the `from` query parameter as newline delimited JSON, one block per line, reading a
+    single block at a time."""
+    start = max(request.args.get('from', 0, type=int), 0)
+    stop = blockchain.get_total_blocks
+
+    def generate_blocks():
+        for height in range(start, stop):
+            yield blockchain.chain[height].to_json() + '\n'
+
+    return Response(stream_with_context(generate_blocks()), mimetype='application/x-ndjson')
+
+
+@main.route('/chain/import', methods=['POST'])
+def import_chain() -> Response:
+    """Reads a newline delimited JSON chain export as a stream and appends every block through
+    `BlockChain.import_block`, stopping at the first invalid one. Every line is decoded by `Block.parse`, blocks
+    already in the chain are skipped."""
+    imported, skipped, error = 0, 0, None
+    for line in iter_lines(request.stream):
+        if not line.strip():
+            continue
+        try:
+            block = Block.parse(json.loads(line))
+            known = block.index < blockchain.get_total_blocks and blockchain.chain[block.index].hash == block.hash
+        except ValueError as exception:
+            error = {"line": imported + skipped, "reason": f"invalid block: {exception}"}
+            break
+        if known:
+            skipped += 1
+        elif blockchain.import_block(block):
+            imported += 1
+        else:
+            error = {"line": imported + skipped, "index": block.index, "reason": "block rejected"}
+            break
+    return Response(json.dumps({"imported": imported, "skipped": skipped, "error": error}),
+                    status=400 if error else 200, mimetype='application/json')
+
+
+@main.route('/chain/tip', methods=['GET'])
+def get_chain_tip() -> Response:
+    """Summary of the latest block, a cheap way for clients to know whether the chain changed."""
+    with blockchain.lock:
+        total_blocks = blockchain.get_total_blocks
+        tip = blockchain.get_latest_block
+    return conditional_json(json.dumps({"length": total_blocks,
+                                        "index": tip.index,
+                                        "hash": tip.hash,
+                                        "timestamp": tip.timestamp}),
+                            f'{tip.hash}-{total_blocks}')
+
+
+@main.route('/gossip/inv', methods=['POST'])
+def receive_inventory() -> Response:
+    """Inventory announced by another node, answered with the items this node wants to be sent."""
+    message = request.get_json(silent=True)
+    if not isinstance(message, dict) or not isinstance(message.get('inventory'), list) or not all(
+            isinstance(item, dict) and isinstance(item.get('type'), str) and isinstance(item.get('hash'), str)
+            for item in message['inventory']):
+        return "Expected an inventory", 400
+    wanted = gossip.receive_inventory(message.get('node'), message['inventory'])
+    return Response(json.dumps({"wanted": wanted}), mimetype='application/json')
+
+
+@main.route('/gossip/data', methods=['POST'])
+def receive_gossip_data() -> Response:
+    """Blocks and transactions sent by another node, after it announced them."""
+    message = request.get_json(silent=True)
+    if not isinstance(message, dict) or not isinstance(message.get('blocks', []), list) or not isinstance(
+            message.get('transactions', []), list):
+        return "Expected blocks and transactions", 400
+    try:
+        result = gossip.receive_data(message.get('node'), message.get('blocks', []), message.get('transactions', []))
+    except ValueError:
+        return "Invalid blocks", 400
+    return Response(json.dumps(result), mimetype='application/json')
+
+
+@main.route('/gossip/headers', methods=['POST'])
+def get_headers() -> Response:
+    """Main chain headers following the highest block of the sender's locator that this node has."""
+    message = request.get_json(silent=True)
+    if not isinstance(message, dict) or not isinstance(message.get('locator'), list):
+        return "Expected a block locator", 400
+    limit = message.get('limit')
+    headers = gossip.headers([entry for entry in message['locator'] if isinstance(entry, dict)],
+                             max(limit, 1) if isinstance(limit, int) else SYNC_BATCH_SIZE)
+    return Response(json.dumps(headers), mimetype='application/json')
+
+
+@main.route('/peers', methods=['GET'])
+def get_peers() -> json:
+    """Names of the registered peers."""
+    return json.dumps({"peers": [peer for peer in blockchain.peers.keys()]})
+
+
+@main.route('/proof/<int:block_index>/<int:tx_position>', methods=['GET'])
+def get_transaction_proof(block_index: int, tx_position: int) -> json:
+    """Inclusion proof of one transaction, verifiable against the block's Merkle root with
+    `BlockChain.is_valid_transaction_proof`."""
+    if block_index >= blockchain.get_total_blocks:
+        return "Block not found", 404
+    block = blockchain.chain[block_index]
+    if is_pruned(block):
+        return "Block pruned", 410
+    if tx_position >= len(block.transactions):
+        return "Transaction not found", 404
+    return json.dumps({"block_index": block_index,
+                       "tx_position": tx_position,
+                       "transaction": block.transactions[tx_position],
+                       "merkle_root": block.merkle_root,
+                       "proof": merkle_proof(block.transactions, tx_position)})
+
+
+def transaction_entry(location: tuple) -> dict:
+    """Confirmed transaction at a location, marked `pruned` instead when its block's transactions were dropped."""
+    block_index, position = location
+    block = blockchain.chain[block_index]
+    if is_pruned(block):
+        return {"block_index": block_index, "position": position, "pruned": True}
+    return {"block_index": block_index,
+            "position": position,
+            "transaction": block.transactions[position]}
+
+
+def paginated_locations(locations: list) -> json:
+    """Page of confirmed transactions selected by the `from` and `limit` query parameters."""
+    start = max(request.args.get('from', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 0), 1000)
+    return json.dumps({"total": len(locations),
+                       "from": start,
+                       "transactions": [transaction_entry(location) for location in locations[start:start + limit]]})
+
+
+@main.route('/tx/<tx_hash>', methods=['GET'])
+def get_transaction(tx_hash: str) -> json:
+    """Transaction by content hash, from the chain index or from the mempool."""
+    transaction_index.update(blockchain.chain)
+    location = transaction_index.locate(tx_hash)
+    if location is not None:
+        return json.dumps(dict(transaction_entry(location), status="confirmed"))
+    transaction = blockchain.mempool.get(tx_hash)
+    if transaction is not None:
+        return json.dumps({"status": "pending", "transaction": transaction})
+    return "Transaction not found", 404
+
+
+@main.route('/author/<author>/transactions', methods=['GET'])
+def get_author_transactions(author: str) -> json:
+    """Confirmed transactions of an author in chain order, paginated."""
+    transaction_index.update(blockchain.chain)
+    return paginated_locations(transaction_index.by_author.get(author, []))
+
+
+@main.route('/author_id/<author_id>/transactions', methods=['GET'])
+def get_author_id_transactions(author_id: str) -> json:
+    """Confirmed transactions of an author id in chain order, paginated."""
+    transaction_index.update(blockchain.chain)
+    return paginated_locations(transaction_index.by_author_id.get(author_id, []))
+
+
+@main.route('/transactions', methods=['GET'])
+def get_transactions() -> json:
+    """Confirmed transactions in chain order, the `from` global position is located with a binary search."""
+    transaction_index.update(blockchain.chain)
+    start = max(request.args.get('from', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 0), 1000)
+    stop = min(start + limit, transaction_index.total)
+    entries = [transaction_entry(transaction_index.locate_position(position)) for position in range(start, stop)]
+    return json.dumps({"total": transaction_index.total, "from": start, "transactions": entries})
+
+
+@main.route('/block/<int:block_index>/transactions', methods=['GET'])
+def get_block_transactions(block_index: int) -> json:
+    """Transactions of one block with their global positions, an empty list marked `pruned` once they were dropped."""
+    transaction_index.update(blockchain.chain)
+    if block_index >= transaction_index.height:
+        return "Block not found", 404
+    start, stop = transaction_index.block_range(block_index)
+    block = blockchain.chain[block_index]
+    answer = {"block_index": block_index, "from": start, "to": stop, "transactions": block.transactions}
+    if is_pruned(block):
+        answer["pruned"] = True
+    return json.dumps(answer)
+
+
+@main.route('/balance/<author>', methods=['GET'])
+def get_balance(author: str) -> Response:
+    """Balance of an author after the block at the `height` query parameter, the last block by default."""
+    height = request.args.get('height', type=int)
+    with blockchain.ledger.lock:
+        blockchain.ledger.update(blockchain.chain)
+        try:
+            balance = blockchain.ledger.balance(author, height)
+        except IndexError:
+            return "Height not found", 404
+        height = blockchain.ledger.height if height is None else height
+    return Response(json.dumps({"author": author, "height": height, "balance": balance}),
+                    mimetype='application/json')
 
 
 @main.route('/queued_transactions/<peer_name>')
 def get_queued_transactions(peer_name: str) -> json:
-    queued_transactions_per_user = blockchain.peers[peer_name]['queued_transactions']
-    return json.dumps(queued_transactions_per_user)
+    queued_transactions_per_user = blockchain.queued_transactions(peer_name)
+    return json.dumps(list(queued_transactions_per_user))
 
 
-def fetch_queued_transactions() -> None:
-    """This function uses the information stored in a chain route to collect transactions per block in a global list
-    that is going to be parsed by the web app. """
-    try:
-        response = requests.get(f"{request.host_url}chain")
-        if response.status_code == 200:
-            transactions_to_fetch = []
-            chain_content = json.loads(response.content)
-            for block in chain_content["chain"]:
-                for transaction in block["transactions"]:
-                    transaction["index"] = block["index"]
-                    transaction["hash"] = block["prev_hash"]
-                    transactions_to_fetch.append(transaction)
-            global queued_transactions
-            queued_transactions = sorted(transactions_to_fetch, key=lambda key: key['timestamp'], reverse=False)
-    except requests.exceptions.ConnectionError as error:
-        error.status_code = "Connection to /chain refused"
+def render_block_fragment(block: Block) -> Markup:
+    """HTML of one block, rendered once per block hash and reused by every request."""
+    return block_fragments.get(block.hash, lambda: render_template(
+        '_block.html', block=block, transactions=block_entries(block)))
+
+
+def blocks_window(before: Optional[int], limit: int) -> tuple:
+    """Index of the first block and fragments of up to `limit` blocks preceding `before`, the newest when None."""
+    stop = blockchain.get_total_blocks if before is None else min(max(before, 0), blockchain.get_total_blocks)
+    start = max(stop - limit, 0)
+    return start, [render_block_fragment(block) for block in blockchain.chain[start:stop]]
 
 
 @main.route('/')
 def blockchain_index():
-    fetch_queued_transactions()
+    """Only the newest `INDEX_PAGE_SIZE` blocks are rendered, older ones are loaded on demand from
+    `/blocks/fragment`."""
+    first_index, fragments = blocks_window(request.args.get('before', type=int), current_app.config['INDEX_PAGE_SIZE'])
     return render_template('index.html',
                            title='My Blockchain Demo',
                            readable_time=datetime.now(),
-                           transactions=queued_transactions,
-                           chain=blockchain.chain,
+                           block_fragments=fragments,
+                           first_index=first_index,
+                           last_index=first_index + len(fragments) - 1,
                            peers=blockchain.peers,)
 
 
+@main.route('/blocks/fragment', methods=['GET'])
+def get_blocks_fragment() -> json:
+    """HTML of the blocks preceding `before`, used by the index page to load older blocks."""
+    limit = request.args.get('limit', current_app.config['INDEX_PAGE_SIZE'], type=int)
+    first_index, fragments = blocks_window(request.args.get('before', type=int), min(max(limit, 0), 1000))
+    return json.dumps({"first_index": first_index, "html": ''.join(fragments)})
+
+
 @socket_io.event
-def my_ping() -> None:
+@metrics.instrumented_event
+def my_ping(latency: Optional[float] = None) -> None:
     """This event is called by each client and send a "pong" message so the round trip time is measured.
     When the pong is received, the time from the ping is stored, and the average of the last 30 samples is average and
-    displayed by jQuery section in the base.html file."""
+    displayed by jQuery section in the base.html file. Clients send their previous round trip time in milliseconds
+    along, it is aggregated in the client_ping_rtt_seconds metric."""
+    if latency is not None:
+        metrics.ping_rtt.observe(latency / 1000)
     emit('my_pong')
 
 
 @socket_io.event
-def peers_handler(peer_name: str) -> None:
+@metrics.instrumented_event
+def peers_handler(peer_name: Union[str, dict]) -> None:
     """This event handler the peer_name input and evaluates if it is acceptable. Whether it is, then name is added to
-    the peers dictionary and a unique session id is given to it, also the queued_transactions list and a copy of the
-    current blockchain.
+    the peers dictionary and a unique session id is given to it, also the queued_transactions list and a copy-on-write
+    view of the current blockchain. A `{'name', 'public_key'}` object also registers the key the peer signs with, the
+    name is refused if another key is already bound to it.
 
-    The broadcast_peer_status is emitted in order to communicate other online peers that a new peer is active."""
-    if peer_name in [peer for peer in blockchain.peers.keys()] or peer_name == '':
+    The peer_joined event is emitted in order to communicate other online peers that a new peer is active."""
+    public_key = None
+    if isinstance(peer_name, dict):
+        peer_name, public_key = peer_name.get('name'), peer_name.get('public_key')
+    if (not isinstance(peer_name, str) or peer_name in blockchain.peers or peer_name == ''
+            or (public_key is not None and not blockchain.register_key(peer_name, str(public_key)))):
         emit('error_alert', peer_name)
     else:
         blockchain.peers[peer_name] = {'id': request.sid,
-                                       'queued_transactions': [],
-                                       'chain': blockchain.chain}
+                                       'queued_transactions': blockchain.mempool.view(peer_name),
+                                       'chain': ChainView(blockchain)}
         emit('display_peer_info', peer_name)
-        emit('broadcast_peers_status', peer_name, broadcast=True)
+        emit('peer_joined', peer_name, broadcast=True)
+
+
+@socket_io.on('disconnect')
+@metrics.instrumented_event
+def peer_disconnected(*args) -> None:
+    """Event that unregisters the peers of a closed connection and tells the other online peers with peer_left. Their
+    queued transactions stay in the mempool."""
+    for peer_name in [name for name, peer in blockchain.peers.items() if peer['id'] == request.sid]:
+        del blockchain.peers[peer_name]
+        emit('peer_left', peer_name, broadcast=True)
 
 
 @socket_io.event
-def submit_transaction(block_data: dict):
-    """Event that receives transaction information from transaction form in application and stores it in JSON object."""
-    try:
-        if block_data['block_author'] is None:
-            emit('error_alert', block_data['block_author'])
-        transaction_info = {'content': block_data['block_text'],
-                            'author': block_data['block_author'],
-                            'author_id': blockchain.peers[block_data['block_author']]['id']
-                            }
-
-        add_new_transaction_url = f"{request.host_url}add_new_transaction"
-        requests.post(add_new_transaction_url,
-                      json=transaction_info,
-                      headers={'Content-type': 'application/json'})
+@metrics.instrumented_event
+def sync_blocks(last_seen_index: int) -> None:
+    """Event sent by clients on (re)connection or when they notice a gap, with the index of the last block they hold.
+    The blocks after it are sent back by batches of `SYNC_BATCH_SIZE` in a blocks_delta event, `more` telling the
+    client to ask again."""
+    start = max(last_seen_index + 1, 0)
+    stop = min(start + SYNC_BATCH_SIZE, blockchain.get_total_blocks)
+    emit('blocks_delta', {'blocks': [block.to_dict() for block in blockchain.chain[start:stop]],
+                          'more': stop < blockchain.get_total_blocks})
+
+
+@socket_io.event
+@metrics.instrumented_event
+def submit_transaction(block_data: dict) -> bool:
+    """Event that receives transaction information from transaction form in application and stores it in JSON object.
+    The transaction goes straight to the in-process transaction service, whether it was accepted is returned as
+    acknowledgement."""
+    if block_data['block_author'] is None:
+        emit('error_alert', block_data['block_author'])
+        return False
+    transaction_info = {'content': block_data['block_text'],
+                        'author': block_data['block_author'],
+                        'author_id': blockchain.peers[block_data['block_author']]['id']
+                        }
+    accepted = transaction_service.submit(transaction_info)
+    if accepted:
         emit('my_logs', {'msg': f'{block_data["block_author"]} added new transaction.'}, broadcast=True)
-        return redirect('/')
-    except requests.exceptions.ConnectionError as error:
-        error.status_code = "Connection to /add_new_transaction refused"
+    return accepted
 
 
 @main.route('/add_new_transaction', methods=['POST'])
 def add_new_transaction():
     """In this endpoint, transaction information is reviewed and added to blockchain."""
-    transaction_data = request.get_json()
-    required_fields = ['author', 'content', 'author_id']
+    if not transaction_service.submit(request.get_json()):
+        return "Invalid transaction data", 404
+    return "Success", 201
 
-    for field in required_fields:
-        if not transaction_data.get(field):
-            return "Invalid transaction data", 404
 
-    transaction_data['timestamp'] = str(datetime.now())
-    blockchain.add_transaction(transaction_data, transaction_data['author'])
-    return "Success", 201
+@socket_io.event
+@metrics.instrumented_event
+def submit_transactions(batch: List[dict]) -> List[dict]:
+    """Batch version of submit_transaction, the per-item results are returned as acknowledgement."""
+    transactions = []
+    for block_data in batch:
+        author = block_data.get('block_author')
+        peer = blockchain.peers.get(author)
+        transactions.append({'content': block_data.get('block_text'),
+                             'author': author,
+                             'author_id': peer['id'] if peer else None})
+    results = transaction_service.submit_many(transactions)
+    accepted = sum(result['accepted'] for result in results)
+    if accepted:
+        emit('my_logs', {'msg': f'{accepted} new transactions added.'}, broadcast=True)
+    return results
+
+
+@main.route('/add_new_transactions', methods=['POST'])
+def add_new_transactions() -> Response:
+    """Bulk version of add_new_transaction. The body is either a JSON array of transactions or, with the
+    application/x-ndjson content type, one transaction per line read as a stream. Every transaction gets an
+    accept/reject result."""
+    if request.mimetype == 'application/x-ndjson':
+        results = transaction_service.submit_lines(iter_lines(request.stream))
+    else:
+        transactions = request.get_json(silent=True)
+        if not isinstance(transactions, list):
+            return "Expected a JSON array of transactions", 400
+        results = transaction_service.submit_many(transactions)
+    accepted = sum(result['accepted'] for result in results)
+    return Response(json.dumps({"accepted": accepted, "rejected": len(results) - accepted, "results": results}),
+                    status=201 if accepted else 400, mimetype='application/json')
 
 
 @socket_io.event()
-def mine_unconfirmed_transactions(block_miner: str) -> Callable[[Any, Any, bool], Any]:
-    """Event that responds to a 'Mine Block' button in application, broadcast a message to all active peers of mined
-     block in the Logs section."""
-    new_block_index = blockchain.mine_block(block_miner)
-    if not new_block_index:
+@metrics.instrumented_event
+def mine_unconfirmed_transactions(block_miner: str) -> Optional[str]:
+    """Event that responds to a 'Mine Block' button in application. Mining runs as a background job so other events
+    keep being served, the job id is returned right away and a peer asking again while its job runs gets the same id.
+    The job broadcasts a message to all active peers of mined block in the Logs section when it finishes."""
+    if not blockchain.queued_transactions(block_miner):
         emit('my_logs', {'msg': 'No transactions to mine'})
-    else:
-        emit('display_blockchain_to_all_peers', broadcast=True)
-        return emit('my_logs', {'msg': f'Block #{new_block_index} mined by {block_miner}!'}, broadcast=True)
+        return None
+    job, _ = mining_jobs.submit(block_miner, request.sid)
+    return job.id
+
+
+@socket_io.event
+@metrics.instrumented_event
+def cancel_mining_job(job_id: str) -> None:
+    """Event that stops a running mining job, its transactions stay queued."""
+    if not mining_jobs.cancel(job_id):
+        emit('my_logs', {'msg': 'No running mining job to cancel'})
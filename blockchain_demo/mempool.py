@@ -0,0 +1,193 @@
+import json
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from hashlib import sha256
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from blockchain_demo.ledger import replay_key
+
+
+SERVER_FIELDS = ('timestamp',)
+"""tuple: Transaction fields stamped by the server, left out of the content hash."""
+
+
+def transaction_hash(transaction: Any) -> str:
+    """
+    str: Content hash identifying a transaction, equal transactions share it. Only the fields sent by the client count,
+    so a payload submitted again is a duplicate even though the server stamped each copy with its own timestamp.
+    """
+    if isinstance(transaction, dict):
+        transaction = {field: value for field, value in transaction.items() if field not in SERVER_FIELDS}
+    return sha256(json.dumps(transaction, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class MempoolEntry:
+    __slots__ = ('transaction', 'author', 'size')
+
+    def __init__(self, transaction: Any, author: str, size: int) -> None:
+        self.transaction = transaction
+        self.author = author
+        self.size = size
+
+
+class Mempool:
+    """
+    Transactions waiting to be mined, indexed by content hash.
+
+    Adding a transaction already in the pool is a no-op, and so is adding a transfer reusing the nonce of a queued
+    transfer of the same payer, see `replay_key`. Memory is bounded by the serialized size of the transactions,
+    both globally and per author. When an author goes over its budget its oldest transactions are evicted. When the
+    whole pool goes over its budget the oldest transactions of the author using the most memory are evicted, so a
+    chatty peer can't push the others out.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Memory budget of the whole pool.
+    max_author_bytes: int
+        Memory budget of a single author.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_author_bytes: int = 4 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.max_author_bytes = max_author_bytes
+        self.entries: Dict[str, MempoolEntry] = {}
+        self.by_author: Dict[str, OrderedDict] = {}
+        self.by_replay_key: Dict[Tuple[str, int], str] = {}
+        self.author_bytes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.evicted = 0
+        """int: Number of transactions dropped to stay within the memory budgets."""
+
+        self.lock = threading.RLock()
+
+    def add(self, transaction: Any, author: str) -> Optional[str]:
+        """
+        Parameters
+        ----------
+        transaction:
+            Transaction to queue.
+        author:
+            Peer the transaction is queued for.
+
+        Returns
+        -------
+        str:
+            Transaction hash, None if it or a transfer with its nonce was already queued, or it is bigger than a budget.
+        """
+        tx_hash = transaction_hash(transaction)
+        size = len(json.dumps(transaction, sort_keys=True).encode("utf-8"))
+        key = replay_key(transaction)
+        with self.lock:
+            if tx_hash in self.entries or size > min(self.max_author_bytes, self.max_bytes):
+                return None
+            if key is not None and key in self.by_replay_key:
+                return None
+            while self.author_bytes.get(author, 0) + size > self.max_author_bytes:
+                self._evict_oldest(author)
+            while self.total_bytes + size > self.max_bytes:
+                self._evict_oldest(max(self.author_bytes, key=self.author_bytes.get))
+            self.entries[tx_hash] = MempoolEntry(transaction, author, size)
+            if key is not None:
+                self.by_replay_key[key] = tx_hash
+            self.by_author.setdefault(author, OrderedDict())[tx_hash] = None
+            self.author_bytes[author] = self.author_bytes.get(author, 0) + size
+            self.total_bytes += size
+        return tx_hash
+
+    def _evict_oldest(self, author: str) -> None:
+        self.remove([next(iter(self.by_author[author]))])
+        self.evicted += 1
+
+    def remove(self, tx_hashes: Iterable[str]) -> None:
+        """Drops the given transactions, unknown hashes are ignored."""
+        with self.lock:
+            for tx_hash in tx_hashes:
+                entry = self.entries.pop(tx_hash, None)
+                if entry is None:
+                    continue
+                self.by_replay_key.pop(replay_key(entry.transaction), None)
+                del self.by_author[entry.author][tx_hash]
+                self.author_bytes[entry.author] -= entry.size
+                self.total_bytes -= entry.size
+                if not self.by_author[entry.author]:
+                    del self.by_author[entry.author]
+                    del self.author_bytes[entry.author]
+
+    def select(self, author: str, limit: Optional[int] = None) -> List[Tuple[str, Any]]:
+        """
+        Returns
+        -------
+        list:
+            Up to `limit` `(hash, transaction)` pairs of `author`, oldest first.
+        """
+        with self.lock:
+            tx_hashes = list(self.by_author.get(author, ()))[:limit]
+            return [(tx_hash, self.entries[tx_hash].transaction) for tx_hash in tx_hashes]
+
+    def get(self, tx_hash: str) -> Any:
+        """Queued transaction with this hash, None if there is none."""
+        entry = self.entries.get(tx_hash)
+        return None if entry is None else entry.transaction
+
+    def author(self, tx_hash: str) -> Optional[str]:
+        """Author a queued transaction is queued for, None if it is not queued."""
+        entry = self.entries.get(tx_hash)
+        return None if entry is None else entry.author
+
+    def count(self, author: str) -> int:
+        return len(self.by_author.get(author, ()))
+
+    def author_counts(self) -> Dict[str, int]:
+        """Number of queued transactions per author."""
+        with self.lock:
+            return {author: len(tx_hashes) for author, tx_hashes in self.by_author.items()}
+
+    def view(self, author: str) -> 'AuthorQueue':
+        return AuthorQueue(self, author)
+
+    def __contains__(self, tx_hash: str) -> bool:
+        return tx_hash in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class AuthorQueue(Sequence):
+    """
+    Read-only list of an author's queued transactions, oldest first, stored in peers as 'queued_transactions'.
+
+    `append` queues a transaction through the mempool, for code written against the former plain lists.
+    """
+    def __init__(self, mempool: 'Mempool', author: str) -> None:
+        self.mempool = mempool
+        self.author = author
+
+    def _transactions(self, limit: Optional[int] = None) -> List[Any]:
+        return [transaction for _, transaction in self.mempool.select(self.author, limit)]
+
+    def __getitem__(self, position):
+        if isinstance(position, int) and position >= 0:
+            return self._transactions(position + 1)[position]
+        return self._transactions()[position]
+
+    def __iter__(self) -> Iterator[Any]:
+        # `Sequence.__iter__` would select the whole queue once per position.
+        return iter(self._transactions())
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self._transactions())
+
+    def __len__(self) -> int:
+        return self.mempool.count(self.author)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, AuthorQueue)):
+            return self._transactions() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(self._transactions())
+
+    def append(self, transaction: Any) -> None:
+        self.mempool.add(transaction, self.author)
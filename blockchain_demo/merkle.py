@@ -0,0 +1,80 @@
+import json
+from hashlib import sha256
+from typing import Any, Dict, List
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+"""bytes: Leaves and inner nodes are hashed with different prefixes so a node can't be passed off as a leaf."""
+
+
+def hash_leaf(transaction: Any) -> bytes:
+    """Hash of a transaction as a tree leaf."""
+    return sha256(LEAF_PREFIX + json.dumps(transaction, sort_keys=True).encode("utf-8")).digest()
+
+
+def hash_node(left: bytes, right: bytes) -> bytes:
+    """Hash of an inner node from its two children."""
+    return sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(transactions: List[Any]) -> List[List[bytes]]:
+    """
+    Parameters
+    ----------
+    transactions:
+        Block transactions, in block order.
+
+    Returns
+    -------
+    list:
+        Tree levels from the leaves up to the root. A node without a sibling is carried up unchanged.
+    """
+    levels = [[hash_leaf(transaction) for transaction in transactions]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(transactions: List[Any]) -> str:
+    """
+    str: Hexadecimal Merkle root of the transactions, the hash of empty data for a block without transactions.
+    """
+    if not transactions:
+        return sha256(b'').hexdigest()
+    return build_levels(transactions)[-1][0].hex()
+
+
+def merkle_proof(transactions: List[Any], position: int) -> List[Dict[str, str]]:
+    """
+    Inclusion proof of the transaction at `position`.
+
+    Returns
+    -------
+    list:
+        Sibling hashes from the leaf level up, each with the side it is concatenated on ('left' or 'right').
+    """
+    proof = []
+    for level in build_levels(transactions)[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({'hash': level[sibling].hex(), 'side': 'left' if sibling < position else 'right'})
+        position //= 2
+    return proof
+
+
+def verify_merkle_proof(transaction: Any, proof: List[Dict[str, str]], root: str) -> bool:
+    """
+    Returns
+    -------
+    bool:
+        True if `proof` links `transaction` to the Merkle `root`, false otherwise.
+    """
+    node = hash_leaf(transaction)
+    for step in proof:
+        sibling = bytes.fromhex(step['hash'])
+        node = hash_node(sibling, node) if step['side'] == 'left' else hash_node(node, sibling)
+    return node.hex() == root
@@ -0,0 +1,175 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: Labels, extra: str = '') -> str:
+    parts = [f'{name}="{escape_label(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Counter:
+    """Monotonic count per label set."""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.values: Dict[Labels, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield f'{self.name}{format_labels(labels)} {format_value(value)}'
+
+
+class Gauge:
+    """
+    Value read when the metrics are scraped, so keeping it up to date costs nothing on the hot paths.
+
+    Parameters
+    ----------
+    read: Callable
+        Returns `(labels, value)` pairs, labels being a dictionary.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Iterable[Tuple[dict, float]]]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.read():
+            yield f'{self.name}{format_labels(tuple(sorted(labels.items())))} {format_value(value)}'
+
+
+class Histogram:
+    """
+    Distribution of observed values per label set over fixed buckets.
+
+    An observation is a binary search and three increments under a lock, buckets are only made cumulative when
+    rendered.
+
+    Parameters
+    ----------
+    buckets: Sequence[float]
+        Increasing upper bounds, the +Inf bucket is implicit.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.bounds = list(buckets)
+        self.values: Dict[Labels, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        position = bisect_left(self.bounds, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels: str) -> 'Timer':
+        """Context manager observing the seconds spent in its block."""
+        return Timer(self, labels)
+
+    def samples(self) -> Iterable[str]:
+        with self.lock:
+            values = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.values.items()]
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds + [float('inf')], counts):
+                cumulative += bucket_count
+                bucket_label = 'le="' + format_value(bound) + '"'
+                yield f'{self.name}_bucket{format_labels(labels, bucket_label)} {cumulative}'
+            yield f'{self.name}_sum{format_labels(labels)} {format_value(total)}'
+            yield f'{self.name}_count{format_labels(labels)} {count}'
+
+
+class Timer:
+    def __init__(self, histogram: Histogram, labels: dict) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text exposition format."""
+    def __init__(self) -> None:
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MINING_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+HASH_RATE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 1e8)
+
+registry = Registry()
+
+hash_rate = registry.register(Histogram(
+    'blockchain_pow_nonces_per_second', 'Nonces tried per second by a proof of work.', HASH_RATE_BUCKETS))
+mining_duration = registry.register(Histogram(
+    'blockchain_block_mining_seconds', 'Duration of the proof of work of a block.', MINING_BUCKETS))
+http_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'Duration of the HTTP requests by endpoint.', LATENCY_BUCKETS))
+socketio_events = registry.register(Counter(
+    'socketio_events_total', 'Socket.IO events handled by event name.'))
+socketio_duration = registry.register(Histogram(
+    'socketio_event_duration_seconds', 'Duration of the Socket.IO event handlers by event name.', LATENCY_BUCKETS))
+ping_rtt = registry.register(Histogram(
+    'client_ping_rtt_seconds', 'Round trip times of my_ping measured and reported by the clients.', LATENCY_BUCKETS))
+
+
+def instrumented_event(handler: Callable) -> Callable:
+    """Counts and times a Socket.IO event handler, to be placed under the `socket_io.event`/`on` decorator."""
+    @functools.wraps(handler)
+    def wrapper(*args):
+        socketio_events.inc(event=handler.__name__)
+        with socketio_duration.time(event=handler.__name__):
+            return handler(*args)
+    return wrapper
@@ -0,0 +1,202 @@
+import multiprocessing
+import os
+import struct
+import threading
+from hashlib import sha256
+from typing import Callable, Optional, Tuple
+
+NONCE_STRUCT = struct.Struct('>Q')
+"""struct.Struct: Nonce layout appended after the header prefix."""
+
+MAX_TARGET = (1 << 256) - 1
+"""int: Easiest target, every hash is below it."""
+
+NO_RESULT = 2 ** 63 - 1
+"""int: Sentinel stored in the shared best nonce while no worker has found a valid hash."""
+
+_best_nonce = None
+"""multiprocessing.Value: Lowest valid nonce found so far, shared by the pool workers."""
+
+_nonces_tried = None
+"""multiprocessing.Value: Number of nonces tried by all the pool workers."""
+
+
+def difficulty_target(difficulty: int) -> int:
+    """int: Target equivalent to `difficulty` leading zeros in the hexadecimal hash, 4 leading zero bits each."""
+    return MAX_TARGET >> min(4 * difficulty, 256)
+
+
+def meets_target(block_hash: str, target: int) -> bool:
+    """bool: Whether the hexadecimal hash, read as a 256-bit number, is not above `target`."""
+    return int(block_hash, 16) <= target
+
+
+def retarget(target: int, elapsed: float, expected: float, max_adjustment: int = 4) -> int:
+    """
+    Scales a target by the ratio between the measured and the expected duration of a window of blocks.
+
+    Parameters
+    ----------
+    target:
+        Target in effect during the window.
+    elapsed:
+        Seconds the window of blocks took.
+    expected:
+        Seconds the window should have taken.
+    max_adjustment:
+        Largest factor the target moves by in one retarget, in both directions.
+
+    Returns
+    -------
+    int:
+        Next target, easier when the blocks came too slowly, harder when they came too fast.
+    """
+    elapsed = min(max(elapsed, expected / max_adjustment), expected * max_adjustment)
+    # Durations in microseconds keep the arithmetic on integers, a float can't hold a 256-bit target.
+    return max(1, min(target * round(elapsed * 1e6) // round(expected * 1e6), MAX_TARGET))
+
+
+class MiningCancelled(Exception):
+    """Raised by `Miner.search` when its cancel event is set before a valid hash is found."""
+
+
+def search_batch(midstate, target: bytes, nonce: int, step: int, count: int) -> Optional[Tuple[int, str]]:
+    """
+    Tries `count` nonces ``nonce, nonce + step, ...`` on top of the header `midstate`.
+
+    Parameters
+    ----------
+    midstate:
+        `sha256` object that already hashed the header prefix.
+    target:
+        Target as 32 big-endian bytes, the digest must not be above it.
+    nonce:
+        First nonce to try.
+    step:
+        Distance between two tried nonces.
+    count:
+        Number of nonces to try.
+
+    Returns
+    -------
+    tuple:
+        First valid nonce and its hash, None if there is none in the batch.
+    """
+    for _ in range(count):
+        attempt = midstate.copy()
+        attempt.update(NONCE_STRUCT.pack(nonce))
+        # Byte strings of equal length compare like the big-endian numbers they encode.
+        if attempt.digest() <= target:
+            return nonce, attempt.hexdigest()
+        nonce += step
+    return None
+
+
+def _init_worker(best_nonce, nonces_tried) -> None:
+    global _best_nonce, _nonces_tried
+    _best_nonce = best_nonce
+    _nonces_tried = nonces_tried
+
+
+def _search_stride(arguments: tuple) -> Optional[Tuple[int, str]]:
+    prefix, target, nonce, step, batch_size = arguments
+    midstate = sha256(prefix)
+    while nonce <= _best_nonce.value:
+        result = search_batch(midstate, target, nonce, step, batch_size)
+        with _nonces_tried.get_lock():
+            _nonces_tried.value += batch_size
+        if result is not None:
+            with _best_nonce.get_lock():
+                _best_nonce.value = min(_best_nonce.value, result[0])
+            return result
+        nonce += step * batch_size
+    return None
+
+
+class Miner:
+    """
+    Proof of work engine.
+
+    With a single worker the nonce search runs in the calling process. With more workers the nonce space is split in
+    strided ranges, worker ``i`` trying ``start + i, start + i + workers, ...``. A worker stops as soon as it finds a
+    valid hash or once its nonces pass the lowest valid nonce already found, so the result is the same
+    `(nonce, hash)` as the single-process search.
+
+    Parameters
+    ----------
+    workers: int
+        Number of processes searching nonces, defaults to the number of CPUs.
+    batch_size: int
+        Nonces tried by a worker between two checks of the shared best nonce.
+    poll_interval: float
+        Seconds between two progress reports while the pool is searching.
+    """
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 4096, poll_interval: float = 0.2) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    def search(self, prefix: bytes, target: int, start: int = 0,
+               progress: Optional[Callable[[int], None]] = None,
+               cancel: Optional[threading.Event] = None) -> Tuple[int, str]:
+        """
+        Parameters
+        ----------
+        prefix:
+            Block header without the nonce.
+        target:
+            Highest acceptable hash as a 256-bit number, see `difficulty_target`.
+        start:
+            First nonce to try.
+        progress:
+            Called with the number of nonces tried so far, once per batch or poll interval.
+        cancel:
+            Event that stops the search when set.
+
+        Returns
+        -------
+        tuple:
+            Lowest valid nonce from `start` and its hash.
+
+        Raises
+        ------
+        MiningCancelled
+            If `cancel` is set before a valid hash is found.
+        """
+        target = target.to_bytes(32, 'big')
+        if self.workers == 1:
+            return self._search_in_process(prefix, target, start, progress, cancel)
+
+        best_nonce = multiprocessing.Value('q', NO_RESULT)
+        nonces_tried = multiprocessing.Value('q', 0)
+        ranges = [(prefix, target, start + offset, self.workers, self.batch_size) for offset in range(self.workers)]
+        with multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(best_nonce, nonces_tried)) as pool:
+            pending = pool.map_async(_search_stride, ranges)
+            while not pending.ready():
+                pending.wait(self.poll_interval)
+                if progress is not None:
+                    progress(nonces_tried.value)
+                if cancel is not None and cancel.is_set():
+                    # Every worker range starts above -1, so this stops them all at their next batch.
+                    with best_nonce.get_lock():
+                        best_nonce.value = -1
+            results = [result for result in pending.get() if result is not None]
+        if not results:
+            raise MiningCancelled()
+        return min(results)
+
+    def _search_in_process(self, prefix: bytes, target: bytes, nonce: int,
+                           progress: Optional[Callable[[int], None]],
+                           cancel: Optional[threading.Event]) -> Tuple[int, str]:
+        midstate = sha256(prefix)
+        nonces_tried = 0
+        while True:
+            result = search_batch(midstate, target, nonce, 1, self.batch_size)
+            if result is not None:
+                return result
+            nonce += self.batch_size
+            nonces_tried += self.batch_size
+            if progress is not None:
+                progress(nonces_tried)
+            if cancel is not None and cancel.is_set():
+                raise MiningCancelled()
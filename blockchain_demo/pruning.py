@@ -0,0 +1,134 @@
+import json
+import threading
+from typing import Any, Callable, List, Optional
+
+
+def is_pruned(block: Any) -> bool:
+    """bool: Whether the transactions of a block were dropped by a `Pruner`."""
+    return 'pruned' in block.__dict__
+
+
+def transaction_count(block: Any) -> int:
+    """int: Number of transactions a block confirms, pruned ones included."""
+    return block.__dict__.get('pruned', len(block.transactions))
+
+
+class Pruner:
+    """
+    Drops the transactions of old blocks from an in-memory chain, keeping their headers.
+
+    A pruned block keeps its index, timestamp, prev_hash, nonce, target, Merkle root and hash, so links and proof of
+    work are still checked, while its `transactions` become an empty list and `pruned` records how many there were.
+    Blocks are pruned once they are `depth` blocks below the tip, and the oldest remaining ones while the transactions
+    kept take more than `max_bytes` as JSON. The tip is never pruned. With an `archive_path`, every block is appended to
+    that file before it's pruned, in the `/chain/export` format, so `/chain/import` can restore a full chain from it.
+
+    Pruning happens `batch_size` blocks at a time, listeners dropping what they derived from the pruned transactions do
+    it rarely. Chains kept on disk, a `BlockStore` or a shared backend, are left as they are.
+
+    Parameters
+    ----------
+    depth: int
+        Number of blocks from the tip whose transactions are kept, None keeps them at any depth. It should exceed the
+        deepest expected reorganization, pruned blocks taken off the chain can't requeue their transactions.
+    max_bytes: int
+        Budget of the transactions kept, None for no limit.
+    archive_path: str
+        File pruned blocks are appended to, None discards them.
+    batch_size: int
+        Minimum number of blocks pruned at once.
+    """
+    def __init__(self, depth: Optional[int] = None, max_bytes: Optional[int] = None,
+                 archive_path: Optional[str] = None, batch_size: int = 100) -> None:
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.archive_path = archive_path
+        self.batch_size = batch_size
+        self.listeners: List[Callable[[list], None]] = []
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.height = 0
+        """int: Height of the first block whose transactions are kept."""
+
+        self.sizes: List[int] = []
+        """list: Transactions size of each block from `height`, the chain's tip included."""
+
+        self.hashes: List[str] = []
+        """list: Hash of each measured block, to notice the blocks a reorganization replaced."""
+
+        self.kept_bytes = 0
+        self._chain = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.depth is not None or self.max_bytes is not None
+
+    def subscribe(self, listener: Callable[[list], None]) -> None:
+        """
+        Registers `listener` to be called with every batch of blocks about to be pruned, their transactions still in.
+        """
+        self.listeners.append(listener)
+
+    def update(self, chain) -> int:
+        """
+        Measures the blocks appended to `chain` since the last update, then prunes if a limit is exceeded.
+
+        Returns
+        -------
+        int:
+            Number of blocks pruned.
+        """
+        if not self.enabled or not isinstance(chain, list):
+            return 0
+        with self.lock:
+            if chain is not self._chain:
+                self.reset()
+                self._chain = chain
+                while self.height < len(chain) - 1 and is_pruned(chain[self.height]):
+                    self.height += 1
+            while self.sizes and (self.height + len(self.sizes) > len(chain)
+                                  or chain[self.height + len(self.sizes) - 1].hash != self.hashes[-1]):
+                self.hashes.pop()
+                self.kept_bytes -= self.sizes.pop()
+            self.height = min(self.height, len(chain))
+            for block in chain[self.height + len(self.sizes):]:
+                size = len(json.dumps(block.transactions))
+                self.sizes.append(size)
+                self.hashes.append(block.hash)
+                self.kept_bytes += size
+            count = self._count(len(chain))
+            if count:
+                self._prune(chain[self.height:self.height + count])
+            return count
+
+    def _count(self, length: int) -> int:
+        """Number of blocks to prune from `height`, 0 until a whole batch is due or the byte budget is exceeded."""
+        prunable = len(self.sizes) - 1
+        count = 0
+        if self.depth is not None:
+            count = min(max(length - self.depth - self.height, 0), prunable)
+            if count < self.batch_size:
+                count = 0
+        if self.max_bytes is not None and self.kept_bytes > self.max_bytes:
+            kept = self.kept_bytes - sum(self.sizes[:count])
+            while count < prunable and (kept > self.max_bytes or count < self.batch_size):
+                kept -= self.sizes[count]
+                count += 1
+        return count
+
+    def _prune(self, blocks: list) -> None:
+        if self.archive_path:
+            with open(self.archive_path, 'a') as archive:
+                archive.writelines(block.to_json() + '\n' for block in blocks)
+        for listener in self.listeners:
+            listener(blocks)
+        for block in blocks:
+            block.pruned = len(block.transactions)
+            block.transactions = []
+            block.__dict__.pop('_json', None)
+        self.kept_bytes -= sum(self.sizes[:len(blocks)])
+        del self.sizes[:len(blocks)]
+        del self.hashes[:len(blocks)]
+        self.height += len(blocks)
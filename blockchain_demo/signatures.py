@@ -0,0 +1,164 @@
+import json
+import multiprocessing
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import ECC
+from Crypto.Signature import DSS
+
+from blockchain_demo.ledger import spends
+from blockchain_demo.mempool import transaction_hash
+
+UNSIGNED_FIELDS = ('signature', 'timestamp')
+"""tuple: Transaction fields left out of the signed payload, the timestamp is stamped by the server."""
+
+_keys: Dict[str, Any] = {}
+"""dict: Parsed public keys by their hexadecimal DER encoding, per process."""
+
+
+def signing_payload(transaction: dict) -> bytes:
+    """bytes: Canonical JSON of the signed fields of a transaction, what the author signs."""
+    signed = {field: value for field, value in transaction.items() if field not in UNSIGNED_FIELDS}
+    return json.dumps(signed, sort_keys=True).encode("utf-8")
+
+
+def public_key_hex(key: ECC.EccKey) -> str:
+    """str: Hexadecimal DER encoding of a key's public part, the `public_key` field of signed transactions."""
+    return key.public_key().export_key(format='DER').hex()
+
+
+def sign_transaction(transaction: dict, key: ECC.EccKey) -> dict:
+    """
+    Signs a transaction with an ECDSA P-256 key.
+
+    Returns
+    -------
+    dict:
+        Copy of the transaction with its `public_key` and `signature`.
+    """
+    signed = dict(transaction, public_key=public_key_hex(key))
+    signature = DSS.new(key, 'fips-186-3').sign(SHA256.new(signing_payload(signed)))
+    signed['signature'] = signature.hex()
+    return signed
+
+
+def is_signed(transaction: Any) -> bool:
+    return isinstance(transaction, dict) and 'signature' in transaction
+
+
+def verify_signature(public_key: str, signature: str, payload: bytes) -> bool:
+    """bool: Whether `signature` of `payload` was made by the private part of `public_key`."""
+    try:
+        key = _keys.get(public_key)
+        if key is None:
+            key = _keys[public_key] = ECC.import_key(bytes.fromhex(public_key))
+            if len(_keys) > 10000:
+                _keys.pop(next(iter(_keys)))
+        DSS.new(key, 'fips-186-3').verify(SHA256.new(payload), bytes.fromhex(signature))
+        return True
+    except (ValueError, TypeError, IndexError):
+        return False
+
+
+def verify_batch(items: List[Tuple[str, str, bytes]]) -> List[bool]:
+    """Verifies `(public key, signature, payload)` items, run by the pool workers."""
+    return [verify_signature(*item) for item in items]
+
+
+class SignatureVerifier:
+    """
+    Transaction signature checks with a cache of verified transactions.
+
+    Transactions are identified by their content hash, so a transaction verified when it was queued is not verified
+    again when its block is mined, imported or validated. Batches that miss the cache are verified by a process pool,
+    in chunks of `batch_size`.
+
+    A valid signature only proves the transaction was signed by its `public_key`, `author_keys` holds the key each
+    local author registered when joining, see `BlockChain.author_key` for the key a transaction must be signed with.
+
+    Parameters
+    ----------
+    workers: int
+        Number of processes verifying signatures, 1 verifies in the calling process.
+    batch_size: int
+        Number of signatures sent to a worker at once, smaller batches are verified in the calling process.
+    cache_size: int
+        Number of verified transaction hashes remembered.
+    required: bool
+        Whether unsigned transactions are rejected.
+    """
+    def __init__(self, workers: int = 1, batch_size: int = 256, cache_size: int = 1_000_000,
+                 required: bool = False) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.required = required
+        self.verified: OrderedDict = OrderedDict()
+        self.author_keys: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self._pool = None
+
+    def register(self, author: str, public_key: str) -> bool:
+        """bool: Registers the key `author` signs with, false if the author already registered another one."""
+        with self.lock:
+            return self.author_keys.setdefault(author, public_key) == public_key
+
+    def verify(self, transaction: Any) -> bool:
+        return self.verify_many([transaction])[0]
+
+    def verify_many(self, transactions: Iterable[Any], required: Optional[bool] = None) -> List[bool]:
+        """
+        Parameters
+        ----------
+        transactions:
+            Transactions to check, as queued or as stored in blocks.
+        required:
+            Whether unsigned transactions fail, `required` by default. Unsigned transfers always fail.
+
+        Returns
+        -------
+        list:
+            Whether each transaction is valid: signed with a valid signature, or unsigned when not required.
+        """
+        required = self.required if required is None else required
+        transactions = list(transactions)
+        results = [not required and not spends(transaction) for transaction in transactions]
+        pending = []
+        for position, transaction in enumerate(transactions):
+            if not is_signed(transaction):
+                continue
+            tx_hash = transaction_hash(transaction)
+            with self.lock:
+                if tx_hash in self.verified:
+                    self.verified.move_to_end(tx_hash)
+                    results[position] = True
+                    continue
+            pending.append((position, tx_hash, (str(transaction.get('public_key')), str(transaction['signature']),
+                                                signing_payload(transaction))))
+        if pending:
+            for (position, tx_hash, _), valid in zip(pending, self._verify([item for _, _, item in pending])):
+                results[position] = valid
+                if valid:
+                    self._remember(tx_hash)
+        return results
+
+    def _verify(self, items: List[Tuple[str, str, bytes]]) -> List[bool]:
+        if self.workers == 1 or len(items) <= self.batch_size:
+            return verify_batch(items)
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        batches = [items[position:position + self.batch_size] for position in range(0, len(items), self.batch_size)]
+        return [valid for results in self._pool.imap(verify_batch, batches) for valid in results]
+
+    def _remember(self, tx_hash: str) -> None:
+        with self.lock:
+            self.verified[tx_hash] = None
+            if len(self.verified) > self.cache_size:
+                self.verified.popitem(last=False)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
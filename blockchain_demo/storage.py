@@ -0,0 +1,169 @@
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Sequence
+from typing import Any, Callable, Iterable, List, Union
+
+INDEX_ENTRY = struct.Struct('>IQI')
+"""struct.Struct: Index entry of a block (segment number, offset in the segment, record length)."""
+
+SEGMENT_NAME = 'segment-{:05d}.dat'
+INDEX_NAME = 'index.dat'
+LEDGER_NAME = 'ledger.ndjson'
+
+
+class MappedFile:
+    """
+    Append-only file whose reads go through a read-only `mmap`, remapped only when a read goes past the mapped size.
+
+    Parameters
+    ----------
+    path: str
+        File location, created if missing.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, 'a+b')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self._map = None
+
+    def append(self, data: bytes, fsync: bool = False) -> int:
+        """Writes `data` at the end of the file and returns its offset."""
+        offset = self.size
+        self.file.write(data)
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+        self.size += len(data)
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self._map is None or offset + length > len(self._map):
+            self._remap()
+        return self._map[offset:offset + length]
+
+    def truncate(self, size: int) -> None:
+        self._close_map()
+        self.file.truncate(size)
+        self.size = size
+
+    def close(self) -> None:
+        self._close_map()
+        self.file.close()
+
+    def _remap(self) -> None:
+        self._close_map()
+        self._map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class BlockStore(Sequence):
+    """
+    Append-only block storage on disk, usable wherever `BlockChain.chain` is a list.
+
+    Blocks are written as JSON records to numbered segment files. `index.dat` holds one fixed-size entry per height, so
+    opening the store only reads the index size and the height → record lookup is a single index read. Reads go
+    through `mmap` and decode a new `Block` every time, except for the tip which is cached.
+
+    Parameters
+    ----------
+    path: str
+        Directory holding the segment and index files, created if missing.
+    decode: Callable
+        Builds a block from its stored JSON text, written with the block's `to_json`.
+    segment_size: int
+        Size in bytes after which a new segment file is started.
+    fsync: bool
+        Whether every append is flushed to the disk before returning.
+    """
+    def __init__(self, path: str, decode: Callable[[str], Any], segment_size: int = 64 * 1024 * 1024,
+                 fsync: bool = False) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.decode = decode
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.index = MappedFile(os.path.join(path, INDEX_NAME))
+        self.segments: List[MappedFile] = []
+        self._tip = None
+        self._recover()
+
+    def _segment(self, number: int) -> MappedFile:
+        while len(self.segments) <= number:
+            self.segments.append(MappedFile(os.path.join(self.path, SEGMENT_NAME.format(len(self.segments)))))
+        return self.segments[number]
+
+    def _recover(self) -> None:
+        """Drops a partially written tail left by a crash, only the last index entry is checked."""
+        height = self.index.size // INDEX_ENTRY.size
+        if height * INDEX_ENTRY.size != self.index.size:
+            self.index.truncate(height * INDEX_ENTRY.size)
+        while height:
+            segment, offset, length = self._entry(height - 1)
+            if offset + length <= self._segment(segment).size:
+                break
+            height -= 1
+            self.index.truncate(height * INDEX_ENTRY.size)
+        number = 0
+        while os.path.exists(os.path.join(self.path, SEGMENT_NAME.format(number))):
+            self._segment(number)
+            number += 1
+
+    def _entry(self, height: int) -> tuple:
+        return INDEX_ENTRY.unpack(self.index.read(height * INDEX_ENTRY.size, INDEX_ENTRY.size))
+
+    def __len__(self) -> int:
+        return self.index.size // INDEX_ENTRY.size
+
+    def __getitem__(self, height: Union[int, slice]):
+        if isinstance(height, slice):
+            return [self[position] for position in range(*height.indices(len(self)))]
+        total = len(self)
+        if height < 0:
+            height += total
+        if not 0 <= height < total:
+            raise IndexError('block height out of range')
+        if height == total - 1 and self._tip is not None:
+            return self._tip
+        segment, offset, length = self._entry(height)
+        return self.decode(self._segment(segment).read(offset, length).decode("utf-8"))
+
+    def append(self, block) -> None:
+        """Stores a sealed block at the next height."""
+        record = block.to_json().encode("utf-8")
+        with self.lock:
+            segment = max(len(self.segments) - 1, 0)
+            if self._segment(segment).size and self._segment(segment).size + len(record) > self.segment_size:
+                segment += 1
+            offset = self._segment(segment).append(record, self.fsync)
+            self.index.append(INDEX_ENTRY.pack(segment, offset, len(record)), self.fsync)
+            self._tip = block
+
+    def truncate(self, height: int) -> None:
+        """Drops the blocks from `height` on, e.g. when a reorganization replaces them."""
+        with self.lock:
+            if height >= len(self):
+                return
+            segment, offset, _ = self._entry(height)
+            self.index.truncate(height * INDEX_ENTRY.size)
+            self._segment(segment).truncate(offset)
+            for later in self.segments[segment + 1:]:
+                later.truncate(0)
+            self._tip = None
+
+    def replace(self, height: int, blocks: Iterable) -> None:
+        """Drops the blocks from `height` on and appends `blocks`, see `SQLiteChain.replace`."""
+        self.truncate(height)
+        for block in blocks:
+            self.append(block)
+
+    def close(self) -> None:
+        self.index.close()
+        for segment in self.segments:
+            segment.close()
@@ -0,0 +1,156 @@
+import json
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List, Optional
+
+from blockchain_demo.ledger import is_valid_transfer, signing_key
+
+REQUIRED_FIELDS = ('author', 'content', 'author_id')
+"""tuple: Fields a submitted transaction must fill."""
+
+INVALID_JSON = object()
+"""object: Placeholder for a streamed line that could not be parsed."""
+
+
+def iter_lines(stream, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Lines of a binary stream read by chunks, request streams are slow to read line by line."""
+    pending = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def block_entries(block) -> List[dict]:
+    """
+    Transactions of one block ordered by timestamp, as displayed by the index page. Transactions that are not objects
+    are shown as `{'content': transaction}`.
+    """
+    entries = [transaction if isinstance(transaction, dict) else {'content': transaction}
+               for transaction in block.transactions]
+    return sorted(entries, key=lambda entry: entry.get('timestamp', ''))
+
+
+class TransactionService:
+    """
+    In-process entry point for new transactions.
+
+    Parameters
+    ----------
+    blockchain: BlockChain
+        Chain receiving the transactions.
+    """
+    def __init__(self, blockchain) -> None:
+        self.blockchain = blockchain
+
+    def check(self, transaction_data: Any, relayed: bool = False) -> Optional[str]:
+        """
+        Why a submitted transaction is rejected before its signature is verified, None if it can be queued.
+
+        A `relayed` transaction was submitted to another node, its author may have joined there only: it is checked
+        against the key bound to its author when this node knows one.
+        """
+        if not isinstance(transaction_data, dict):
+            return 'not a JSON object'
+        missing = [field for field in REQUIRED_FIELDS if not transaction_data.get(field)]
+        if missing:
+            return f'missing {", ".join(missing)}'
+        if not relayed and transaction_data['author'] not in self.blockchain.peers:
+            return 'unknown author'
+        signer = signing_key(transaction_data)
+        if signer is not None:
+            key = self.blockchain.author_key(signer[0])
+            if signer[1] != key and not (relayed and key is None):
+                return 'key not registered for author'
+        if not is_valid_transfer(transaction_data):
+            return 'invalid transfer'
+        if self.blockchain.ledger.is_replay(transaction_data):
+            return 'replayed transfer'
+        return None
+
+    def submit(self, transaction_data: Any) -> bool:
+        """
+        Checks the transaction like `submit_many`, stamps it and queues it for its author.
+
+        Returns
+        -------
+        bool:
+            True if the transaction was queued, false if it was rejected, a duplicate or over the mempool budget.
+        """
+        return self.submit_many([transaction_data])[0]['accepted']
+
+    def submit_many(self, transactions: Iterable[Any], first_position: int = 0, relayed: bool = False) -> List[dict]:
+        """
+        Bulk version of `submit`: the whole batch shares one timestamp, its signatures are verified in one batch and
+        the mempool is locked once.
+
+        Parameters
+        ----------
+        transactions:
+            Transactions to queue, anything else than a dictionary is rejected.
+        first_position:
+            Position reported for the first transaction.
+        relayed:
+            Whether the transactions were gossiped by another node, see `check`. They keep the timestamp they were
+            stamped with there, so their hash stays the same on every node.
+
+        Returns
+        -------
+        list:
+            One result per transaction: its `position`, whether it was `accepted`, with its `hash` if so or the
+            `reason` otherwise.
+        """
+        timestamp = str(datetime.now())
+        transactions, reasons = list(transactions), []
+        for transaction_data in transactions:
+            reason = self.check(transaction_data, relayed)
+            if reason is None and not (relayed and isinstance(transaction_data.get('timestamp'), str)):
+                transaction_data['timestamp'] = timestamp
+            reasons.append(reason)
+        candidates = [position for position, reason in enumerate(reasons) if reason is None]
+        signatures = self.blockchain.signatures.verify_many(transactions[position] for position in candidates)
+        for position, valid in zip(candidates, signatures):
+            if not valid:
+                reasons[position] = 'missing or invalid signature'
+
+        results = []
+        with self.blockchain.mempool.lock:
+            for position, (transaction_data, reason) in enumerate(zip(transactions, reasons), first_position):
+                if reason is None:
+                    tx_hash = self.blockchain.add_transaction(transaction_data, transaction_data['author'])
+                    if tx_hash is None:
+                        reason = 'duplicate or over the mempool budget'
+                if reason is None:
+                    results.append({'position': position, 'accepted': True, 'hash': tx_hash})
+                else:
+                    results.append({'position': position, 'accepted': False, 'reason': reason})
+        return results
+
+    def submit_lines(self, lines: Iterable[bytes], batch_size: int = 1000) -> List[dict]:
+        """
+        Queues newline delimited JSON transactions as they are read, `batch_size` lines at a time, so the body never
+        has to be held in memory. Blank lines are skipped, lines that are not valid JSON are rejected.
+        """
+        results = []
+        batch, position = [], 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                batch.append(json.loads(line))
+            except ValueError:
+                batch.append(INVALID_JSON)
+            if len(batch) == batch_size:
+                results.extend(self._submit_parsed(batch, position))
+                position += len(batch)
+                batch = []
+        results.extend(self._submit_parsed(batch, position))
+        return results
+
+    def _submit_parsed(self, batch: List[Any], first_position: int) -> List[dict]:
+        results = self.submit_many(batch, first_position)
+        for result, transaction in zip(results, batch):
+            if transaction is INVALID_JSON:
+                result['reason'] = 'invalid JSON'
+        return results
@@ -0,0 +1,201 @@
+import json
+import multiprocessing
+import os
+import struct
+import threading
+from hashlib import sha256
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from blockchain_demo.merkle import merkle_root
+from blockchain_demo.mining import NONCE_STRUCT, meets_target
+
+
+class ValidationResult:
+    """
+    Outcome of `ChainValidator.validate`.
+
+    Parameters
+    ----------
+    start: int
+        First height checked.
+    stop: int
+        Height after the last one checked.
+    invalid_height: int
+        First height that failed, None if the range is valid.
+    reason: str
+        Why `invalid_height` failed.
+    """
+    def __init__(self, start: int, stop: int, invalid_height: Optional[int] = None, reason: str = '') -> None:
+        self.start = start
+        self.stop = stop
+        self.invalid_height = invalid_height
+        self.reason = reason
+
+    @property
+    def valid(self) -> bool:
+        return self.invalid_height is None
+
+    def __bool__(self) -> bool:
+        return self.valid
+
+    def __repr__(self) -> str:
+        if self.valid:
+            return f'ValidationResult(valid [{self.start}, {self.stop}))'
+        return f'ValidationResult(invalid at {self.invalid_height}: {self.reason})'
+
+
+def check_batch(items: List[Tuple[int, bytes, int, str, str, Any, int]]) -> List[Tuple[int, str]]:
+    """
+    Proof of work and transactions commitment of a batch of blocks, run by the pool workers.
+
+    Parameters
+    ----------
+    items:
+        `(height, header prefix, nonce, hash, Merkle root, transactions, target)` of each block, the header prefix is
+        None when the block's fields don't fit the header layout, the transactions are None for a pruned block, only
+        its header is checked.
+
+    Returns
+    -------
+    list:
+        `(height, reason)` of the blocks that failed.
+    """
+    failures = []
+    for height, prefix, nonce, block_hash, root, transactions, target in items:
+        try:
+            header_hash = None if prefix is None else sha256(prefix + NONCE_STRUCT.pack(nonce)).hexdigest()
+        except struct.error:
+            header_hash = None
+        if not meets_target(block_hash, target):
+            failures.append((height, 'hash does not meet the target'))
+        elif header_hash != block_hash:
+            failures.append((height, 'header hash mismatch'))
+        elif transactions is not None and merkle_root(transactions) != root:
+            failures.append((height, 'transactions do not match the Merkle root'))
+    return failures
+
+
+class ChainValidator:
+    """
+    Whole chain or range validation: index continuity, prev_hash links, proof of work and Merkle roots.
+
+    Links are checked in the calling process while the hashing is spread over a process pool in batches. Every
+    successful validation that starts from the genesis block or from a checkpoint records the last height checked as a
+    trusted checkpoint, later validations start right after the highest checkpoint still present in the chain.
+
+    Parameters
+    ----------
+    workers: int
+        Number of processes hashing blocks, 1 hashes in the calling process.
+    batch_size: int
+        Number of blocks sent to a worker at once.
+    path: str
+        JSON file the checkpoints are loaded from and saved to, kept in memory only when None.
+    """
+    def __init__(self, workers: int = 1, batch_size: int = 500, path: Optional[str] = None) -> None:
+        self.workers = workers
+        self.batch_size = batch_size
+        self.path = path
+        self.checkpoints: Dict[int, str] = {}
+        """dict: Trusted block hash per height."""
+
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as checkpoints_file:
+                self.checkpoints = {int(height): block_hash
+                                    for height, block_hash in json.load(checkpoints_file).items()}
+
+    def add_checkpoint(self, height: int, block_hash: str) -> None:
+        with self.lock:
+            self.checkpoints[height] = block_hash
+            if self.path:
+                with open(self.path, 'w') as checkpoints_file:
+                    json.dump(self.checkpoints, checkpoints_file)
+
+    def last_checkpoint(self, chain) -> int:
+        """int: Highest checkpoint height matching `chain`, -1 if there is none."""
+        for height in sorted(self.checkpoints, reverse=True):
+            if height < len(chain) and chain[height].hash == self.checkpoints[height]:
+                return height
+        return -1
+
+    def validate(self, chain, target: Callable[[Any], int], start: Optional[int] = None, stop: Optional[int] = None,
+                 fallback: Optional[Callable[[Any], bool]] = None,
+                 expected_target: Optional[Callable[[int, Any], int]] = None,
+                 signatures: Optional[Callable[[List[Any]], List[bool]]] = None) -> ValidationResult:
+        """
+        Parameters
+        ----------
+        chain:
+            Blocks indexed by height.
+        target:
+            Target a block's hash must meet, as a 256-bit number.
+        start:
+            First height to check, right after the last checkpoint when None. Negative heights are read as 0.
+        stop:
+            Height after the last one to check, the chain length when None. A range past the chain's end is empty.
+        fallback:
+            Second chance for blocks whose header hash mismatch, e.g. blocks hashed with a legacy format.
+        expected_target:
+            Easiest target allowed at a height, given the previous block, no check when None.
+        signatures:
+            Whether each of a list of transactions is validly signed, no check when None.
+
+        Returns
+        -------
+        ValidationResult:
+            Truthy if the whole range is valid.
+        """
+        stop = len(chain) if stop is None else max(min(stop, len(chain)), 0)
+        start = self.last_checkpoint(chain) + 1 if start is None else max(start, 0)
+        if start >= stop:
+            return ValidationResult(start, stop)
+        trusted_start = start == 0 or self.checkpoints.get(start - 1) == chain[start - 1].hash
+
+        blocks = chain[start:stop]
+        failures = []
+        previous = chain[start - 1] if start else None
+        for height, block in enumerate(blocks, start):
+            if block.index != height:
+                failures.append((height, 'index is not continuous'))
+            elif previous is not None and block.prev_hash != previous.hash:
+                failures.append((height, 'prev_hash does not link to the previous block'))
+            elif expected_target is not None and target(block) > expected_target(height, previous):
+                failures.append((height, 'target is easier than the retarget schedule'))
+            previous = block
+
+        items = [(height, self._header_prefix(block), block.nonce, block.hash, block.merkle_root,
+                  None if 'pruned' in block.__dict__ else block.transactions, target(block))
+                 for height, block in enumerate(blocks, start)]
+        if signatures is not None:
+            checked = [(height, transaction) for height, block in enumerate(blocks, start)
+                       for transaction in block.transactions]
+            for (height, _), valid in zip(checked, signatures([transaction for _, transaction in checked])):
+                if not valid:
+                    failures.append((height, 'invalid transaction signature'))
+
+        for height, reason in self._check(items):
+            if reason == 'header hash mismatch' and fallback is not None and fallback(blocks[height - start]):
+                continue
+            failures.append((height, reason))
+
+        if failures:
+            return ValidationResult(start, stop, *min(failures))
+        if trusted_start:
+            self.add_checkpoint(stop - 1, chain[stop - 1].hash)
+        return ValidationResult(start, stop)
+
+    @staticmethod
+    def _header_prefix(block) -> Optional[bytes]:
+        try:
+            return block.header_prefix
+        except ValueError:
+            return None
+
+    def _check(self, items: list) -> Iterable[Tuple[int, str]]:
+        batches = [items[position:position + self.batch_size] for position in range(0, len(items), self.batch_size)]
+        if self.workers == 1 or len(batches) == 1:
+            results = map(check_batch, batches)
+            return [failure for failures in results for failure in failures]
+        with multiprocessing.Pool(self.workers) as pool:
+            return [failure for failures in pool.imap(check_batch, batches) for failure in failures]
@@ -1,6 +1,8 @@
+import os
+
 from blockchain_demo import create_app, socket_io
 
 app = create_app()
 
 if __name__ == "__main__":
-    socket_io.run(app, port=5000)
+    socket_io.run(app, host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 5000)))
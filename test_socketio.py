@@ -108,6 +108,97 @@ class TestSocketIO(unittest.TestCase):
         self.assertEqual(received[0]['name'], 'display_blockchain_to_all_peers')
         self.assertEqual(received[1]['name'], 'my_logs')
 
+    def test_mining_job(self):
+        from blockchain_demo.main import blockchain, mining_jobs
+        client = socket_io.test_client(app)
+        client.emit('peers_handler', 'job miner')
+        blockchain.add_transaction({'content': 'job transaction', 'author': 'job miner', 'author_id': 'id'},
+                                   'job miner')
+        client.get_received()
+        job_id = client.emit('mine_unconfirmed_transactions', 'job miner', callback=True)
+        self.assertTrue(mining_jobs.jobs[job_id].done.wait(10))
+        self.assertEqual(mining_jobs.jobs[job_id].status, 'mined')
+        received = [packet['name'] for packet in client.get_received()]
+        self.assertEqual(received[0], 'mining_job')
+        self.assertIn('new_block', received)
+        self.assertEqual(received[-1], 'mining_job_finished')
+        self.assertFalse(blockchain.peers['job miner']['queued_transactions'])
+
+    def test_cancel_mining_job(self):
+        from blockchain_demo.main import blockchain, mining_jobs
+        client = socket_io.test_client(app)
+        client.emit('peers_handler', 'cancelled miner')
+        blockchain.add_transaction('cancelled transaction', 'cancelled miner')
+        original_difficulty = blockchain.difficulty
+        blockchain.difficulty = 64
+        try:
+            job_id = client.emit('mine_unconfirmed_transactions', 'cancelled miner', callback=True)
+            self.assertEqual(client.emit('mine_unconfirmed_transactions', 'cancelled miner', callback=True), job_id)
+            client.emit('cancel_mining_job', job_id)
+            self.assertTrue(mining_jobs.jobs[job_id].done.wait(10))
+        finally:
+            blockchain.difficulty = original_difficulty
+        self.assertEqual(mining_jobs.jobs[job_id].status, 'cancelled')
+        self.assertEqual(blockchain.peers['cancelled miner']['queued_transactions'], ['cancelled transaction'])
+
+    def test_sync_blocks(self):
+        from blockchain_demo.main import blockchain
+        blockchain.peers['sync miner'] = {'id': 'example id', 'queued_transactions': ['sync transaction'],
+                                          'chain': blockchain.chain}
+        client = socket_io.test_client(app)
+        client.get_received()
+        block_index = blockchain.mine_block('sync miner')
+        client.emit('sync_blocks', block_index - 1)
+        received = client.get_received()
+        self.assertEqual(received[0]['name'], 'blocks_delta')
+        self.assertEqual([block['index'] for block in received[0]['args'][0]['blocks']], [block_index])
+        self.assertFalse(received[0]['args'][0]['more'])
+
+    def test_peer_left(self):
+        from blockchain_demo.main import blockchain
+        client = socket_io.test_client(app)
+        observer = socket_io.test_client(app)
+        client.emit('peers_handler', 'leaving peer')
+        observer.get_received()
+        client.disconnect()
+        self.assertNotIn('leaving peer', blockchain.peers)
+        received = observer.get_received()
+        self.assertEqual(received[0]['name'], 'peer_left')
+        self.assertEqual(received[0]['args'][0], 'leaving peer')
+
+    def test_submit_transactions(self):
+        from blockchain_demo.main import blockchain
+        client = socket_io.test_client(app)
+        client.emit('peers_handler', 'batch peer')
+        client.get_received()
+        results = client.emit('submit_transactions', [{'block_text': 'first', 'block_author': 'batch peer'},
+                                                      {'block_text': 'second', 'block_author': 'unknown peer'}],
+                              callback=True)
+        self.assertEqual([result['accepted'] for result in results], [True, False])
+        self.assertEqual(client.get_received()[0]['name'], 'my_logs')
+        self.assertEqual(len(blockchain.queued_transactions('batch peer')), 1)
+
+    def test_submit_transaction_acknowledges_the_result(self):
+        client = socket_io.test_client(app)
+        client.emit('peers_handler', 'acknowledged peer')
+        transaction = {'block_text': 'acknowledged', 'block_author': 'acknowledged peer'}
+        self.assertIs(client.emit('submit_transaction', transaction, callback=True), True)
+        self.assertIs(client.emit('submit_transaction', transaction, callback=True), False)
+
+    def test_block_removed(self):
+        from blockchain_demo.main import blockchain
+        from tests.conftest import mine_on
+
+        fork = blockchain.get_latest_block
+        client = socket_io.test_client(app)
+        client.get_received()
+        replaced = mine_on(blockchain, fork, ['replaced'])
+        mine_on(blockchain, mine_on(blockchain, fork, ['winner 1']), ['winner 2'])
+        received = client.get_received()
+        self.assertEqual([(event['name'], event['args'][0]) for event in received],
+                         [('block_removed', replaced.index)])
+        self.assertEqual(blockchain.get_latest_block.transactions, ['winner 2'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,4 +1,6 @@
 from blockchain_demo import create_app
+from blockchain_demo.main import Block, BlockChain
+from datetime import datetime
 import pytest
 
 
@@ -18,3 +20,26 @@ def client(app):
 @pytest.fixture
 def runner(app):
     return app.test_cli_runner()
+
+
+def mined_chain(blocks: int, blockchain: BlockChain = None) -> BlockChain:
+    """`blockchain`, a new one by default, with `blocks` more blocks mined by 'miner', one transaction each."""
+    blockchain = BlockChain() if blockchain is None else blockchain
+    blockchain.peers['miner'] = {'id': 'miner', 'queued_transactions': [], 'chain': blockchain.chain}
+    for number in range(blocks):
+        blockchain.add_transaction({'content': f'transaction {number}', 'author': 'miner'}, 'miner')
+        blockchain.mine_block('miner')
+    return blockchain
+
+
+def next_block(blockchain: BlockChain, parent: Block, transactions: list) -> Block:
+    """Block on top of `parent` at the target `blockchain` expects, its proof of work not found yet."""
+    return Block(parent.index + 1, transactions, datetime.now(), parent.hash,
+                 target=blockchain.expected_target(parent.index + 1, parent))
+
+
+def mine_on(blockchain: BlockChain, parent: Block, transactions: list, miner: str = None) -> Block:
+    """Mines a block on top of `parent` into `blockchain`, on a competing branch if `parent` isn't the tip."""
+    block = next_block(blockchain, parent, transactions)
+    assert blockchain.add_block_to_peer_chain(block, blockchain.proof_of_work(block), miner)
+    return block
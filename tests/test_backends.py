@@ -0,0 +1,100 @@
+import multiprocessing
+from datetime import datetime
+
+from blockchain_demo.backends import ChainConflict, SQLiteBackend
+from blockchain_demo.main import Block, BlockChain
+import pytest
+
+
+def shared_blockchain(path) -> BlockChain:
+    blockchain = BlockChain()
+    blockchain.use_backend(SQLiteBackend(str(path), Block.from_json, max_bytes=50, max_author_bytes=30))
+    return blockchain
+
+
+def test_workers_share_the_chain(tmp_path):
+    first, second = shared_blockchain(tmp_path / 'state.db'), shared_blockchain(tmp_path / 'state.db')
+    assert len(first.chain) == len(second.chain) == 1
+    assert first.chain[0].hash == second.chain[0].hash
+
+    first.peers['miner'] = {'id': 'sid', 'queued_transactions': ['a']}
+    assert second.peers['miner']['queued_transactions'] == ['a']
+    assert second.mine_block('miner') == 1
+    assert first.get_latest_block.hash == second.chain[-1].hash
+    assert len(first.mempool) == 0
+    del first.peers['miner']
+    assert 'miner' not in second.peers
+
+
+def test_stale_tip_append_conflicts(tmp_path):
+    first, second = shared_blockchain(tmp_path / 'state.db'), shared_blockchain(tmp_path / 'state.db')
+    tip = first.get_latest_block
+    blocks = [Block(1, [content], datetime.now(), tip.hash) for content in ('first', 'second')]
+    proofs = [first.proof_of_work(block) for block in blocks]
+
+    assert first.add_block_to_peer_chain(blocks[0], proofs[0], None)
+    with pytest.raises(ChainConflict):
+        blocks[1].hash = proofs[1]
+        second.chain.append(blocks[1])
+    assert second.add_block_to_peer_chain(blocks[1], proofs[1], None)
+    assert [block.transactions for block in second.chain[1:]] == [['first']]
+    assert second.tree.tips == {blocks[0].hash, blocks[1].hash}
+
+
+def test_reorganization_replaces_blocks_atomically(tmp_path):
+    blockchain = shared_blockchain(tmp_path / 'state.db')
+    genesis = blockchain.get_latest_block
+    blocks = []
+    for content in ('old', 'new'):
+        block = Block(1, [content], datetime.now(), genesis.hash)
+        block.hash = blockchain.proof_of_work(block)
+        blocks.append(block)
+    blockchain.chain.append(blocks[0])
+    stray = Block(5, ['stray'], datetime.now(), 'unknown')
+    stray.hash = blockchain.proof_of_work(stray)
+    with pytest.raises(ChainConflict):
+        blockchain.chain.replace(1, [blocks[1], stray])
+    assert [block.hash for block in blockchain.chain] == [genesis.hash, blocks[0].hash]
+
+    blockchain.chain.replace(1, [blocks[1]])
+    assert len(blockchain.chain) == 2
+    assert blockchain.chain[-1].transactions == ['new']
+
+
+def test_shared_mempool_budgets(tmp_path):
+    blockchain = shared_blockchain(tmp_path / 'state.db')
+    for transaction in ('"aaaaaaa"', '"bbbbbbb"', '"ccccccc"'):
+        blockchain.mempool.add(transaction, 'chatty')
+    assert blockchain.mempool.add('"ccccccc"', 'chatty') is None
+    assert [transaction for _, transaction in blockchain.mempool.select('chatty')] == ['"bbbbbbb"', '"ccccccc"']
+    blockchain.mempool.add('"ddddddd"', 'quiet')
+    blockchain.mempool.add('"eeeeeee"', 'quiet')
+    assert blockchain.mempool.author_counts() == {'chatty': 1, 'quiet': 2}
+    assert blockchain.mempool.evicted == 2
+
+
+def mine_from_worker(path: str, worker: int, blocks: int) -> None:
+    blockchain = shared_blockchain(path)
+    blockchain.mempool.max_bytes = blockchain.mempool.max_author_bytes = 1024 * 1024
+    blockchain.peers[f'worker {worker}'] = {'id': str(worker), 'queued_transactions': []}
+    for number in range(blocks):
+        blockchain.add_transaction(f'{worker}-{number}', f'worker {worker}')
+        assert blockchain.mine_block(f'worker {worker}')
+
+
+def test_concurrent_workers_keep_a_linear_chain(tmp_path):
+    path = str(tmp_path / 'state.db')
+    shared_blockchain(path)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=mine_from_worker, args=(path, worker, 5)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    blockchain = shared_blockchain(path)
+    assert len(blockchain.chain) == 21
+    assert sorted(block.transactions[0] for block in blockchain.chain[1:]) == sorted(
+        f'{worker}-{number}' for worker in range(4) for number in range(5))
+    assert blockchain.validate_chain()
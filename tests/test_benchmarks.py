@@ -0,0 +1,37 @@
+from benchmarks import load_test
+from benchmarks.suite import compare
+
+
+def results(chain_rate, mining_time):
+    return {'results': {'/chain': {'value': chain_rate, 'unit': 'requests/s', 'higher_is_better': True},
+                        'proof_of_work': {'value': mining_time, 'unit': 's/block', 'higher_is_better': False}}}
+
+
+def test_compare_flags_regressions_both_ways():
+    baseline = results(100.0, 1.0)
+    assert compare(baseline, results(95.0, 1.05), 0.1) == []
+    regressions = compare(baseline, results(80.0, 1.5), 0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('/chain')
+
+
+def test_compare_ignores_new_cases():
+    assert compare({'results': {}}, results(1.0, 1.0), 0.1) == []
+
+
+def test_load_test_confirms_every_transaction():
+    report = load_test.run(peers=8, transactions=6, mine_every=3)
+    assert report['failures'] == {}
+    assert report['rejected'] == 0
+    assert report['updates'] == {'submitted': 48, 'confirmed': 48, 'lost': 0, 'unchecked': 0, 'duplicated': 0}
+    assert report['events']['submit_transaction']['count'] == 48
+    stats = report['events']['mine_unconfirmed_transactions']
+    assert stats['p50'] <= stats['p95'] <= stats['p99']
+
+
+def test_load_test_tells_lost_updates():
+    test = load_test.LoadTest(None)
+    test.submitted = {'kept': ['a', 'b'], 'gave up': ['c']}
+    test.drained = {'kept': True, 'gave up': False}
+    assert test.check_chain([{'transactions': [{'content': 'a'}, {'content': 'a'}]}]) == {
+        'submitted': 3, 'confirmed': 1, 'lost': 1, 'unchecked': 1, 'duplicated': 1}
@@ -0,0 +1,72 @@
+from blockchain_demo.blocktree import ChainView
+from blockchain_demo.main import Block, BlockChain
+from blockchain_demo.storage import BlockStore
+from conftest import mine_on
+from datetime import datetime
+
+
+def test_heavier_branch_reorganizes_the_chain():
+    blockchain = BlockChain()
+    for peer in ('alice', 'bob'):
+        blockchain.peers[peer] = {'id': peer, 'queued_transactions': [], 'chain': ChainView(blockchain)}
+    removed = []
+    blockchain.subscribe_removed(removed.append)
+    genesis = blockchain.chain[0]
+
+    a1 = mine_on(blockchain, genesis, ['a'], 'alice')
+    b1 = mine_on(blockchain, genesis, ['b'], 'bob')
+    assert [block.hash for block in blockchain.chain] == [genesis.hash, a1.hash]
+    assert blockchain.tree.tips == {a1.hash, b1.hash}
+    bob_chain = blockchain.peers['bob']['chain']
+    assert [block.hash for block in bob_chain] == [genesis.hash, b1.hash]
+    assert bob_chain[0] is blockchain.chain[0]
+
+    b2 = mine_on(blockchain, b1, ['b2'], 'bob')
+    assert [block.hash for block in blockchain.chain] == [genesis.hash, b1.hash, b2.hash]
+    assert [block.hash for block in removed] == [a1.hash]
+    assert blockchain.queued_transactions('alice') == ['a']
+    assert len(bob_chain) == len(blockchain.peers['alice']['chain']) == 3
+    assert blockchain.validate_chain(0)
+
+
+def test_mining_again_skips_transactions_a_competing_block_confirmed():
+    blockchain = BlockChain()
+    blockchain.peers['alice'] = {'id': 'alice', 'queued_transactions': [], 'chain': ChainView(blockchain)}
+    blockchain.add_transaction('once', 'alice')
+    blockchain.add_transaction('later', 'alice')
+    proof_of_work = blockchain.proof_of_work
+
+    def competing_block_lands_first(block, **kwargs):
+        blockchain.proof_of_work = proof_of_work
+        mine_on(blockchain, blockchain.chain[0], ['once'])
+        return proof_of_work(block, **kwargs)
+
+    blockchain.proof_of_work = competing_block_lands_first
+    assert blockchain.mine_block('alice') == 2
+    assert [block.transactions for block in blockchain.chain] == [[], ['once'], ['later']]
+    assert not blockchain.queued_transactions('alice')
+
+
+def test_fork_deeper_than_the_tree_is_refused():
+    blockchain = BlockChain()
+    blockchain.tree.max_depth = 2
+    genesis = tip = blockchain.chain[0]
+    for number in range(4):
+        tip = mine_on(blockchain, tip, [f'transaction {number}'])
+    late = Block(1, ['late'], datetime.now(), genesis.hash, target=blockchain.expected_target(1, genesis))
+    assert not blockchain.add_block_to_peer_chain(late, blockchain.proof_of_work(late), None)
+
+
+def test_reorganization_rewrites_the_block_store(tmp_path):
+    blockchain = BlockChain()
+    blockchain.use_store(BlockStore(str(tmp_path), Block.from_json))
+    genesis = blockchain.chain[0]
+    mine_on(blockchain, mine_on(blockchain, genesis, ['short 1']), ['short 2'])
+    tip = genesis
+    for number in range(3):
+        tip = mine_on(blockchain, tip, [f'long {number}'])
+    blockchain.chain.close()
+
+    reopened = BlockStore(str(tmp_path), Block.from_json)
+    assert [block.transactions for block in reopened[1:]] == [['long 0'], ['long 1'], ['long 2']]
+    assert reopened[-1].hash == tip.hash
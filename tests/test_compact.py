@@ -0,0 +1,45 @@
+from blockchain_demo.compact import COMPACT_HEADER, CompactBlock
+from blockchain_demo.main import Block, BlockChain
+from datetime import datetime
+import pytest
+
+
+def sealed_block(transactions, prev_hash):
+    block = Block(7, transactions, datetime.now(), prev_hash)
+    block.hash = block.header_hash
+    return block
+
+
+def test_round_trip_to_block():
+    block = sealed_block([{'content': 'a', 'author': 'peer'}], 'ab' * 32)
+    compact = CompactBlock.from_block(block)
+    assert compact.hash == bytes.fromhex(block.hash)
+    assert Block.from_dict(compact.to_dict()).to_dict() == block.to_dict()
+
+
+def test_genesis_round_trip():
+    genesis = BlockChain().chain[0]
+    assert CompactBlock.from_block(genesis).to_dict() == genesis.to_dict()
+
+
+def test_binary_encoding():
+    compact = CompactBlock.from_block(sealed_block(['a', 'b'], 'cd' * 32))
+    encoded = compact.encode()
+    assert len(encoded) == COMPACT_HEADER.size + len(b'["a", "b"]')
+    assert CompactBlock.decode(encoded) == compact
+    empty = CompactBlock.from_block(sealed_block([], 'cd' * 32))
+    assert CompactBlock.decode(empty.encode()) == empty
+
+
+def test_immutable():
+    compact = CompactBlock.from_block(sealed_block([], 'cd' * 32))
+    assert not hasattr(compact, '__dict__')
+    with pytest.raises(AttributeError):
+        compact.nonce = 1
+
+
+def test_target_round_trip():
+    block = Block(7, ['a'], datetime.now(), 'ab' * 32, target=2 ** 240)
+    block.hash = block.header_hash
+    compact = CompactBlock.decode(CompactBlock.from_block(block).encode())
+    assert Block.from_dict(compact.to_dict()).header_hash == block.hash
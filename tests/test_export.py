@@ -0,0 +1,58 @@
+from blockchain_demo.main import Block, BlockChain, blockchain
+from conftest import next_block
+import json
+
+
+def sealed_block(transactions):
+    block = next_block(blockchain, blockchain.get_latest_block, transactions)
+    block.hash = blockchain.proof_of_work(block)
+    return block
+
+
+def test_export_streams_one_block_per_line(client):
+    response = client.get('/chain/export')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.data.decode().splitlines()
+    assert len(lines) == blockchain.get_total_blocks
+    assert [json.loads(line)['index'] for line in lines] == list(range(blockchain.get_total_blocks))
+    assert len(client.get(f'/chain/export?from={blockchain.get_total_blocks - 1}').data.splitlines()) == 1
+
+
+def test_import_appends_new_blocks_and_skips_known(client):
+    export = client.get('/chain/export').data
+    first = sealed_block(['imported 1'])
+    lines = export + (first.to_json() + '\n').encode()
+    response = client.post('/chain/import', data=lines, content_type='application/x-ndjson')
+    body = json.loads(response.data)
+    assert response.status_code == 200
+    assert (body['imported'], body['skipped']) == (1, blockchain.get_total_blocks - 1)
+    assert blockchain.get_latest_block.hash == first.hash
+
+    second = sealed_block(['imported 2'])
+    tampered = json.loads(second.to_json())
+    tampered['transactions'] = ['tampered']
+    response = client.post('/chain/import', data=json.dumps(tampered), content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert json.loads(response.data)['error']['reason'] == 'block rejected'
+    assert blockchain.get_latest_block.hash == first.hash
+
+
+def test_import_rejects_malformed_timestamps(client):
+    tip = blockchain.get_latest_block
+    block = Block(tip.index + 1, ['badly dated'], 'not a date', tip.hash)
+    block.hash = BlockChain().proof_of_work(block)
+    response = client.post('/chain/import', data=block.to_json(), content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert json.loads(response.data)['error']['reason'] == 'block rejected'
+
+
+def test_import_rejects_malformed_blocks(client):
+    tip = blockchain.get_latest_block
+    block = json.loads(sealed_block(['malformed']).to_json())
+    for line in ({key: value for key, value in block.items() if key != 'merkle_root'}, dict(block, transactions=5),
+                 dict(block, nonce=-1), dict(block, _json='{}'), dict(block, extra=True), [block], 'block'):
+        response = client.post('/chain/import', data=json.dumps(line), content_type='application/x-ndjson')
+        assert response.status_code == 400
+        error = json.loads(response.data)['error']
+        assert error['line'] == 0 and error['reason'].startswith('invalid block')
+    assert blockchain.get_latest_block is tip
@@ -0,0 +1,148 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+import socketio
+import pytest
+
+from blockchain_demo.gossip import GossipNode
+from blockchain_demo.main import Block, BlockChain
+from conftest import mined_chain
+
+NODE_SCRIPT = """
+import json, sys
+from blockchain_demo import create_app
+from blockchain_demo.main import blockchain
+port, premined, config = int(sys.argv[1]), int(sys.argv[2]), json.loads(sys.argv[3])
+blockchain.peers['premine'] = {'id': 'premine', 'queued_transactions': [], 'chain': blockchain.chain}
+app = create_app(config)
+for number in range(premined):
+    blockchain.add_transaction(f'premined {number}', 'premine')
+    blockchain.mine_block('premine')
+app.run(port=port, threaded=True)
+"""
+"""str: Node process, the Werkzeug server in threaded mode like `socket_io.run` outside of a terminal."""
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for(condition, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            result = condition()
+            if result:
+                return result
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.1)
+    raise AssertionError('condition not met in time')
+
+
+@pytest.fixture
+def nodes():
+    """Three nodes in a line, A - B - C, the first one starting with three mined blocks."""
+    ports = [free_port() for _ in range(3)]
+    urls = [f'http://127.0.0.1:{port}' for port in ports]
+    neighbours = [[urls[1]], [urls[0], urls[2]], [urls[1]]]
+    processes = []
+    for position, (port, url) in enumerate(zip(ports, urls)):
+        config = {'TESTING': True, 'NODE_URL': url, 'NODE_PEERS': neighbours[position], 'GOSSIP_INTERVAL': 0.05,
+                  'GENESIS_TIMESTAMP': '2021-01-01 00:00:00'}
+        processes.append(subprocess.Popen([sys.executable, '-c', NODE_SCRIPT, str(port), '3' if position == 0 else '0',
+                                           json.dumps(config)],
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    try:
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def tip(url: str) -> dict:
+    return requests.get(f'{url}/chain/tip', timeout=2).json()
+
+
+def test_nodes_catch_up_and_gossip(nodes):
+    first, _, last = nodes
+    wait_for(lambda: len({tip(url)['hash'] for url in nodes}) == 1 and tip(first)['length'] == 4)
+
+    client = socketio.Client()
+    client.connect(last)
+    try:
+        client.call('peers_handler', 'carol')
+        result, = client.call('submit_transactions', [{'block_author': 'carol', 'block_text': 'gossiped'}])
+        tx_url = f'{first}/tx/{result["hash"]}'
+        assert wait_for(lambda: requests.get(tx_url, timeout=2).json())['status'] == 'pending'
+
+        client.call('mine_unconfirmed_transactions', 'carol')
+        assert wait_for(lambda: requests.get(tx_url, timeout=2).json()['status'] == 'confirmed')
+    finally:
+        client.disconnect()
+    wait_for(lambda: len({tip(url)['hash'] for url in nodes}) == 1)
+    assert tip(first)['length'] == 5
+
+
+def test_headers_follow_the_highest_common_block():
+    ahead = mined_chain(30)
+    behind = BlockChain()
+    behind.chain = list(ahead.chain[:12])
+    node = GossipNode(behind, Block.from_dict, lambda tx_hash: False)
+    remote = GossipNode(ahead, Block.from_dict, lambda tx_hash: False)
+    locator = node.locator()
+    assert [entry['index'] for entry in locator] == [11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 0]
+
+    answer = remote.headers(locator, 5)
+    assert answer['length'] == 31
+    assert [header['index'] for header in answer['headers']] == [12, 13, 14, 15, 16]
+    assert answer['headers'][0]['prev_hash'] == behind.chain[11].hash
+
+    # A locator from another chain only shares the genesis block.
+    answer = remote.headers([{'index': 3, 'hash': 'other'}, {'index': 0, 'hash': ahead.chain[0].hash}], 2)
+    assert [header['index'] for header in answer['headers']] == [1, 2]
+
+
+def test_inventory_wants_unknown_items_only():
+    blockchain = mined_chain(2)
+    node = GossipNode(blockchain, Block.from_dict, lambda tx_hash: tx_hash == 'confirmed')
+    node.configure('http://a', ['http://b'])
+    tx_hash = blockchain.add_transaction('queued', 'miner')
+    wanted = node.receive_inventory('http://b', [{'type': 'block', 'hash': blockchain.chain[1].hash},
+                                                 {'type': 'block', 'hash': 'new block'},
+                                                 {'type': 'tx', 'hash': tx_hash},
+                                                 {'type': 'tx', 'hash': 'confirmed'},
+                                                 {'type': 'tx', 'hash': 'new tx'}])
+    assert wanted == [{'type': 'block', 'hash': 'new block'}, {'type': 'tx', 'hash': 'new tx'}]
+    assert ('tx', 'new tx') in node.known['http://b']
+
+    node.announce('block', 'new block')
+    node.announce('block', 'mine')
+    with node.lock:
+        assert [item for item in node.pending if item not in node.known['http://b']] == [('block', 'mine')]
+
+
+def test_malformed_gossip_is_rejected(client):
+    genesis = client.get('/chain?limit=1').get_json()['chain'][0]
+    for block in (dict(genesis, _json='{}'), dict(genesis, extra=1), dict(genesis, nonce=-1), dict(genesis, index='0'),
+                  {key: value for key, value in genesis.items() if key != 'merkle_root'}, 5):
+        assert client.post('/gossip/data', json={'blocks': [block]}).status_code == 400
+    assert client.post('/gossip/inv', json={'inventory': [5]}).status_code == 400
+    assert client.post('/gossip/inv', json={'inventory': [{'type': 'tx'}]}).status_code == 400
+
+
+def test_gossiped_transactions_are_checked(client):
+    transactions = [{'transaction': {'author': 'relayed', 'content': 'no id'}, 'author': 'relayed'},
+                    {'transaction': {'author': 'relayed', 'content': 'pay', 'author_id': 'x', 'recipient': 'bob',
+                                     'amount': 5, 'nonce': 0}, 'author': 'relayed'},
+                    {'transaction': 'not an object', 'author': 'relayed'},
+                    {'transaction': {'author': 'relayed', 'content': 'hello', 'author_id': 'x',
+                                     'timestamp': '2021-01-01 00:00:00'}, 'author': 'relayed'}]
+    assert client.post('/gossip/data', json={'transactions': transactions}).get_json() == {'queued': 1, 'imported': 0}
@@ -0,0 +1,69 @@
+from blockchain_demo.indexes import TransactionIndex
+from blockchain_demo.main import Block, BlockChain, blockchain
+from blockchain_demo.mempool import transaction_hash
+from conftest import mine_on
+from datetime import datetime
+import json
+
+
+def test_index_is_incremental():
+    chain = [Block(0, [], datetime.now(), '0'),
+             Block(1, [{'content': 'a', 'author': 'ann', 'author_id': 'id-a'}, 'b'], datetime.now(), 'x')]
+    index = TransactionIndex()
+    index.update(chain)
+    chain.append(Block(2, [{'content': 'c', 'author': 'ann'}], datetime.now(), 'y'))
+    index.update(chain)
+    assert index.locate(transaction_hash('b')) == (1, 1)
+    assert index.by_author['ann'] == [(1, 0), (2, 0)]
+    assert index.by_author_id['id-a'] == [(1, 0)]
+    assert index.block_range(1) == (0, 2)
+    assert index.block_range(2) == (2, 3)
+    assert index.locate_position(2) == (2, 0)
+
+
+def test_reorganization_only_undoes_removed_blocks():
+    chain = BlockChain()
+    index = TransactionIndex()
+    chain.subscribe(lambda block: index.update(chain.chain))
+    chain.subscribe_removed(index.remove)
+    genesis = chain.chain[0]
+
+    a1 = mine_on(chain, genesis, [{'content': 'kept', 'author': 'ann'}])
+    resets = []
+    index.reset = lambda: resets.append(True)
+    a2 = mine_on(chain, a1, [{'content': 'replaced', 'author': 'ann'}])
+    b2 = mine_on(chain, a1, [{'content': 'branch', 'author': 'bob'}])
+    kept_hashes = list(index.hashes[:2])
+    mine_on(chain, b2, ['b3'])
+    assert chain.chain[2] is b2
+    assert index.hashes[:2] == kept_hashes and index.height == 4
+    assert index.locate(transaction_hash({'content': 'replaced', 'author': 'ann'})) is None
+    assert index.by_author == {'ann': [(1, 0)], 'bob': [(2, 0)]}
+    assert (index.total, index.block_range(3)) == (3, (2, 3))
+    assert a2.hash not in index.hashes
+    assert not resets
+
+
+def test_lookup_routes(client):
+    blockchain.peers['index author'] = {'id': 'index-id', 'queued_transactions': [], 'chain': blockchain.chain}
+    transactions = [{'content': f'indexed {number}', 'author': 'index author', 'author_id': 'index-id'}
+                    for number in range(3)]
+    for transaction in transactions:
+        blockchain.add_transaction(transaction, 'index author')
+    block_index = blockchain.mine_block('index author')
+    pending = {'content': 'pending', 'author': 'index author', 'author_id': 'index-id'}
+    blockchain.add_transaction(pending, 'index author')
+
+    confirmed = json.loads(client.get(f'/tx/{transaction_hash(transactions[1])}').data)
+    assert (confirmed['status'], confirmed['block_index'], confirmed['position']) == ('confirmed', block_index, 1)
+    assert json.loads(client.get(f'/tx/{transaction_hash(pending)}').data)['status'] == 'pending'
+    assert client.get('/tx/unknown').status_code == 404
+
+    page = json.loads(client.get('/author/index author/transactions?from=1&limit=1').data)
+    assert page['total'] == 3
+    assert page['transactions'][0]['transaction']['content'] == 'indexed 1'
+    assert json.loads(client.get('/author_id/index-id/transactions').data)['total'] == 3
+
+    block = json.loads(client.get(f'/block/{block_index}/transactions').data)
+    listed = json.loads(client.get(f'/transactions?from={block["from"]}&limit=3').data)
+    assert [entry['transaction'] for entry in listed['transactions']] == transactions
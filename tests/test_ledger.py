@@ -0,0 +1,162 @@
+from Crypto.PublicKey import ECC
+
+from blockchain_demo.blocktree import ChainView
+from blockchain_demo.ledger import Ledger, coinbase
+from blockchain_demo.main import Block, BlockChain, blockchain as app_blockchain
+from blockchain_demo.signatures import public_key_hex, sign_transaction
+from blockchain_demo.storage import BlockStore
+from blockchain_demo.transactions import TransactionService
+from datetime import datetime
+import json
+import random
+
+KEY = ECC.generate(curve='P-256')
+
+
+def sealed(index: int, transactions: list, salt: str = '') -> Block:
+    block = Block(index, transactions, datetime.now(), '0')
+    block.hash = f'{index}{salt}'
+    return block
+
+
+def test_history_matches_a_full_replay():
+    generator = random.Random(7)
+    authors = ['ann', 'bob', 'cy']
+    chain = [sealed(0, [coinbase(author, 100, 0) for author in authors])]
+    for index in range(1, 60):
+        chain.append(sealed(index, [{'author': generator.choice(authors), 'recipient': generator.choice(authors),
+                                     'amount': generator.randint(1, 80), 'nonce': 3 * index + number}
+                                    for number in range(3)]))
+    ledger = Ledger(snapshot_interval=8)
+    ledger.update(chain)
+    for height in (0, 5, 8, 30, 57, 59):
+        replay = Ledger()
+        replay.update(chain[:height + 1])
+        assert all(ledger.balance(author, height) == replay.balance(author) for author in authors)
+    assert sum(ledger.balances.values()) == 300
+    assert sorted(ledger.snapshots) == list(range(0, 60, 8))
+
+
+def test_replaced_blocks_are_rolled_back():
+    chain = [sealed(0, [coinbase('ann', 10, 0)]),
+             sealed(1, [{'author': 'ann', 'recipient': 'bob', 'amount': 4, 'nonce': 0}])]
+    ledger = Ledger(snapshot_interval=1)
+    ledger.update(chain)
+    assert ledger.balances == {'ann': 6, 'bob': 4}
+
+    chain[1:] = [sealed(1, [{'author': 'ann', 'recipient': 'cy', 'amount': 10, 'nonce': 0}], 'b'),
+                 sealed(2, [{'author': 'ann', 'recipient': 'bob', 'amount': 1, 'nonce': 1}], 'b')]
+    ledger.update(chain)
+    assert ledger.balances == {'cy': 10}
+    assert ledger.nonces == {'ann': 0}
+    assert ledger.diffs[2] == {}
+    assert set(ledger.snapshots) == {0, 1, 2}
+
+
+def test_mining_drops_overdrafts_and_pays_the_reward():
+    blockchain = BlockChain()
+    blockchain.block_reward = 50
+    blockchain.peers['ann'] = {'id': 'ann', 'queued_transactions': [], 'chain': ChainView(blockchain)}
+    blockchain.add_transaction({'content': 'hello', 'author': 'ann'}, 'ann')
+    assert blockchain.mine_block('ann') == 1
+    assert blockchain.chain[1].transactions[-1] == coinbase('ann', 50, 1)
+
+    for nonce, recipient in enumerate(['bob', 'cy']):
+        blockchain.add_transaction(sign_transaction({'author': 'ann', 'recipient': recipient, 'amount': 30,
+                                                     'nonce': nonce}, KEY), 'ann')
+    # Unsigned, the transfer is dropped though ann could afford it.
+    blockchain.add_transaction({'author': 'ann', 'recipient': 'dan', 'amount': 10, 'nonce': 2}, 'ann')
+    assert blockchain.mine_block('ann') == 2
+    assert len(blockchain.chain[2].transactions) == 2
+    assert len(blockchain.mempool) == 0
+    assert (blockchain.ledger.balance('ann'), blockchain.ledger.balance('bob')) == (70, 30)
+    assert blockchain.ledger.balance('ann', 1) == 50
+
+    greedy = Block(3, [coinbase('ann', 51, 3)], datetime.now(), blockchain.chain[2].hash,
+                   target=blockchain.expected_target(3, blockchain.chain[2]))
+    assert not blockchain.add_block_to_peer_chain(greedy, blockchain.proof_of_work(greedy), None)
+
+
+def test_transfers_are_not_replayed():
+    blockchain = BlockChain()
+    blockchain.block_reward = 50
+    blockchain.peers['ann'] = {'id': 'ann', 'queued_transactions': [], 'chain': ChainView(blockchain)}
+    assert blockchain.register_key('ann', public_key_hex(KEY))
+    service = TransactionService(blockchain)
+    blockchain.add_transaction({'content': 'hello', 'author': 'ann'}, 'ann')
+    blockchain.mine_block('ann')
+
+    transfer = {'content': 'pay', 'author': 'ann', 'author_id': 'ann', 'recipient': 'bob', 'amount': 10, 'nonce': 0}
+    assert service.submit_many([dict(transfer)])[0]['reason'] == 'missing or invalid signature'
+    transfer = sign_transaction(transfer, KEY)
+    assert service.submit(dict(transfer))
+    assert service.submit_many([dict(transfer)])[0]['reason'] == 'duplicate or over the mempool budget'
+    blockchain.mine_block('ann')
+    assert service.submit_many([dict(blockchain.chain[2].transactions[0])])[0]['reason'] == 'replayed transfer'
+    assert blockchain.ledger.balance('bob') == 10
+
+    # A block replaying a confirmed transfer isn't accepted on the tip, nor does the copy move anything elsewhere.
+    replayed = Block(3, [blockchain.chain[2].transactions[0]], datetime.now(), blockchain.chain[2].hash,
+                     target=blockchain.expected_target(3, blockchain.chain[2]))
+    assert not blockchain.add_block_to_peer_chain(replayed, blockchain.proof_of_work(replayed), None)
+    assert service.submit(sign_transaction(dict(transfer, nonce=1), KEY))
+    blockchain.mine_block('ann')
+    assert (blockchain.ledger.balance('ann'), blockchain.ledger.balance('bob')) == (130, 20)
+
+
+def test_journal_restores_the_ledger(tmp_path, monkeypatch):
+    journal = str(tmp_path / 'ledger.ndjson')
+    blockchain = BlockChain()
+    blockchain.block_reward, blockchain.ledger = 50, Ledger(snapshot_interval=2, path=journal)
+    blockchain.use_store(BlockStore(str(tmp_path), Block.from_json))
+    blockchain.peers['ann'] = {'id': 'ann', 'queued_transactions': [], 'chain': ChainView(blockchain)}
+    blockchain.add_transaction({'content': 'hello', 'author': 'ann'}, 'ann')
+    blockchain.mine_block('ann')
+    for nonce in range(4):
+        blockchain.add_transaction(sign_transaction({'author': 'ann', 'recipient': 'bob', 'amount': 5, 'nonce': nonce},
+                                                    KEY), 'ann')
+        blockchain.mine_block('ann')
+    balances, nonces, snapshots = blockchain.ledger.balances, blockchain.ledger.nonces, blockchain.ledger.snapshots
+
+    # Reopened after a restart, the snapshot of block 4 and the journal record after it are read, no block is applied.
+    applied = []
+    monkeypatch.setattr(Ledger, 'apply', lambda ledger, block: applied.append(block.index))
+    restarted = BlockChain()
+    restarted.ledger = Ledger(snapshot_interval=2, path=journal)
+    restarted.use_store(BlockStore(str(tmp_path), Block.from_json))
+    assert applied == []
+    assert (restarted.ledger.balances, restarted.ledger.nonces) == (balances, nonces) == ({'ann': 230, 'bob': 20},
+                                                                                          {'ann': 3})
+    assert restarted.ledger.base == 5 and len(restarted.ledger.diffs) == 1
+    assert restarted.ledger.keys == {'ann': public_key_hex(KEY)}
+    # Older balances read the whole journal.
+    assert restarted.ledger.balance('ann', 4) == 185 and restarted.ledger.base == 5
+    assert restarted.ledger.balance('ann', 1) == 50 and restarted.ledger.base == 0
+    assert restarted.ledger.snapshots == snapshots
+
+    # Records of blocks the store lost are rolled back and truncated from the journal.
+    monkeypatch.undo()
+    BlockStore(str(tmp_path), Block.from_json).truncate(3)
+    with open(journal, 'ab') as file:
+        file.write(b'{"hash": "partial')
+    reopened = Ledger(snapshot_interval=2, path=journal)
+    reopened.update(BlockStore(str(tmp_path), Block.from_json))
+    assert (reopened.height, reopened.balances, reopened.nonces) == (2, {'ann': 95, 'bob': 5}, {'ann': 0})
+    with open(journal) as file:
+        assert len(file.readlines()) == 3
+
+
+def test_balance_route(client):
+    app_blockchain.block_reward = 25
+    try:
+        app_blockchain.peers['balance miner'] = {'id': 'id', 'queued_transactions': [], 'chain': app_blockchain.chain}
+        app_blockchain.add_transaction({'content': 'reward me', 'author': 'balance miner'}, 'balance miner')
+        height = app_blockchain.mine_block('balance miner')
+    finally:
+        app_blockchain.block_reward = 0
+    answer = json.loads(client.get('/balance/balance miner').data)
+    assert answer == {'author': 'balance miner', 'height': height, 'balance': 25}
+    assert json.loads(client.get(f'/balance/balance miner?height={height - 1}').data)['balance'] == 0
+    assert client.get(f'/balance/balance miner?height={height + 1}').status_code == 404
+    assert client.post('/add_new_transaction', json={'content': 'x', 'author': 'balance miner', 'author_id': 'id',
+                                                     'recipient': 'bob', 'amount': -5}).status_code == 404
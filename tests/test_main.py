@@ -1,5 +1,6 @@
 from blockchain_demo.main import Block, BlockChain
 from datetime import datetime
+import json
 import pytest
 
 
@@ -7,9 +8,52 @@ def test_chain_route(client):
     response = client.get('/chain')
     assert response.status_code == 200
     assert b'chain' in response.data
+    response = client.get('/peers')
+    assert response.status_code == 200
     assert b"peers" in response.data
 
 
+def test_chain_route_range_and_etag(client):
+    from blockchain_demo.main import blockchain
+    blockchain.peers['range tester'] = {'id': 'id', 'queued_transactions': ['transaction'], 'chain': blockchain.chain}
+    blockchain.mine_block('range tester')
+    total_blocks = blockchain.get_total_blocks
+
+    response = client.get(f'/chain?from={total_blocks - 1}&limit=5')
+    body = json.loads(response.data)
+    assert body['length'] == total_blocks
+    assert [block['index'] for block in body['chain']] == [total_blocks - 1]
+    assert body['chain'][0]['hash'] == blockchain.get_latest_block.hash
+
+    etag = response.headers['ETag']
+    assert client.get(f'/chain?from={total_blocks - 1}&limit=5', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/chain', headers={'If-None-Match': etag}).status_code == 200
+
+    tip = json.loads(client.get('/chain/tip').data)
+    assert tip['length'] == total_blocks
+    assert tip['hash'] == blockchain.get_latest_block.hash
+
+
+def test_block_pages_are_clamped(client, monkeypatch):
+    from blockchain_demo.main import blockchain
+    monkeypatch.setattr(blockchain, 'chain', blockchain.chain[:1] * 1500)
+    assert len(json.loads(client.get('/chain?limit=5000').data)['chain']) == 1000
+    assert json.loads(client.get('/blocks/fragment?limit=5000').data)['first_index'] == 500
+
+
+def test_block_json_cached_once_sealed():
+    block = Block(1, ['tx'], datetime.now(), 'hash_str_sample')
+    legacy_hash = block.create_hash
+    block.to_json()
+    assert '_json' not in block.__dict__
+    block.hash = block.header_hash
+    assert json.loads(block.to_json())['hash'] == block.hash
+    assert block.to_json() is block.to_json()
+    assert Block.from_json(block.to_json()).to_dict() == block.to_dict()
+    del block.hash
+    assert block.create_hash == legacy_hash
+
+
 def test_add_new_transaction(client):
     transaction_data_example = {'content': 'example content',
                                 'author_id': 'id'}
@@ -137,3 +181,43 @@ def test_multiple_transactions_in_block():
     assert '2nd transaction text (Block#1)' == peer_transactions[1]['content']
     blockchain.mine_block(peer)
     assert blockchain.peers[peer]['chain'][1].transactions[0]['content'] is '1st transaction text (Block#1)'
+
+
+def test_proof_of_work_uses_header_hash():
+    blockchain = BlockChain()
+    block = Block(1, ['tx'] * 50, datetime.now(), 'hash_str_sample')
+    proof = blockchain.proof_of_work(block)
+    assert proof == block.header_hash
+    assert blockchain.is_valid_pow(block, proof)
+
+
+def test_header_rejects_truncated_fields():
+    blockchain = BlockChain()
+    block = Block(1, ['tx'], '2021-01-01 00:00:00.000000+00:00', 'hash_str_sample')
+    with pytest.raises(ValueError):
+        block.header_prefix
+    block.hash = '0' * 64
+    assert not blockchain.is_valid_pow(block, block.hash)
+
+
+def test_header_rejects_out_of_range_numbers():
+    blockchain = BlockChain()
+    for index, nonce in ((1, -1), (1, 2 ** 64), (-1, 0), (1, 'one')):
+        block = Block(index, ['tx'], datetime.now(), 'hash_str_sample', nonce)
+        with pytest.raises(ValueError):
+            block.header_hash
+        assert not blockchain.is_valid_pow(block, '0' * 64)
+
+    blockchain.chain[0].nonce = -1
+    assert blockchain.validate_chain(start=0).reason == 'header hash mismatch'
+
+
+def test_is_valid_pow_accepts_legacy_hash():
+    blockchain = BlockChain()
+    block = Block(1, ['tx'], datetime.now(), 'hash_str_sample')
+    legacy_hash = block.create_hash
+    while not legacy_hash.startswith('0' * blockchain.difficulty):
+        block.nonce += 1
+        legacy_hash = block.create_hash
+    assert blockchain.is_valid_pow(block, legacy_hash)
+    assert not blockchain.is_valid_pow(block, '0' * 64)
@@ -0,0 +1,55 @@
+from blockchain_demo.main import BlockChain
+from blockchain_demo.mempool import Mempool, transaction_hash
+
+
+def test_duplicates_are_ignored():
+    mempool = Mempool()
+    assert mempool.add({'content': 'a'}, 'peer') == transaction_hash({'content': 'a'})
+    assert mempool.add({'content': 'a'}, 'peer') is None
+    assert len(mempool) == 1
+    assert transaction_hash({'content': 'a'}) in mempool
+
+
+def test_author_budget_evicts_oldest():
+    mempool = Mempool(max_author_bytes=40)
+    for number in range(5):
+        mempool.add({'content': number}, 'chatty')
+    mempool.add({'content': 'quiet'}, 'quiet')
+    assert [transaction['content'] for transaction in mempool.view('chatty')] == [3, 4]
+    assert list(mempool.view('quiet')) == [{'content': 'quiet'}]
+    assert mempool.evicted == 3
+
+
+def test_global_budget_evicts_biggest_author():
+    mempool = Mempool(max_bytes=50)
+    mempool.add({'content': 'q'}, 'quiet')
+    for number in range(3):
+        mempool.add({'content': number}, 'chatty')
+    assert mempool.total_bytes <= 50
+    assert list(mempool.view('quiet')) == [{'content': 'q'}]
+    assert len(mempool.view('chatty')) == 2
+
+
+def test_author_queue_selects_once_per_iteration():
+    mempool = Mempool()
+    for number in range(100):
+        mempool.add({'content': number}, 'chatty')
+    selected = []
+    select = mempool.select
+    mempool.select = lambda author, limit=None: selected.append(limit) or select(author, limit)
+    queue = mempool.view('chatty')
+    assert [transaction['content'] for transaction in queue] == list(range(100))
+    assert list(reversed(queue))[0] == {'content': 99}
+    assert queue[2:4] == [{'content': 2}, {'content': 3}]
+    assert queue[1] == {'content': 1}
+    assert selected == [None, None, None, 2]
+
+
+def test_mine_block_respects_block_size():
+    blockchain = BlockChain(block_size=2)
+    blockchain.peers['tester'] = {'id': 'tester_id', 'queued_transactions': [], 'chain': blockchain.chain}
+    for number in range(3):
+        blockchain.add_transaction({'content': number}, 'tester')
+    blockchain.mine_block('tester')
+    assert len(blockchain.get_latest_block.transactions) == 2
+    assert list(blockchain.peers['tester']['queued_transactions']) == [{'content': 2}]
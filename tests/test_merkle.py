@@ -0,0 +1,30 @@
+from blockchain_demo.main import BlockChain, blockchain
+from blockchain_demo.merkle import merkle_proof, merkle_root, verify_merkle_proof
+import json
+import pytest
+
+
+@pytest.mark.parametrize('size', (1, 2, 3, 5, 8))
+def test_every_proof_verifies(size):
+    transactions = [{'content': f'transaction {i}'} for i in range(size)]
+    root = merkle_root(transactions)
+    for position, transaction in enumerate(transactions):
+        assert verify_merkle_proof(transaction, merkle_proof(transactions, position), root)
+
+
+def test_proof_rejects_other_transaction():
+    transactions = ['a', 'b', 'c']
+    proof = merkle_proof(transactions, 1)
+    assert not verify_merkle_proof('x', proof, merkle_root(transactions))
+
+
+def test_proof_route(client):
+    blockchain.peers['merkle tester'] = {'id': 'id', 'queued_transactions': ['a', 'b', 'c'], 'chain': blockchain.chain}
+    block_index = blockchain.mine_block('merkle tester')
+    response = client.get(f'/proof/{block_index}/2')
+    assert response.status_code == 200
+    body = json.loads(response.data)
+    assert body['transaction'] == 'c'
+    assert BlockChain.is_valid_transaction_proof(body['transaction'], body['proof'], body['merkle_root'])
+    assert client.get(f'/proof/{block_index}/3').status_code == 404
+    assert client.get('/proof/100000/0').status_code == 404
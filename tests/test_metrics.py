@@ -0,0 +1,38 @@
+from blockchain_demo import socket_io
+from blockchain_demo.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram('duration_seconds', 'Durations.', (0.1, 1)))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, event='a"b')
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP duration_seconds Durations.', '# TYPE duration_seconds histogram']
+    assert 'duration_seconds_bucket{event="a\\"b",le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{event="a\\"b",le="1.0"} 3' in lines
+    assert 'duration_seconds_bucket{event="a\\"b",le="+Inf"} 4' in lines
+    assert 'duration_seconds_count{event="a\\"b"} 4' in lines
+
+
+def test_counter():
+    counter = Counter('events_total', 'Events.')
+    counter.inc(event='x')
+    counter.inc(2, event='x')
+    assert list(counter.samples()) == ['events_total{event="x"} 3.0']
+
+
+def test_metrics_route(app, client):
+    from blockchain_demo.main import blockchain
+    blockchain.peers['metrics tester'] = {'id': 'id', 'queued_transactions': ['queued'], 'chain': blockchain.chain}
+    blockchain.queued_transactions('metrics tester')
+    client.get('/chain')
+    socket_client = socket_io.test_client(app)
+    socket_client.emit('my_ping', 12.5)
+
+    body = client.get('/metrics').data.decode()
+    assert 'http_request_duration_seconds_count{endpoint="main.get_chain"}' in body
+    assert 'socketio_events_total{event="my_ping"}' in body
+    assert 'client_ping_rtt_seconds_count ' in body
+    assert 'blockchain_queued_transactions{peer="metrics tester"} 1.0' in body
+    assert 'blockchain_queued_transactions_total' in body
@@ -0,0 +1,70 @@
+from blockchain_demo.main import Block, BlockChain
+from blockchain_demo.mining import MAX_TARGET, Miner, difficulty_target, retarget
+from datetime import datetime, timedelta
+
+
+def test_single_worker_search():
+    block = Block(1, ['tx'], datetime.now(), 'hash_str_sample')
+    nonce, proof = Miner(1).search(block.header_prefix, difficulty_target(3))
+    block.nonce = nonce
+    assert proof.startswith('000')
+    assert proof == block.header_hash
+
+
+def test_parallel_search_matches_single_worker():
+    block = Block(1, ['tx'], datetime.now(), 'hash_str_sample')
+    expected = Miner(1).search(block.header_prefix, difficulty_target(3))
+    assert Miner(3, batch_size=256).search(block.header_prefix, difficulty_target(3)) == expected
+
+
+def test_blockchain_mining_workers():
+    blockchain = BlockChain(mining_workers=2)
+    blockchain.peers['tester'] = {'id': 'tester_id',
+                                  'queued_transactions': ['transaction'],
+                                  'chain': blockchain.chain}
+    assert blockchain.mine_block('tester') == 1
+    assert blockchain.is_valid_pow(blockchain.chain[1], blockchain.chain[1].hash)
+
+
+def test_retarget_follows_block_time():
+    target = difficulty_target(3)
+    assert retarget(target, 20, 10) == target * 2
+    assert retarget(target, 1, 10) == target // 4
+    assert retarget(MAX_TARGET, 100, 10) == MAX_TARGET
+
+
+def test_blocks_record_the_retargeted_target():
+    blockchain = BlockChain()
+    blockchain.target_block_time, blockchain.retarget_window = 60, 2
+    blockchain.peers['tester'] = {'id': 'tester_id', 'queued_transactions': [], 'chain': blockchain.chain}
+    for number in range(4):
+        blockchain.add_transaction(f'transaction {number}', 'tester')
+        blockchain.mine_block('tester')
+    targets = [blockchain.block_target(block) for block in blockchain.chain]
+    assert targets[:4] == [difficulty_target(3)] * 4
+    assert targets[4] == difficulty_target(3) // 4
+    assert int(blockchain.chain[4].hash, 16) <= targets[4]
+    assert blockchain.validate_chain()
+
+    easy = Block(5, ['easy'], datetime.now(), blockchain.chain[4].hash, target=difficulty_target(3))
+    assert not blockchain.add_block_to_peer_chain(easy, blockchain.proof_of_work(easy), None)
+
+
+def test_block_timestamps_are_bounded():
+    blockchain = BlockChain()
+    blockchain.median_time_span = 3
+    blockchain.peers['tester'] = {'id': 'tester_id', 'queued_transactions': [], 'chain': blockchain.chain}
+    for number in range(3):
+        blockchain.add_transaction(f'transaction {number}', 'tester')
+        blockchain.mine_block('tester')
+    tip = blockchain.chain[3]
+
+    def accepted(timestamp) -> bool:
+        block = Block(4, ['dated'], timestamp, tip.hash, target=difficulty_target(3))
+        return blockchain.add_block_to_peer_chain(block, blockchain.proof_of_work(block), None)
+
+    # The median of the last three blocks is block 2's timestamp.
+    assert not accepted(blockchain.chain[2].timestamp)
+    assert not accepted(datetime.now() + timedelta(hours=3))
+    assert not accepted('yesterday')
+    assert accepted(datetime.fromisoformat(blockchain.chain[2].timestamp) + timedelta(microseconds=1))
@@ -0,0 +1,96 @@
+from blockchain_demo.indexes import TransactionIndex
+from blockchain_demo.main import BlockChain, blockchain as app_blockchain
+from blockchain_demo.mempool import transaction_hash
+from blockchain_demo.pruning import Pruner
+from conftest import mined_chain
+import json
+
+
+def pruned_chain(blocks: int, pruner: Pruner) -> BlockChain:
+    blockchain = BlockChain()
+    blockchain.pruner = pruner
+    return mined_chain(blocks, blockchain)
+
+
+def test_depth_prunes_by_batch_and_archives(tmp_path):
+    archive = tmp_path / 'archive.ndjson'
+    pruned_batches = []
+    pruner = Pruner(depth=3, archive_path=str(archive), batch_size=4)
+    pruner.subscribe(lambda blocks: pruned_batches.append([len(block.transactions) for block in blocks]))
+    blockchain = pruned_chain(9, pruner)
+
+    # 10 blocks: heights 0 to 3 went once 4 blocks were past the depth, 4 to 6 wait for a whole batch.
+    assert pruner.height == 4
+    assert pruned_batches == [[0, 1, 1, 1]]
+    assert [block.__dict__.get('pruned') for block in blockchain.chain] == [0, 1, 1, 1] + [None] * 6
+    assert blockchain.chain[2].transactions == [] and 'transactions' in blockchain.chain[2].to_dict()
+    assert [json.loads(line)['transactions'] for line in archive.read_text().splitlines()] == [
+        [], [{'content': 'transaction 0', 'author': 'miner'}], [{'content': 'transaction 1', 'author': 'miner'}],
+        [{'content': 'transaction 2', 'author': 'miner'}]]
+    assert blockchain.validate_chain()
+
+    blockchain.chain[2].nonce += 1
+    assert blockchain.validate_chain(start=0).invalid_height == 2
+
+
+def test_byte_budget_keeps_the_newest_blocks():
+    pruner = Pruner(max_bytes=200, batch_size=2)
+    blockchain = pruned_chain(12, pruner)
+    assert 0 < pruner.kept_bytes <= 200
+    assert pruner.kept_bytes == sum(len(json.dumps(block.transactions)) for block in blockchain.chain[pruner.height:])
+    assert all('pruned' in block.__dict__ for block in blockchain.chain[:pruner.height])
+    assert not any('pruned' in block.__dict__ for block in blockchain.chain[pruner.height:])
+
+
+def test_index_forgets_pruned_transactions():
+    blockchain = mined_chain(4)
+    index = TransactionIndex()
+    index.update(blockchain.chain)
+    first = blockchain.chain[1].transactions[0]
+    pruner = Pruner(depth=2, batch_size=1)
+    pruner.subscribe(index.forget)
+    pruner.update(blockchain.chain)
+
+    assert index.locate(transaction_hash(first)) is None
+    assert index.by_author['miner'] == [(3, 0), (4, 0)]
+    assert index.total == 4 and index.block_range(2) == (1, 2)
+    # Rebuilt from the pruned chain, global positions don't move.
+    index.reset()
+    index.update(blockchain.chain)
+    assert index.total == 4 and index.block_range(3) == (2, 3)
+
+
+def test_routes_mark_pruned_blocks(client):
+    chain, depth, batch_size = app_blockchain.chain, app_blockchain.pruner.depth, app_blockchain.pruner.batch_size
+    app_blockchain.chain = mined_chain(3).chain
+    try:
+        app_blockchain.pruner.depth, app_blockchain.pruner.batch_size = 1, 1
+        app_blockchain.pruner.update(app_blockchain.chain)
+        blocks = json.loads(client.get('/chain').data)['chain']
+        assert [block.get('pruned') for block in blocks] == [0, 1, 1, None]
+        assert blocks[1]['transactions'] == [] and blocks[1]['merkle_root'] == app_blockchain.chain[1].merkle_root
+
+        transactions = json.loads(client.get('/transactions').data)['transactions']
+        assert transactions[0] == {'block_index': 1, 'position': 0, 'pruned': True}
+        assert transactions[2]['transaction']['content'] == 'transaction 2'
+        assert json.loads(client.get('/block/2/transactions').data)['pruned']
+        assert client.get('/proof/2/0').status_code == 410
+    finally:
+        app_blockchain.chain = chain
+        app_blockchain.pruner.depth, app_blockchain.pruner.batch_size = depth, batch_size
+
+
+def test_pruned_blocks_render(client):
+    chain, depth, batch_size = app_blockchain.chain, app_blockchain.pruner.depth, app_blockchain.pruner.batch_size
+    app_blockchain.chain = mined_chain(3).chain
+    try:
+        assert b'transaction 0' in client.get('/').data
+        app_blockchain.pruner.depth, app_blockchain.pruner.batch_size = 1, 1
+        app_blockchain.pruner.update(app_blockchain.chain)
+        page = client.get('/')
+        assert page.status_code == 200
+        assert b'transaction 0' not in page.data and page.data.count(b'1 transaction(s) pruned') == 2
+        assert b'transaction 2' in page.data
+    finally:
+        app_blockchain.chain = chain
+        app_blockchain.pruner.depth, app_blockchain.pruner.batch_size = depth, batch_size
@@ -0,0 +1,107 @@
+from Crypto.PublicKey import ECC
+
+from blockchain_demo import create_app, signatures
+from blockchain_demo.ledger import coinbase
+from blockchain_demo.main import Block, BlockChain, blockchain
+from blockchain_demo.signatures import SignatureVerifier, public_key_hex, sign_transaction
+from blockchain_demo.transactions import TransactionService
+from datetime import datetime
+import json
+import pytest
+
+KEY = ECC.generate(curve='P-256')
+OTHER_KEY = ECC.generate(curve='P-256')
+
+
+@pytest.fixture
+def signed_client():
+    app = create_app({'TESTING': True, 'REQUIRE_SIGNATURES': True})
+    yield app.test_client()
+    blockchain.signatures = SignatureVerifier()
+
+
+def test_sign_and_verify():
+    verifier = SignatureVerifier(required=True)
+    transaction = sign_transaction({'content': 'signed', 'author': 'alice', 'author_id': 'a'}, KEY)
+    assert verifier.verify(dict(transaction, timestamp='now'))
+    assert not verifier.verify(dict(transaction, content='tampered'))
+    assert not verifier.verify(dict(transaction, signature='00' * 64))
+    assert not verifier.verify({'content': 'unsigned'})
+    assert SignatureVerifier().verify({'content': 'unsigned'})
+
+
+def test_pool_batches_match_in_process(monkeypatch):
+    transactions = [sign_transaction({'content': f'tx {number}', 'author': 'alice', 'author_id': 'a'}, KEY)
+                    for number in range(10)]
+    transactions[3] = dict(transactions[3], content='tampered')
+    verifier = SignatureVerifier(workers=2, batch_size=4)
+    try:
+        expected = [number != 3 for number in range(10)]
+        assert verifier.verify_many(transactions) == expected
+
+        calls = []
+        monkeypatch.setattr(signatures, 'verify_batch', lambda items: calls.append(items) or [True] * len(items))
+        assert verifier.verify_many(transactions[:3]) == [True] * 3
+        assert calls == []
+    finally:
+        verifier.close()
+
+
+def test_signed_ingestion_is_not_verified_again(signed_client, monkeypatch):
+    blockchain.peers['alice'] = {'id': 'alice_id', 'queued_transactions': [], 'chain': blockchain.chain}
+    assert blockchain.register_key('alice', public_key_hex(KEY))
+    signed = sign_transaction({'content': 'signed ingestion', 'author': 'alice', 'author_id': 'alice_id'}, KEY)
+    unsigned = {'content': 'unsigned ingestion', 'author': 'alice', 'author_id': 'alice_id'}
+    response = signed_client.post('/add_new_transactions', json=[signed, unsigned])
+    results = json.loads(response.data)['results']
+    assert results[0]['accepted']
+    assert results[1]['reason'] == 'missing or invalid signature'
+
+    calls = []
+    monkeypatch.setattr(signatures, 'verify_batch', lambda items: calls.append(items) or [False] * len(items))
+    block_index = blockchain.mine_block('alice')
+    assert block_index and calls == []
+    assert blockchain.chain[block_index].transactions[0]['content'] == 'signed ingestion'
+    assert blockchain.validate_chain(0)
+
+
+def test_signed_blocks_carry_an_unsigned_reward():
+    chain = BlockChain()
+    chain.signatures, chain.block_reward = SignatureVerifier(required=True), 50
+    chain.peers['alice'] = {'id': 'alice_id', 'queued_transactions': [], 'chain': chain.chain}
+    chain.add_transaction(sign_transaction({'content': 'rewarded', 'author': 'alice', 'author_id': 'alice_id'}, KEY),
+                          'alice')
+    assert chain.mine_block('alice') == 1
+    assert chain.chain[1].transactions[-1] == coinbase('alice', 50, 1)
+    assert chain.ledger.balance('alice') == 50
+
+    unsigned = Block(2, [{'content': 'unsigned', 'author': 'alice'}, coinbase('alice', 50, 2)], datetime.now(),
+                     chain.chain[1].hash, target=chain.expected_target(2, chain.chain[1]))
+    assert not chain.add_block_to_peer_chain(unsigned, chain.proof_of_work(unsigned), None)
+
+
+def test_keys_are_bound_to_authors():
+    chain = BlockChain()
+    chain.signatures, chain.block_reward = SignatureVerifier(required=True), 50
+    service = TransactionService(chain)
+    for name, key in (('alice', KEY), ('mallory', OTHER_KEY)):
+        chain.peers[name] = {'id': f'{name}_id', 'queued_transactions': [], 'chain': chain.chain}
+        assert chain.register_key(name, public_key_hex(key))
+    assert service.submit(sign_transaction({'content': 'hello', 'author': 'alice', 'author_id': 'alice_id'}, KEY))
+    chain.mine_block('alice')
+    assert chain.ledger.keys == {'alice': public_key_hex(KEY)}
+    assert not chain.register_key('alice', public_key_hex(OTHER_KEY))
+
+    # Mallory signs a transfer from alice with her own key.
+    forged = sign_transaction({'content': 'pay', 'author': 'alice', 'author_id': 'alice_id', 'recipient': 'mallory',
+                               'amount': 50, 'nonce': 0}, OTHER_KEY)
+    assert chain.signatures.verify(forged)
+    assert service.submit_many([dict(forged)])[0]['reason'] == 'key not registered for author'
+
+    block = Block(2, [forged], datetime.now(), chain.chain[1].hash, target=chain.expected_target(2, chain.chain[1]))
+    proof = chain.proof_of_work(block)
+    assert not chain.add_block_to_peer_chain(block, proof, None)
+    block.hash = proof
+    chain.chain.append(block)
+    assert chain.validate_chain(start=0).reason == 'invalid transaction signature'
+    assert chain.ledger.height == 2 and chain.ledger.balance('mallory') == 0
@@ -0,0 +1,52 @@
+from blockchain_demo.main import Block, BlockChain
+from blockchain_demo.storage import BlockStore, INDEX_NAME
+from datetime import datetime
+import os
+
+
+def sealed_block(index, prev_hash='0'):
+    block = Block(index, [{'content': f'transaction {index}'}], datetime.now(), prev_hash)
+    block.hash = block.header_hash
+    return block
+
+
+def test_append_and_reopen(tmp_path):
+    store = BlockStore(str(tmp_path), Block.from_json, segment_size=256)
+    for index in range(5):
+        store.append(sealed_block(index))
+    store.close()
+
+    reopened = BlockStore(str(tmp_path), Block.from_json, segment_size=256)
+    assert len(reopened) == 5
+    assert len(reopened.segments) > 1
+    assert reopened[3].transactions == [{'content': 'transaction 3'}]
+    assert reopened[-1].index == 4
+    assert [block.index for block in reopened[1:3]] == [1, 2]
+    assert [block.index for block in reopened] == [0, 1, 2, 3, 4]
+
+
+def test_torn_index_entry_is_dropped(tmp_path):
+    store = BlockStore(str(tmp_path), Block.from_json)
+    store.append(sealed_block(0))
+    store.append(sealed_block(1))
+    store.close()
+    with open(os.path.join(str(tmp_path), INDEX_NAME), 'ab') as index:
+        index.write(b'\x00\x01')
+    assert len(BlockStore(str(tmp_path), Block.from_json)) == 2
+
+
+def test_blockchain_reopens_store(tmp_path):
+    blockchain = BlockChain()
+    blockchain.use_store(BlockStore(str(tmp_path), Block.from_json))
+    blockchain.peers['tester'] = {'id': 'tester_id', 'queued_transactions': ['transaction'],
+                                  'chain': blockchain.chain}
+    blockchain.mine_block('tester')
+    genesis_hash = blockchain.chain[0].hash
+    blockchain.chain.close()
+
+    restarted = BlockChain()
+    restarted.use_store(BlockStore(str(tmp_path), Block.from_json))
+    assert restarted.get_total_blocks == 2
+    assert restarted.chain[0].hash == genesis_hash
+    assert restarted.get_latest_block.transactions == ['transaction']
+    assert restarted.is_valid_pow(restarted.get_latest_block, restarted.get_latest_block.hash)
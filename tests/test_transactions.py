@@ -0,0 +1,100 @@
+from blockchain_demo.main import Block, BlockChain, blockchain
+from blockchain_demo.transactions import TransactionService, block_entries
+from datetime import datetime
+import json
+
+
+def test_block_entries_order_by_timestamp():
+    block = Block(1, [{'content': 'late', 'timestamp': '2021-01-02'}, 'plain',
+                      {'content': 'early', 'timestamp': '2021-01-01'}], datetime.now(), 'a')
+    assert [entry['content'] for entry in block_entries(block)] == ['plain', 'early', 'late']
+
+
+def test_service_follows_mined_blocks():
+    chain = BlockChain()
+    service = TransactionService(chain)
+    chain.peers['tester'] = {'id': 'tester_id', 'queued_transactions': [], 'chain': chain.chain}
+    assert not service.submit({'content': 'no author', 'author_id': 'tester_id'})
+    assert service.submit({'content': 'mined', 'author': 'tester', 'author_id': 'tester_id'})
+    chain.mine_block('tester')
+    assert chain.get_latest_block.transactions[0]['content'] == 'mined'
+
+
+def test_submit_and_submit_many_agree():
+    chain = BlockChain()
+    service = TransactionService(chain)
+    chain.mempool.max_author_bytes = 150
+    stranger = {'content': 'who', 'author': 'stranger', 'author_id': 'id'}
+    assert not service.submit(dict(stranger))
+    assert service.submit_many([dict(stranger)])[0]['reason'] == 'unknown author'
+
+    chain.peers['tester'] = {'id': 'id', 'queued_transactions': [], 'chain': chain.chain}
+    assert service.submit({'content': 'fits', 'author': 'tester', 'author_id': 'id'})
+    assert not service.submit({'content': 'x' * 200, 'author': 'tester', 'author_id': 'id'})
+    assert [transaction['content'] for transaction in chain.mempool.view('tester')] == ['fits']
+
+
+def test_index_page_lists_confirmed_transactions(client):
+    blockchain.peers['index tester'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    response = client.post('/add_new_transaction',
+                           json={'content': 'rendered transaction', 'author': 'index tester', 'author_id': 'id'})
+    assert response.status_code == 201
+    blockchain.mine_block('index tester')
+    assert b'rendered transaction' in client.get('/').data
+
+
+def test_resubmitted_transactions_are_duplicates(client):
+    blockchain.peers['resubmitter'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    body = {'content': 'sent twice', 'author': 'resubmitter', 'author_id': 'id'}
+    statuses = [client.post('/add_new_transaction', json=body).status_code for _ in range(3)]
+    assert statuses == [201, 404, 404]
+    assert [transaction['content'] for transaction in blockchain.mempool.view('resubmitter')] == ['sent twice']
+    response = client.post('/add_new_transactions', json=[body])
+    assert json.loads(response.data)['results'][0]['reason'] == 'duplicate or over the mempool budget'
+
+
+def test_index_page_renders_newest_blocks(app, client):
+    from blockchain_demo.main import block_fragments
+    app.config['INDEX_PAGE_SIZE'] = 2
+    blockchain.peers['page tester'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    for number in range(3):
+        blockchain.add_transaction({'content': f'page transaction {number}', 'author': 'page tester'}, 'page tester')
+        blockchain.mine_block('page tester')
+
+    page = client.get('/').data
+    assert b'page transaction 2' in page
+    assert b'page transaction 0' not in page
+    assert b'load_more_btn' in page
+    assert blockchain.get_latest_block.hash in block_fragments.fragments
+
+    older = json.loads(client.get(f'/blocks/fragment?before={blockchain.get_total_blocks - 2}&limit=1').data)
+    assert older['first_index'] == blockchain.get_total_blocks - 3
+    assert 'page transaction 0' in older['html']
+
+
+def test_batch_endpoint(client):
+    blockchain.peers['batch tester'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    transactions = [{'content': 'batch 1', 'author': 'batch tester', 'author_id': 'id'},
+                    {'content': 'batch 2', 'author': 'batch tester'},
+                    {'content': 'batch 3', 'author': 'nobody', 'author_id': 'id'},
+                    {'content': 'batch 1', 'author': 'batch tester', 'author_id': 'id'}]
+    response = client.post('/add_new_transactions', json=transactions)
+    assert response.status_code == 201
+    body = json.loads(response.data)
+    assert (body['accepted'], body['rejected']) == (1, 3)
+    assert [result['accepted'] for result in body['results']] == [True, False, False, False]
+    assert body['results'][1]['reason'] == 'missing author_id'
+    assert body['results'][2]['reason'] == 'unknown author'
+    assert client.post('/add_new_transactions', json={'content': 'not a list'}).status_code == 400
+
+
+def test_streamed_ndjson(client):
+    blockchain.peers['stream tester'] = {'id': 'id', 'queued_transactions': [], 'chain': blockchain.chain}
+    lines = [json.dumps({'content': f'streamed {number}', 'author': 'stream tester', 'author_id': 'id'})
+             for number in range(2500)] + ['', '{broken']
+    response = client.post('/add_new_transactions', data='\n'.join(lines),
+                           content_type='application/x-ndjson')
+    body = json.loads(response.data)
+    assert body['accepted'] == 2500
+    assert body['results'][-1] == {'position': 2500, 'accepted': False, 'reason': 'invalid JSON'}
+    assert len(blockchain.queued_transactions('stream tester')) == 2500
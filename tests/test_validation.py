@@ -0,0 +1,61 @@
+from blockchain_demo.main import Block, BlockChain
+from blockchain_demo.validation import ChainValidator
+from conftest import mined_chain
+from datetime import datetime
+
+
+def validated_chain(blocks=4, workers=1):
+    blockchain = BlockChain()
+    blockchain.validator = ChainValidator(workers, batch_size=2)
+    return mined_chain(blocks, blockchain)
+
+
+def test_valid_chain_records_checkpoint():
+    blockchain = validated_chain()
+    result = blockchain.validate_chain()
+    assert result.valid
+    assert (result.start, result.stop) == (0, 5)
+    assert blockchain.validator.checkpoints == {4: blockchain.chain[4].hash}
+    assert blockchain.validate_chain().start == 5
+
+
+def test_parallel_validation_finds_tampered_transactions():
+    blockchain = validated_chain(workers=2)
+    blockchain.chain[2].transactions[0] = {'content': 'tampered'}
+    result = blockchain.validate_chain()
+    assert not result
+    assert result.invalid_height == 2
+    assert 'Merkle' in result.reason
+    assert not blockchain.validator.checkpoints
+
+
+def test_out_of_range_start_is_clamped():
+    blockchain = validated_chain(blocks=2)
+    result = blockchain.validate_chain(start=10)
+    assert result.valid and (result.start, result.stop) == (10, 3)
+    result = blockchain.validate_chain(start=-1)
+    assert result.valid and (result.start, result.stop) == (0, 3)
+
+
+def test_broken_link_is_reported():
+    blockchain = validated_chain()
+    blockchain.chain[3].prev_hash = 'other'
+    assert blockchain.validate_chain().invalid_height == 3
+
+
+def test_legacy_hash_is_accepted():
+    blockchain = validated_chain(blocks=0)
+    block = Block(1, ['legacy'], datetime.now(), blockchain.chain[0].hash)
+    while not block.create_hash.startswith('0' * blockchain.difficulty):
+        block.nonce += 1
+    block.hash = block.create_hash
+    blockchain.chain.append(block)
+    assert blockchain.validate_chain()
+
+
+def test_checkpoints_are_persisted(tmp_path):
+    path = str(tmp_path / 'checkpoints.json')
+    blockchain = validated_chain(blocks=1)
+    blockchain.validator.path = path
+    blockchain.validate_chain()
+    assert ChainValidator(path=path).last_checkpoint(blockchain.chain) == 1